@@ -0,0 +1,55 @@
+-- ============================================================================
+-- EMBEDDING MODEL VERSIONS - DATABASE MIGRATION
+-- Version: 002
+-- Description: Shadow embeddings per model version and the serving pointer
+--              used to switch similarity search to a new model atomically
+-- ============================================================================
+
+-- ============================================================================
+-- REPORT EMBEDDINGS (one row per report and model version)
+-- ============================================================================
+
+-- Filled by the ML service's migrate_embeddings job while queries keep using
+-- the serving version. The column is untyped so models of any dimension fit;
+-- the ML service creates a partial HNSW index per version before cutover:
+--
+--   CREATE INDEX CONCURRENTLY idx_report_embeddings_<version> ON report_embeddings
+--   USING hnsw ((embedding::vector(<dim>)) vector_cosine_ops)
+--   WHERE model_version = '<version>';
+CREATE TABLE IF NOT EXISTS report_embeddings (
+  model_version VARCHAR(100) NOT NULL, -- Model ID from ML_MODELS
+  report_id UUID NOT NULL REFERENCES fraud_reports(id) ON DELETE CASCADE,
+  embedding vector NOT NULL,
+
+  created_at TIMESTAMP DEFAULT NOW(),
+  updated_at TIMESTAMP DEFAULT NOW(),
+
+  PRIMARY KEY (model_version, report_id)
+);
+
+-- Reverse lookup for cascades and coverage checks
+CREATE INDEX IF NOT EXISTS idx_report_embeddings_report ON report_embeddings(report_id);
+
+-- ============================================================================
+-- SERVING POINTER (single row)
+-- ============================================================================
+
+-- model_version NULL = fraud_reports.embedding (vectors of the ML service's
+-- default model). Every ML worker reads its similarity queries from the
+-- version named here; a cutover updates this row in one transaction.
+-- shadow_version is the version a running migration fills; workers also
+-- write new embeddings there until the cutover.
+CREATE TABLE IF NOT EXISTS embedding_serving (
+  id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+  model_version VARCHAR(100),
+  shadow_version VARCHAR(100),
+  previous_version VARCHAR(100),
+  switched_at TIMESTAMP DEFAULT NOW()
+);
+
+INSERT INTO embedding_serving (id, model_version) VALUES (TRUE, NULL)
+ON CONFLICT (id) DO NOTHING;
+
+-- ============================================================================
+-- MIGRATION COMPLETE
+-- ============================================================================
@@ -0,0 +1,226 @@
+"""
+Admission control with separate priority lanes
+Interactive traffic (single report checks) and bulk traffic (batch endpoints,
+backfills) get their own concurrency limits and queue caps; a saturated lane
+sheds load immediately with 429 + Retry-After instead of queueing for seconds.
+Inside the model, PriorityLock lets interactive work go ahead of queued bulk
+chunks.
+
+Lane selection: "X-Priority: interactive|bulk" header, otherwise by route.
+
+Configuration (environment), per lane (INTERACTIVE / BULK):
+- ML_<LANE>_CONCURRENCY: Requests executing at once (default 16 / 2)
+- ML_<LANE>_QUEUE: Requests allowed to wait for a slot (default 64 / 4)
+- ML_<LANE>_QUEUE_TIMEOUT: Seconds a request may wait (default 5 / 30)
+- ML_<LANE>_RETRY_AFTER: Retry-After seconds on 429 (default 1 / 10)
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+import asyncio
+import logging
+import os
+import threading
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_HEADER = "X-Priority"
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+
+# Routes that default to the bulk lane
+BULK_ROUTES = {
+    "/api/v1/embeddings/batch-generate",
+    "/api/v1/embeddings/store",
+    "/api/v1/images/batch-compute-hash",
+    "/api/v1/index/upsert",
+    "/api/v1/identifiers/load",
+}
+
+# Lane of the current request; background jobs set it to bulk
+current_lane: ContextVar[str] = ContextVar("current_lane", default=INTERACTIVE)
+
+
+class LaneSaturated(Exception):
+    """Raised when a lane has no free slot and its queue is full or timed out"""
+
+    def __init__(self, lane: "Lane", reason: str):
+        super().__init__(f"{lane.name} lane saturated ({reason})")
+        self.lane = lane
+        self.reason = reason
+
+
+class Lane:
+    """Concurrency limit plus bounded wait queue for one priority class"""
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int,
+        max_queue: int,
+        queue_timeout: float,
+        retry_after: int,
+    ):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.active = 0
+        self.queued = 0
+
+        # Statistics
+        self.admitted = 0
+        self.shed_queue_full = 0
+        self.shed_timeout = 0
+
+    async def acquire(self) -> None:
+        if not self._semaphore.locked():
+            await self._semaphore.acquire()
+        else:
+            if self.queued >= self.max_queue:
+                self.shed_queue_full += 1
+                raise LaneSaturated(self, "queue full")
+
+            self.queued += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.shed_timeout += 1
+                raise LaneSaturated(self, "queue timeout")
+            finally:
+                self.queued -= 1
+
+        self.active += 1
+        self.admitted += 1
+
+    def release(self) -> None:
+        self.active -= 1
+        self._semaphore.release()
+
+    def stats(self) -> Dict:
+        return {
+            "active": self.active,
+            "queued": self.queued,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "shed": self.shed_queue_full + self.shed_timeout,
+            "shed_queue_full": self.shed_queue_full,
+            "shed_timeout": self.shed_timeout,
+        }
+
+
+class AdmissionController:
+    """Routes requests into lanes and enforces their limits"""
+
+    def __init__(self, lanes: Dict[str, Lane]):
+        self.lanes = lanes
+
+    def classify(self, path: str, priority_header: Optional[str]) -> str:
+        if priority_header:
+            priority = priority_header.strip().lower()
+            if priority in self.lanes:
+                return priority
+        return BULK if path in BULK_ROUTES else INTERACTIVE
+
+    def stats(self) -> Dict[str, Dict]:
+        return {name: lane.stats() for name, lane in self.lanes.items()}
+
+
+def is_admission_controlled(method: str, path: str) -> bool:
+    """Only work-carrying API calls are admitted; health, stats, admin and jobs are not"""
+    return (
+        method == "POST"
+        and path.startswith("/api/v1/")
+        and not path.startswith(("/api/v1/admin/", "/api/v1/jobs"))
+    )
+
+
+# ============================================================================
+# INFERENCE PRIORITY
+# ============================================================================
+
+class PriorityLock:
+    """
+    Mutual exclusion where interactive waiters always go before bulk waiters
+
+    Bulk work holds the lock one chunk at a time, so an interactive request
+    waits for at most one in-progress chunk rather than a whole batch.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._busy = False
+        self._waiting = {INTERACTIVE: 0, BULK: 0}
+
+    @contextmanager
+    def hold(self, lane: Optional[str] = None) -> Iterator[None]:
+        lane = BULK if (lane or current_lane.get()) == BULK else INTERACTIVE
+
+        with self._condition:
+            self._waiting[lane] += 1
+            while self._busy or (lane == BULK and self._waiting[INTERACTIVE] > 0):
+                self._condition.wait()
+            self._waiting[lane] -= 1
+            self._busy = True
+
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._busy = False
+                self._condition.notify_all()
+
+    def stats(self) -> Dict[str, int]:
+        with self._condition:
+            return {f"waiting_{lane}": count for lane, count in self._waiting.items()}
+
+
+@contextmanager
+def lane_context(lane: str) -> Iterator[None]:
+    """Run a block (e.g. a background job) as the given lane"""
+    token = current_lane.set(lane)
+    try:
+        yield
+    finally:
+        current_lane.reset(token)
+
+
+def _lane_from_env(name: str, concurrency: int, queue: int, timeout: float, retry_after: int) -> Lane:
+    prefix = f"ML_{name.upper()}_"
+    return Lane(
+        name,
+        max_concurrency=int(os.environ.get(prefix + "CONCURRENCY", concurrency)),
+        max_queue=int(os.environ.get(prefix + "QUEUE", queue)),
+        queue_timeout=float(os.environ.get(prefix + "QUEUE_TIMEOUT", timeout)),
+        retry_after=int(os.environ.get(prefix + "RETRY_AFTER", retry_after)),
+    )
+
+
+# Singleton instance
+_admission_controller: Optional[AdmissionController] = None
+
+
+def get_admission_controller() -> AdmissionController:
+    """
+    Get or create singleton admission controller instance
+
+    Returns:
+        AdmissionController instance
+    """
+    global _admission_controller
+
+    if _admission_controller is None:
+        _admission_controller = AdmissionController(
+            {
+                INTERACTIVE: _lane_from_env(INTERACTIVE, 16, 64, 5.0, 1),
+                BULK: _lane_from_env(BULK, 2, 4, 30.0, 10),
+            }
+        )
+
+    return _admission_controller
@@ -1,17 +1,68 @@
 """
 FastAPI REST API for ML services
 Provides endpoints for embeddings and image hashing
+
+Routes are grouped into routers and registered according to the service role
+(ML_SERVICE_ROLE, see service_roles).
 """
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import APIRouter, FastAPI, HTTPException, Request, Depends, Header
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
 from pydantic import BaseModel, Field
-from typing import List, Dict, Optional
+from typing import List, Dict, Literal, Optional
+import asyncio
 import logging
 import os
-
+import secrets
+import time
+import uuid
+
+# Application modules (torch is not imported until a model loads)
+_import_start = time.perf_counter()
+
+from admission import (
+    PRIORITY_HEADER,
+    LaneSaturated,
+    current_lane,
+    get_admission_controller,
+    is_admission_controlled,
+)
+from dedup_pipeline import run_dedup_check
+from embedding_migration import migration_status, serving_embeddings, serving_model_id
 from embeddings import get_embedding_service
-from image_hashing import get_image_detector
+from identifier_index import (
+    get_identifier_index,
+    identifier_index_enabled,
+    normalize_identifiers,
+)
+from image_hashing import MAX_IMAGE_BASE64_LENGTH, get_image_detector
+from jobs import ACTIVE_STATUSES, get_job_manager
+from lexical_blocking import get_lexical_blocker, lexical_blocking_enabled
+from model_registry import UnknownModelError, get_model_registry
+from profiling import SamplingProfiler, get_profile_store, profiler_lock
+from sharding import (
+    ShardError,
+    close_sharded_index,
+    execute as execute_shard_op,
+    get_local_index,
+    get_sharded_index,
+    init_sharded_index,
+    parse_shard_specs,
+    shard_token,
+    to_jsonable,
+)
+from service_roles import get_startup_report, role_includes, service_role
+from tracing import TRACE_HEADER, get_tracer, span
+from vector_store import (
+    IncompleteVersionError,
+    close_vector_store,
+    get_vector_store,
+    init_vector_store,
+)
+
+get_startup_report().record_import("api", time.perf_counter() - _import_start)
 
 # Configure logging
 logging.basicConfig(
@@ -20,6 +71,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# embeddings, images or all - fails at import on an unknown role
+SERVICE_ROLE = service_role()
+
 # Initialize FastAPI app
 app = FastAPI(
     title="Scamnemesis ML Service",
@@ -27,6 +81,12 @@ app = FastAPI(
     version="1.0.0",
 )
 
+# Route groups, included per service role at the end of this module
+embedding_router = APIRouter()
+image_router = APIRouter()
+index_router = APIRouter()
+dedup_router = APIRouter()
+
 # Configure CORS - use environment variable for allowed origins
 # Default to localhost for development, require explicit config for production
 ALLOWED_ORIGINS = os.environ.get(
@@ -41,16 +101,152 @@ app.add_middleware(
     allow_origins=[origin.strip() for origin in ALLOWED_ORIGINS],
     allow_credentials=True,
     allow_methods=["GET", "POST", "OPTIONS"],  # Only needed methods
-    allow_headers=["Content-Type", "Authorization", "X-API-Key"],
+    allow_headers=["Content-Type", "Authorization", "X-API-Key", TRACE_HEADER, PRIORITY_HEADER],
+    expose_headers=[TRACE_HEADER],
 )
 
+
+# Admin endpoints (profiling, ...) are disabled unless a token is configured
+ADMIN_TOKEN = os.environ.get("ML_ADMIN_TOKEN")
+ADMIN_TOKEN_HEADER = "X-Admin-Token"
+
+# Per-request profiling: send "X-Profile: collapsed|speedscope" with the admin token
+PROFILE_HEADER = "X-Profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+PROFILE_INTERVAL = float(os.environ.get("PROFILE_INTERVAL_MS", "5")) / 1000.0
+
+
+def is_admin_token(token: Optional[str]) -> bool:
+    """Constant-time check of an admin token against ML_ADMIN_TOKEN"""
+    if not ADMIN_TOKEN or not token:
+        return False
+    return secrets.compare_digest(token, ADMIN_TOKEN)
+
+
+async def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Dependency guarding admin-only endpoints"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled")
+    if not is_admin_token(x_admin_token):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+# Admission control - interactive and bulk lanes with their own limits
+@app.middleware("http")
+async def admission_middleware(request: Request, call_next):
+    if not is_admission_controlled(request.method, request.url.path):
+        return await call_next(request)
+
+    controller = get_admission_controller()
+    lane = controller.lanes[
+        controller.classify(request.url.path, request.headers.get(PRIORITY_HEADER))
+    ]
+
+    try:
+        await lane.acquire()
+    except LaneSaturated as e:
+        logger.warning(f"Shedding {request.url.path}: {e}")
+        return JSONResponse(
+            status_code=429,
+            content={"success": False, "detail": str(e)},
+            headers={"Retry-After": str(lane.retry_after)},
+        )
+
+    token = current_lane.set(lane.name)
+    try:
+        return await call_next(request)
+    finally:
+        current_lane.reset(token)
+        lane.release()
+
+
+@app.middleware("http")
+async def profiling_middleware(request: Request, call_next):
+    output_format = request.headers.get(PROFILE_HEADER)
+    if output_format is None:
+        return await call_next(request)
+
+    if not is_admin_token(request.headers.get(ADMIN_TOKEN_HEADER)):
+        return JSONResponse(status_code=401, content={"detail": "Invalid admin token"})
+    if output_format not in ("collapsed", "speedscope"):
+        return JSONResponse(
+            status_code=400, content={"detail": f"Unsupported profile format: {output_format}"}
+        )
+    if not profiler_lock.acquire(blocking=False):
+        return JSONResponse(status_code=409, content={"detail": "A profile is already running"})
+
+    profiler = SamplingProfiler(interval=PROFILE_INTERVAL)
+    try:
+        profiler.start()
+        try:
+            response = await call_next(request)
+        finally:
+            profiler.stop()
+    finally:
+        profiler_lock.release()
+
+    profile_id = uuid.uuid4().hex
+    get_profile_store().put(profile_id, *profiler.render(output_format))
+    response.headers[PROFILE_ID_HEADER] = profile_id
+
+    return response
+
+
+# Per-request tracing - sampled requests get a root span and echo their trace ID
+@app.middleware("http")
+async def tracing_middleware(request: Request, call_next):
+    tracer = get_tracer()
+    trace_id, parent_span_id, sampled = tracer.parse_headers(request.headers)
+
+    with tracer.start_trace(
+        "http.request",
+        trace_id=trace_id,
+        parent_span_id=parent_span_id,
+        sampled=sampled,
+        method=request.method,
+        path=request.url.path,
+    ) as root:
+        response = await call_next(request)
+
+        if root is not None:
+            root.set_attribute("status_code", response.status_code)
+            response.headers[TRACE_HEADER] = root.trace_id
+
+    return response
+
+
 # Initialize services on startup
 @app.on_event("startup")
 async def startup_event():
-    logger.info("Initializing ML services...")
-    get_embedding_service()  # Pre-load model
-    get_image_detector()
-    logger.info("ML services ready")
+    logger.info(f"Initializing ML services (role: {SERVICE_ROLE})...")
+    report = get_startup_report()
+
+    if role_includes("embeddings"):
+        with report.phase("embedding_model"):
+            get_embedding_service()  # Pre-load default model
+    if role_includes("images"):
+        with report.phase("image_detector"):
+            get_image_detector()
+    if role_includes("embeddings"):
+        if identifier_index_enabled():
+            get_identifier_index()
+        with report.phase("vector_store"):
+            await init_vector_store()
+        with report.phase("sharded_index"):
+            await init_sharded_index()
+    with report.phase("jobs"):
+        get_job_manager().start(asyncio.get_running_loop())
+
+    logger.info(f"ML services ready (role: {SERVICE_ROLE}): {report.summary()}")
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Jobs may be waiting on the event loop (database calls) - don't block it
+    await run_in_threadpool(get_job_manager().shutdown)
+    await close_vector_store()
+    await close_sharded_index()
+    await run_in_threadpool(get_tracer().exporter.shutdown)
 
 
 # ============================================================================
@@ -72,31 +268,71 @@ class ReportData(BaseModel):
 class EmbeddingRequest(BaseModel):
     """Request to generate embedding from report data"""
     report: ReportData
+    model_id: Optional[str] = None
 
 
 class TextEmbeddingRequest(BaseModel):
     """Request to generate embedding from raw text"""
     text: str = Field(..., min_length=1)
+    model_id: Optional[str] = None
 
 
 class BatchEmbeddingRequest(BaseModel):
     """Request to generate embeddings for multiple texts"""
     texts: List[str] = Field(..., min_items=1, max_items=1000)
+    model_id: Optional[str] = None
 
 
 class SimilarityRequest(BaseModel):
     """Request to compute similarity between two embeddings"""
-    embedding1: List[float] = Field(..., min_items=384, max_items=384)
-    embedding2: List[float] = Field(..., min_items=384, max_items=384)
+    # Length is checked against the model's dimension in the handler
+    embedding1: List[float] = Field(..., min_items=1)
+    embedding2: List[float] = Field(..., min_items=1)
+    model_id: Optional[str] = None
 
 
 class FindSimilarRequest(BaseModel):
     """Request to find similar reports"""
-    query_embedding: List[float] = Field(..., min_items=384, max_items=384)
+    query_embedding: List[float] = Field(..., min_items=1)
     candidate_embeddings: List[List[float]]
     candidate_ids: List[str]
     threshold: float = Field(0.85, ge=0.0, le=1.0)
     top_k: Optional[int] = Field(None, ge=1, le=100)
+    model_id: Optional[str] = None
+
+
+class DbFindSimilarRequest(BaseModel):
+    """Request to find similar stored reports via pgvector"""
+    report: Optional[ReportData] = None
+    text: Optional[str] = None
+    # Report IDs are UUIDs in fraud_reports; anything else would fail the query cast
+    exclude_ids: List[uuid.UUID] = Field(default_factory=list, max_items=100)
+    threshold: float = Field(0.85, ge=0.0, le=1.0)
+    top_k: int = Field(20, ge=1, le=100)
+
+
+class StoreEmbeddingItem(BaseModel):
+    """Report whose embedding should be (re)computed and stored"""
+    report_id: str = Field(..., min_length=1)
+    report: Optional[ReportData] = None
+    text: Optional[str] = None
+
+
+class StoreEmbeddingsRequest(BaseModel):
+    """Request to compute and store embeddings for many reports"""
+    items: List[StoreEmbeddingItem] = Field(..., min_items=1, max_items=1000)
+
+
+class EmbeddingCutoverRequest(BaseModel):
+    """Request to switch the serving embedding version"""
+    model_version: Optional[str] = Field(
+        None, description="Model ID to serve; null for fraud_reports.embedding"
+    )
+
+
+class EmbeddingMigrationAbortRequest(BaseModel):
+    """Request to abandon the running embedding migration"""
+    drop_vectors: bool = False
 
 
 class ImageHashRequest(BaseModel):
@@ -116,11 +352,181 @@ class BatchImageHashRequest(BaseModel):
     image_urls: List[str] = Field(..., min_items=1, max_items=100)
 
 
+class DedupImage(BaseModel):
+    """Image attached to a report - URL or base64-encoded bytes"""
+    image_url: Optional[str] = None
+    # Same limit as downloads (ML_IMAGE_MAX_BYTES), checked before decoding
+    image_base64: Optional[str] = Field(None, max_length=MAX_IMAGE_BASE64_LENGTH)
+
+
+class ImageCandidate(BaseModel):
+    """Stored image hashes of an existing report"""
+    id: str
+    hashes: Dict[str, str]
+
+
+class IdentifierData(BaseModel):
+    """Raw identifiers of a report (normalized as in normalizers.ts)"""
+    phone: Optional[str] = None
+    email: Optional[str] = None
+    iban: Optional[str] = None
+    crypto_wallet: Optional[str] = None
+    crypto_type: Literal["BTC", "ETH", "OTHER"] = "OTHER"
+    license_plate: Optional[str] = None
+    vin: Optional[str] = None
+    company_id: Optional[str] = None
+
+
+class DedupCheckRequest(BaseModel):
+    """Request to run the full duplicate check for a new report"""
+    report: ReportData
+    report_id: Optional[str] = None
+    identifiers: Optional[IdentifierData] = None
+    # Skip embedding and image stages when an identifier matches exactly
+    stop_on_exact: bool = True
+    images: List[DedupImage] = Field(default_factory=list, max_items=20)
+
+    # Optional candidates supplied by the caller
+    candidate_embeddings: List[List[float]] = Field(default_factory=list)
+    candidate_ids: List[str] = Field(default_factory=list)
+    image_candidates: List[ImageCandidate] = Field(default_factory=list)
+
+    use_database: bool = True
+    use_index: bool = True
+    text_threshold: float = Field(0.85, ge=0.0, le=1.0)
+    top_k: int = Field(20, ge=1, le=100)
+    image_threshold: int = Field(10, ge=0, le=64)
+
+
+class IndexImage(BaseModel):
+    """Precomputed hashes of one report image"""
+    image_id: str = Field(..., min_length=1)
+    hashes: Dict[str, str]
+
+
+class IndexItem(BaseModel):
+    """
+    Report to add to the sharded index (embedding given or computed)
+
+    LSH keys for lexical blocking are derived from report or text.
+    """
+    report_id: str = Field(..., min_length=1)
+    embedding: Optional[List[float]] = None
+    report: Optional[ReportData] = None
+    text: Optional[str] = None
+    images: List[IndexImage] = Field(default_factory=list, max_items=20)
+
+
+class IndexUpsertRequest(BaseModel):
+    """Request to add or replace reports in the sharded index"""
+    items: List[IndexItem] = Field(..., min_items=1, max_items=1000)
+
+
+class IndexDeleteRequest(BaseModel):
+    """Request to remove reports from the sharded index"""
+    report_ids: List[str] = Field(..., min_items=1, max_items=1000)
+
+
+class IndexSearchRequest(BaseModel):
+    """Request to search the sharded index by text similarity"""
+    embedding: Optional[List[float]] = None
+    report: Optional[ReportData] = None
+    text: Optional[str] = None
+    exclude_ids: List[str] = Field(default_factory=list, max_items=100)
+    threshold: float = Field(0.85, ge=0.0, le=1.0)
+    top_k: int = Field(20, ge=1, le=100)
+    # Lexical blocking needs report or text; embedding-only searches are exhaustive
+    blocking: bool = True
+    max_candidates: Optional[int] = Field(None, ge=1, le=10000)
+
+
+class IndexImageSearchRequest(BaseModel):
+    """Request to search the sharded index by image hashes"""
+    hashes: Dict[str, str]
+    threshold: float = Field(10, ge=0, le=64)
+    top_k: int = Field(20, ge=1, le=100)
+
+
+class ShardMembershipRequest(BaseModel):
+    """New shard membership ("local:N" and/or node base URLs)"""
+    shards: List[str] = Field(..., min_items=1, max_items=256)
+
+
+class IdentifierRecord(BaseModel):
+    """Identifiers of one report for the identifier index"""
+    report_id: str = Field(..., min_length=1)
+    identifiers: IdentifierData
+
+
+class IdentifierLoadRequest(BaseModel):
+    """Request to replace the whole identifier index"""
+    records: List[IdentifierRecord] = Field(..., max_items=100000)
+
+
+class IdentifierUpsertRequest(BaseModel):
+    """Request to add or replace reports in the identifier index"""
+    records: List[IdentifierRecord] = Field(..., min_items=1, max_items=1000)
+
+
+class IdentifierDeleteRequest(BaseModel):
+    """Request to remove reports from the identifier index"""
+    report_ids: List[str] = Field(..., min_items=1, max_items=1000)
+
+
+class IdentifierQuery(BaseModel):
+    """One exact-identifier lookup"""
+    identifiers: IdentifierData
+    exclude_ids: List[str] = Field(default_factory=list, max_items=100)
+
+
+class IdentifierLookupRequest(BaseModel):
+    """Batched exact-identifier lookups"""
+    queries: List[IdentifierQuery] = Field(..., min_items=1, max_items=1000)
+
+
+class JobSubmitRequest(BaseModel):
+    """Request to start a background job"""
+    type: str = Field(..., min_length=1)
+    params: Dict = Field(default_factory=dict)
+
+
+class ProfileRequest(BaseModel):
+    """Request to profile the live worker for a fixed duration"""
+    seconds: float = Field(10.0, gt=0, le=120)
+    mode: Literal["wall", "cpu"] = "wall"
+    format: Literal["collapsed", "speedscope"] = "collapsed"
+    interval_ms: float = Field(5.0, ge=1, le=100)
+
+
 # ============================================================================
 # EMBEDDING ENDPOINTS
 # ============================================================================
 
-@app.post("/api/v1/embeddings/generate")
+async def _get_model_service(model_id: Optional[str]):
+    """Embedding service for a model ID; loading happens off the event loop"""
+    try:
+        return await run_in_threadpool(get_embedding_service, model_id)
+    except UnknownModelError:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown model_id '{model_id}' (available: {', '.join(get_model_registry().model_ids)})",
+        )
+
+
+def _check_dimension(service, embeddings: List[List[float]]) -> None:
+    """400 unless every embedding has the model's dimension"""
+    for embedding in embeddings:
+        if len(embedding) != service.embedding_dim:
+            raise HTTPException(
+                status_code=400,
+                detail=(
+                    f"Expected embeddings of dimension {service.embedding_dim} for model "
+                    f"'{service.model_name}', got {len(embedding)}"
+                ),
+            )
+
+
+@embedding_router.post("/api/v1/embeddings/generate")
 async def generate_embedding(request: EmbeddingRequest):
     """
     Generate embedding vector from report data
@@ -128,21 +534,28 @@ async def generate_embedding(request: EmbeddingRequest):
     Returns:
         - embedding: 384-dimensional vector
         - text: The combined text that was embedded
+        - model: Model ID used
     """
+    service = await _get_model_service(request.model_id)
+
     try:
-        service = get_embedding_service()
 
         # Create combined text from report
-        text = service.create_report_text(request.report.dict())
+        with span("create_report_text"):
+            text = service.create_report_text(request.report.dict())
+
+        # Generate embedding (off the event loop so requests run concurrently)
+        embedding = await run_in_threadpool(service.generate_embedding, text)
 
-        # Generate embedding
-        embedding = service.generate_embedding(text)
+        with span("serialize"):
+            embedding_list = embedding.tolist()
 
         return {
             "success": True,
-            "embedding": embedding.tolist(),
+            "embedding": embedding_list,
             "text": text,
             "dimension": len(embedding),
+            "model": request.model_id or get_model_registry().default_model_id,
         }
 
     except Exception as e:
@@ -150,22 +563,28 @@ async def generate_embedding(request: EmbeddingRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/api/v1/embeddings/generate-from-text")
+@embedding_router.post("/api/v1/embeddings/generate-from-text")
 async def generate_embedding_from_text(request: TextEmbeddingRequest):
     """
     Generate embedding vector from raw text
 
     Returns:
         - embedding: 384-dimensional vector
+        - model: Model ID used
     """
+    service = await _get_model_service(request.model_id)
+
     try:
-        service = get_embedding_service()
-        embedding = service.generate_embedding(request.text)
+        embedding = await run_in_threadpool(service.generate_embedding, request.text)
+
+        with span("serialize"):
+            embedding_list = embedding.tolist()
 
         return {
             "success": True,
-            "embedding": embedding.tolist(),
+            "embedding": embedding_list,
             "dimension": len(embedding),
+            "model": request.model_id or get_model_registry().default_model_id,
         }
 
     except Exception as e:
@@ -173,23 +592,31 @@ async def generate_embedding_from_text(request: TextEmbeddingRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/api/v1/embeddings/batch-generate")
+@embedding_router.post("/api/v1/embeddings/batch-generate")
 async def batch_generate_embeddings(request: BatchEmbeddingRequest):
     """
     Generate embeddings for multiple texts in batch
 
     Returns:
         - embeddings: List of 384-dimensional vectors
+        - model: Model ID used
     """
+    service = await _get_model_service(request.model_id)
+
     try:
-        service = get_embedding_service()
-        embeddings = service.batch_generate_embeddings(request.texts)
+        embeddings = await run_in_threadpool(
+            service.batch_generate_embeddings, request.texts
+        )
+
+        with span("serialize", count=len(embeddings)):
+            embeddings_list = embeddings.tolist()
 
         return {
             "success": True,
-            "embeddings": embeddings.tolist(),
+            "embeddings": embeddings_list,
             "count": len(embeddings),
             "dimension": embeddings.shape[1],
+            "model": request.model_id or get_model_registry().default_model_id,
         }
 
     except Exception as e:
@@ -197,7 +624,7 @@ async def batch_generate_embeddings(request: BatchEmbeddingRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/api/v1/embeddings/similarity")
+@embedding_router.post("/api/v1/embeddings/similarity")
 async def compute_similarity(request: SimilarityRequest):
     """
     Compute cosine similarity between two embeddings
@@ -205,11 +632,12 @@ async def compute_similarity(request: SimilarityRequest):
     Returns:
         - similarity: Score between 0 and 1
     """
+    service = await _get_model_service(request.model_id)
+    _check_dimension(service, [request.embedding1, request.embedding2])
+
     try:
         import numpy as np
 
-        service = get_embedding_service()
-
         emb1 = np.array(request.embedding1)
         emb2 = np.array(request.embedding2)
 
@@ -225,7 +653,7 @@ async def compute_similarity(request: SimilarityRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/api/v1/embeddings/find-similar")
+@embedding_router.post("/api/v1/embeddings/find-similar")
 async def find_similar(request: FindSimilarRequest):
     """
     Find similar reports from candidates
@@ -233,21 +661,24 @@ async def find_similar(request: FindSimilarRequest):
     Returns:
         - matches: List of (id, similarity) tuples
     """
+    service = await _get_model_service(request.model_id)
+    _check_dimension(service, [request.query_embedding, *request.candidate_embeddings])
+
     try:
         import numpy as np
 
-        service = get_embedding_service()
-
         query_emb = np.array(request.query_embedding)
         candidate_embs = [np.array(emb) for emb in request.candidate_embeddings]
 
-        matches = service.find_similar_reports(
-            query_emb,
-            candidate_embs,
-            request.candidate_ids,
-            request.threshold,
-            request.top_k,
-        )
+        with span("find_similar_reports", candidates=len(candidate_embs)):
+            matches = await run_in_threadpool(
+                service.find_similar_reports,
+                query_emb,
+                candidate_embs,
+                request.candidate_ids,
+                request.threshold,
+                request.top_k,
+            )
 
         return {
             "success": True,
@@ -262,11 +693,218 @@ async def find_similar(request: FindSimilarRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _resolve_text(service, report: Optional[ReportData], text: Optional[str]) -> str:
+    """Embedding input from either a report or raw text"""
+    if report is not None:
+        return service.create_report_text(report.dict())
+    if text:
+        return text
+    raise HTTPException(status_code=400, detail="Either 'report' or 'text' is required")
+
+
+def _require_vector_store():
+    store = get_vector_store()
+    if store is None:
+        raise HTTPException(status_code=503, detail="Database matching is not enabled")
+    return store
+
+
+@embedding_router.post("/api/v1/embeddings/find-similar-db")
+async def find_similar_db(request: DbFindSimilarRequest):
+    """
+    Embed a report and find similar stored reports with a pgvector query
+
+    Returns:
+        - matches: List of (id, similarity) tuples
+    """
+    store = _require_vector_store()
+
+    try:
+        # Query model and stored vectors from the same serving version
+        version, service = await serving_embeddings(store)
+        text = _resolve_text(service, request.report, request.text)
+        embedding = await run_in_threadpool(service.generate_embedding, text)
+
+        with span("vector_store.find_similar", top_k=request.top_k):
+            matches = await store.find_similar(
+                embedding,
+                request.threshold,
+                request.top_k,
+                [str(report_id) for report_id in request.exclude_ids],
+                version,
+            )
+
+        return {
+            "success": True,
+            "matches": [
+                {"id": match_id, "similarity": score} for match_id, score in matches
+            ],
+            "count": len(matches),
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error finding similar reports in database: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@embedding_router.post("/api/v1/embeddings/store")
+async def store_embeddings(request: StoreEmbeddingsRequest):
+    """
+    Compute embeddings for many reports and write them to the database
+
+    Embeddings go to the serving version; while a migration runs they are
+    also written to its shadow version with the new model.
+
+    Returns:
+        - stored: Number of reports updated
+        - shadow_stored: Number written to the shadow version (if migrating)
+    """
+    store = _require_vector_store()
+
+    try:
+        version, shadow = await store.versions()
+        service = await run_in_threadpool(get_embedding_service, serving_model_id(version))
+        texts = [_resolve_text(service, item.report, item.text) for item in request.items]
+        report_ids = [item.report_id for item in request.items]
+        embeddings = await run_in_threadpool(service.batch_generate_embeddings, texts)
+
+        with span("vector_store.write_embeddings", count=len(texts)):
+            stored = await store.write_embeddings(zip(report_ids, embeddings), version=version)
+
+        shadow_stored = None
+        if shadow is not None and shadow != version:
+            shadow_service = await run_in_threadpool(get_embedding_service, shadow)
+            shadow_embeddings = await run_in_threadpool(
+                shadow_service.batch_generate_embeddings, texts
+            )
+            with span("vector_store.write_embeddings", count=len(texts), version=shadow):
+                shadow_stored = await store.write_embeddings(
+                    zip(report_ids, shadow_embeddings), version=shadow
+                )
+
+        return {
+            "success": True,
+            "stored": stored,
+            "shadow_stored": shadow_stored,
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error storing embeddings: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@embedding_router.get("/api/v1/embeddings/migration")
+async def embedding_migration_status():
+    """
+    Serving embedding version and model migrations
+
+    Returns:
+        - serving: Version queries read (null = fraud_reports.embedding) and its model
+        - shadow_version: Version a running migration fills
+        - migrations: migrate_embeddings jobs with phase, progress, rate
+          (items_per_sec, eta_seconds), CPU share and validation results
+    """
+    store = _require_vector_store()
+    await store.refresh_versions()
+    return {"success": True, **migration_status(store, get_job_manager().list())}
+
+
+@embedding_router.post(
+    "/api/v1/admin/embeddings/cutover", dependencies=[Depends(require_admin)]
+)
+async def embedding_cutover(request: EmbeddingCutoverRequest):
+    """
+    Switch the serving embedding version
+
+    For the shadow version of a migration, a migrate_embeddings job on this
+    worker must have validated it (started with cutover=false). Any other
+    version - e.g. rolling back to the previous one - must have a vector for
+    every active report. Every worker follows within
+    ML_EMBEDDING_SERVING_REFRESH seconds; all of them need the model in
+    ML_MODELS.
+    """
+    store = _require_vector_store()
+    version = request.model_version
+
+    if version is not None and version not in get_model_registry().model_ids:
+        raise HTTPException(status_code=400, detail=f"Unknown model: {version}")
+
+    _, shadow = await store.refresh_versions()
+    if version is not None and version == shadow:
+        validated = any(
+            job.type == "migrate_embeddings"
+            and job.params.get("model_id") == version
+            and (job.state or {}).get("phase") == "validated"
+            for job in get_job_manager().list()
+        )
+        if not validated:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Embedding version {version} has not been validated by a migrate_embeddings job",
+            )
+
+    try:
+        previous = await store.switch_serving(version)
+    except IncompleteVersionError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except (RuntimeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return {
+        "success": True,
+        "serving": {"model_version": version, "model_id": serving_model_id(version)},
+        "previous_version": previous,
+    }
+
+
+@embedding_router.post(
+    "/api/v1/admin/embeddings/migration/abort", dependencies=[Depends(require_admin)]
+)
+async def abort_embedding_migration(request: EmbeddingMigrationAbortRequest):
+    """
+    Abandon the running migration; queries keep using the serving version
+
+    Returns:
+        - cancelled_jobs: migrate_embeddings jobs cancelled on this worker
+        - dropped: Shadow vectors deleted (if drop_vectors)
+    """
+    store = _require_vector_store()
+    _, shadow = await store.refresh_versions()
+    if shadow is None:
+        raise HTTPException(status_code=409, detail="No embedding migration in progress")
+
+    manager = get_job_manager()
+    cancelled = []
+    for job in manager.list():
+        if (
+            job.type == "migrate_embeddings"
+            and job.status in ACTIVE_STATUSES
+            and job.params.get("model_id") == shadow
+        ):
+            manager.cancel(job.id)
+            cancelled.append(job.id)
+
+    # Jobs on other workers stop at their next batch once the shadow is cleared
+    await store.set_shadow(None)
+    dropped = await store.drop_version(shadow) if request.drop_vectors else None
+
+    return {
+        "success": True,
+        "model_version": shadow,
+        "cancelled_jobs": cancelled,
+        "dropped": dropped,
+    }
+
+
 # ============================================================================
 # IMAGE HASHING ENDPOINTS
 # ============================================================================
 
-@app.post("/api/v1/images/compute-hash")
+@image_router.post("/api/v1/images/compute-hash")
 async def compute_image_hash(request: ImageHashRequest):
     """
     Compute perceptual hashes for an image
@@ -274,10 +912,11 @@ async def compute_image_hash(request: ImageHashRequest):
     Returns:
         - hashes: Dictionary with phash, ahash, dhash, whash
         - metadata: Image width, height, format
+        - animations: Keyframe hashes (<type>_frames), frames, frames_scanned
     """
     try:
         detector = get_image_detector()
-        hashes = detector.compute_image_hashes(request.image_url)
+        hashes = await run_in_threadpool(detector.compute_image_hashes, request.image_url)
 
         if not hashes:
             raise HTTPException(
@@ -296,20 +935,23 @@ async def compute_image_hash(request: ImageHashRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/api/v1/images/compare")
+@image_router.post("/api/v1/images/compare")
 async def compare_images(request: ImageCompareRequest):
     """
     Compare two sets of image hashes
 
+    Animated images (with <type>_frames) are compared by their best frame pair.
+
     Returns:
         - is_duplicate: Boolean
         - distances: Hamming distances for each hash type
         - weighted_score: Overall similarity score
+        - frame_pair: Frames of hashes1 and hashes2 that matched best
     """
     try:
         detector = get_image_detector()
 
-        is_dup, distances, weighted_score = detector.compare_images(
+        is_dup, distances, weighted_score, frame_pair = detector.best_frame_match(
             request.hashes1, request.hashes2, request.threshold
         )
 
@@ -323,6 +965,7 @@ async def compare_images(request: ImageCompareRequest):
             "distances": distances,
             "weighted_score": float(weighted_score),
             "avg_distance": float(avg_distance) if avg_distance else None,
+            "frame_pair": frame_pair,
         }
 
     except Exception as e:
@@ -330,7 +973,7 @@ async def compare_images(request: ImageCompareRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@app.post("/api/v1/images/batch-compute-hash")
+@image_router.post("/api/v1/images/batch-compute-hash")
 async def batch_compute_hashes(request: BatchImageHashRequest):
     """
     Compute hashes for multiple images
@@ -340,7 +983,7 @@ async def batch_compute_hashes(request: BatchImageHashRequest):
     """
     try:
         detector = get_image_detector()
-        results = detector.batch_compute_hashes(request.image_urls)
+        results = await run_in_threadpool(detector.batch_compute_hashes, request.image_urls)
 
         return {
             "success": True,
@@ -353,10 +996,568 @@ async def batch_compute_hashes(request: BatchImageHashRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# ============================================================================
+# DEDUP PIPELINE
+# ============================================================================
+
+@dedup_router.post("/api/v1/dedup/check")
+async def dedup_check(request: DedupCheckRequest):
+    """
+    Full duplicate check for one report in a single call
+
+    Identifiers are looked up in the identifier index first; a definitive
+    exact match returns right away (unless stop_on_exact is off). Otherwise
+    text embedding and every image fetch+hash run concurrently; each is
+    matched against the candidates in the request and the database.
+
+    Returns:
+        - identifiers: Normalized identifiers and exact matches (or null)
+        - text: Merged text matches with their sources
+        - images: Hashes and matches per image
+        - duplicate_ids: Union of all matched report IDs
+        - short_circuited: Text and image stages were skipped
+        - timings_ms: Duration of each stage and the whole pipeline
+    """
+    if len(request.candidate_embeddings) != len(request.candidate_ids):
+        raise HTTPException(
+            status_code=400,
+            detail="candidate_embeddings and candidate_ids must have the same length",
+        )
+    for image in request.images:
+        if not image.image_url and not image.image_base64:
+            raise HTTPException(
+                status_code=400, detail="Each image needs image_url or image_base64"
+            )
+
+    try:
+        result = await run_dedup_check(request)
+        return {"success": True, **result}
+
+    except Exception as e:
+        logger.error(f"Error running dedup check: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+# ============================================================================
+# IDENTIFIER INDEX
+# ============================================================================
+
+def _require_identifier_index():
+    if not identifier_index_enabled():
+        raise HTTPException(status_code=503, detail="Identifier index is not enabled")
+    return get_identifier_index()
+
+
+def _normalize_records(records: List[IdentifierRecord]) -> List:
+    return [
+        (record.report_id, normalize_identifiers(record.identifiers.dict()))
+        for record in records
+    ]
+
+
+@index_router.post("/api/v1/identifiers/load")
+async def identifiers_load(request: IdentifierLoadRequest):
+    """
+    Replace the identifier index with the given reports
+
+    The new index is built aside and swapped in, so lookups never see a
+    partial load. Larger corpora load with the load_identifiers job.
+
+    Returns:
+        - loaded: Reports with at least one valid identifier
+    """
+    index = _require_identifier_index()
+    records = await run_in_threadpool(_normalize_records, request.records)
+    loaded = await run_in_threadpool(index.replace, records)
+    return {"success": True, "loaded": loaded}
+
+
+@index_router.post("/api/v1/identifiers/upsert")
+async def identifiers_upsert(request: IdentifierUpsertRequest):
+    """
+    Add or replace reports in the identifier index
+
+    A report whose identifiers are all empty or invalid is removed.
+    """
+    index = _require_identifier_index()
+    written = index.upsert(_normalize_records(request.records))
+    return {"success": True, "written": written}
+
+
+@index_router.post("/api/v1/identifiers/delete")
+async def identifiers_delete(request: IdentifierDeleteRequest):
+    """Remove reports from the identifier index"""
+    index = _require_identifier_index()
+    return {"success": True, "removed": index.delete(request.report_ids)}
+
+
+@index_router.post("/api/v1/identifiers/lookup")
+async def identifiers_lookup(request: IdentifierLookupRequest):
+    """
+    Exact identifier matches for a batch of queries
+
+    Returns:
+        - results: Per query, the normalized identifiers and matching reports
+          (similarity 1.0, match_type as in detector.ts)
+    """
+    index = _require_identifier_index()
+
+    normalized = [normalize_identifiers(query.identifiers.dict()) for query in request.queries]
+    matches = index.lookup_many(
+        zip(normalized, (query.exclude_ids for query in request.queries))
+    )
+
+    return {
+        "success": True,
+        "results": [
+            {"normalized": identifiers, "matches": query_matches, "count": len(query_matches)}
+            for identifiers, query_matches in zip(normalized, matches)
+        ],
+    }
+
+
+# ============================================================================
+# SHARDED INDEX
+# ============================================================================
+
+def _require_sharded_index():
+    index = get_sharded_index()
+    if index is None:
+        raise HTTPException(status_code=503, detail="Sharded search is not enabled")
+    return index
+
+
+def _lexical_keys(items: List[IndexItem]) -> List:
+    """(report_id, LSH keys) for items with a report or text"""
+    blocker = get_lexical_blocker()
+    lexical = []
+    for item in items:
+        keys = blocker.keys_for(item.report.dict() if item.report else None, item.text)
+        if keys is not None:
+            lexical.append((item.report_id, keys))
+    return lexical
+
+
+@index_router.post("/api/v1/index/upsert")
+async def index_upsert(request: IndexUpsertRequest):
+    """
+    Add or replace reports (embedding and image hashes) in the sharded index
+
+    Items without an embedding are embedded from their report or text;
+    items with a report or text also get LSH keys for lexical blocking.
+
+    Shards are written independently, so a 503 can leave the batch
+    partially applied; upserts are idempotent and the request can be retried.
+
+    Returns:
+        - embeddings / images / lexical: Number of entries written
+    """
+    import numpy as np
+
+    index = _require_sharded_index()
+
+    try:
+        service = get_embedding_service()
+        _check_dimension(
+            service, [item.embedding for item in request.items if item.embedding is not None]
+        )
+        to_embed = [item for item in request.items if item.embedding is None]
+        texts = [_resolve_text(service, item.report, item.text) for item in to_embed]
+        computed = iter(await run_in_threadpool(service.batch_generate_embeddings, texts))
+
+        embeddings = [
+            (
+                item.report_id,
+                next(computed) if item.embedding is None
+                else np.asarray(item.embedding, dtype=np.float32),
+            )
+            for item in request.items
+        ]
+        images = [
+            {"report_id": item.report_id, "image_id": image.image_id, "hashes": image.hashes}
+            for item in request.items
+            for image in item.images
+        ]
+
+        # Keys are stored even while blocking is off, so the index is backfilled
+        lexical = await run_in_threadpool(_lexical_keys, request.items)
+
+        written = await index.upsert(embeddings=embeddings, images=images, lexical=lexical)
+        return {"success": True, **written}
+
+    except HTTPException:
+        raise
+    except ShardError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error updating sharded index: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@index_router.post("/api/v1/index/delete")
+async def index_delete(request: IndexDeleteRequest):
+    """Remove reports and their images from the sharded index"""
+    index = _require_sharded_index()
+
+    try:
+        removed = await index.delete(request.report_ids)
+        return {"success": True, "removed": removed}
+
+    except ShardError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error deleting from sharded index: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@index_router.post("/api/v1/index/search")
+async def index_search(request: IndexSearchRequest):
+    """
+    Find similar reports across all shards
+
+    With a report or text (and blocking enabled), only reports sharing an
+    LSH band with it are scored; otherwise every stored vector is scanned.
+
+    Returns:
+        - matches: Merged top_k matches above the threshold
+        - mode: "blocked" or "exhaustive"
+        - candidates: Vectors scored (blocked mode)
+        - failed_shards: Shards that did not answer (results are partial)
+    """
+    import numpy as np
+
+    index = _require_sharded_index()
+
+    try:
+        if request.embedding is not None:
+            embedding = np.asarray(request.embedding, dtype=np.float32)
+        else:
+            service = get_embedding_service()
+            text = _resolve_text(service, request.report, request.text)
+            embedding = await run_in_threadpool(service.generate_embedding, text)
+
+        keys = None
+        if request.blocking and lexical_blocking_enabled():
+            keys = get_lexical_blocker().keys_for(
+                request.report.dict() if request.report else None, request.text
+            )
+
+        candidates = None
+        if keys is not None:
+            matches, failed, candidates = await index.search_blocked(
+                embedding,
+                keys,
+                request.threshold,
+                request.top_k,
+                request.max_candidates or get_lexical_blocker().max_candidates,
+                request.exclude_ids,
+            )
+        else:
+            matches, failed = await index.search_embeddings(
+                embedding, request.threshold, request.top_k, request.exclude_ids
+            )
+
+        return {
+            "success": True,
+            "matches": [
+                {"id": match_id, "similarity": score} for match_id, score in matches
+            ],
+            "count": len(matches),
+            "mode": "blocked" if keys is not None else "exhaustive",
+            "candidates": candidates,
+            "failed_shards": failed,
+        }
+
+    except HTTPException:
+        raise
+    except ShardError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error searching sharded index: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@index_router.post("/api/v1/index/search-images")
+async def index_search_images(request: IndexImageSearchRequest):
+    """
+    Find similar images across all shards
+
+    Returns:
+        - matches: Merged top_k matches sorted by weighted_score
+        - failed_shards: Shards that did not answer (results are partial)
+    """
+    index = _require_sharded_index()
+
+    try:
+        matches, failed = await index.search_images(
+            request.hashes, request.threshold, request.top_k
+        )
+        return {
+            "success": True,
+            "matches": matches,
+            "count": len(matches),
+            "failed_shards": failed,
+        }
+
+    except ShardError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error searching sharded index images: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@index_router.get("/api/v1/index/shards")
+async def index_shards():
+    """Shard membership, coordinator counters and per-shard sizes"""
+    index = _require_sharded_index()
+    return {
+        "success": True,
+        **index.stats(),
+        "shards": await index.shard_stats(),
+    }
+
+
+@index_router.post("/api/v1/admin/index/shards", dependencies=[Depends(require_admin)])
+async def set_index_shards(request: ShardMembershipRequest):
+    """
+    Change shard membership and rebalance
+
+    Only reports whose owner changed are moved; queries keep working while
+    they move.
+    """
+    index = _require_sharded_index()
+
+    try:
+        members = parse_shard_specs(request.shards)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        result = await index.set_members(members)
+        return {"success": True, **result}
+
+    except ShardError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+
+@index_router.post("/api/v1/admin/index/compact", dependencies=[Depends(require_admin)])
+async def compact_index():
+    """
+    Compact and snapshot every shard now
+
+    Normally the per-shard maintainer does this when tombstones or the
+    write-ahead log grow past their thresholds.
+    """
+    index = _require_sharded_index()
+    return {"success": True, "shards": await index.compact()}
+
+
+async def require_shard_token(x_shard_token: Optional[str] = Header(None)):
+    """Dependency guarding the shard endpoint (coordinators send ML_SHARD_TOKEN)"""
+    token = shard_token()
+    if not token:
+        raise HTTPException(status_code=403, detail="Shard endpoint is disabled (ML_SHARD_TOKEN not set)")
+    if not x_shard_token or not secrets.compare_digest(x_shard_token, token):
+        raise HTTPException(status_code=401, detail="Invalid shard token")
+
+
+@index_router.post("/api/v1/shard/{op}", dependencies=[Depends(require_shard_token)])
+async def shard_operation(op: str, request: Request):
+    """
+    Serve this node's partition to a remote coordinator (ML_SHARDS=<this node>)
+    """
+    try:
+        args = await request.json()
+        if not isinstance(args, dict):
+            raise ValueError("Shard operation arguments must be a JSON object")
+        result = await run_in_threadpool(execute_shard_op, get_local_index(), op, args)
+        return {"success": True, "result": to_jsonable(result)}
+
+    except (KeyError, TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+# ============================================================================
+# BACKGROUND JOBS
+# ============================================================================
+
+# Job types that only admins may submit or cancel: a migration switches the
+# serving embedding version, and its params can relax validation
+ADMIN_JOB_TYPES = {"migrate_embeddings"}
+
+
+def _get_job_or_404(job_id: str):
+    job = get_job_manager().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@app.post("/api/v1/jobs")
+async def submit_job(request: JobSubmitRequest, x_admin_token: Optional[str] = Header(None)):
+    """
+    Submit a bulk job (reembed, rehash, cluster, load_identifiers,
+    migrate_embeddings - as far as this worker's role serves them)
+
+    migrate_embeddings needs the admin token (X-Admin-Token).
+
+    Returns:
+        - job: Job ID and initial status
+    """
+    manager = get_job_manager()
+    if request.type not in manager.job_types:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown job type '{request.type}' (available: {', '.join(manager.job_types)})",
+        )
+    if request.type in ADMIN_JOB_TYPES:
+        await require_admin(x_admin_token)
+
+    try:
+        job = await run_in_threadpool(manager.submit, request.type, request.params)
+        return {"success": True, "job": job.progress()}
+
+    except Exception as e:
+        logger.error(f"Error submitting job: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/api/v1/jobs")
+async def list_jobs():
+    """List all known jobs with their progress"""
+    jobs = [job.progress() for job in get_job_manager().list()]
+    return {"success": True, "jobs": jobs, "count": len(jobs)}
+
+
+@app.get("/api/v1/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    Job status
+
+    Returns:
+        - job: Status, processed/total, items_per_sec, eta_seconds, result
+    """
+    return {"success": True, "job": _get_job_or_404(job_id).progress()}
+
+
+@app.post("/api/v1/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str, x_admin_token: Optional[str] = Header(None)):
+    """Cancel a queued job, or stop a running one at its next checkpoint"""
+    if _get_job_or_404(job_id).type in ADMIN_JOB_TYPES:
+        await require_admin(x_admin_token)
+    job = get_job_manager().cancel(job_id)
+    return {"success": True, "job": job.progress()}
+
+
+@app.get("/api/v1/jobs/{job_id}/results")
+async def get_job_results(job_id: str, offset: int = 0, limit: int = 100):
+    """Page through committed result lines of a job"""
+    _get_job_or_404(job_id)
+    limit = min(max(limit, 1), 1000)
+
+    results = await run_in_threadpool(
+        get_job_manager().read_results, job_id, max(offset, 0), limit
+    )
+    return {"success": True, "results": results, "count": len(results), "offset": offset}
+
+
+# ============================================================================
+# ADMIN ENDPOINTS
+# ============================================================================
+
+@app.post("/api/v1/admin/profile", dependencies=[Depends(require_admin)])
+async def profile_worker(request: ProfileRequest):
+    """
+    Sample all threads of this worker for the requested duration
+
+    Returns:
+        - Collapsed stacks (text/plain) or speedscope JSON as a file download
+    """
+    if not profiler_lock.acquire(blocking=False):
+        raise HTTPException(status_code=409, detail="A profile is already running")
+
+    profiler = SamplingProfiler(interval=request.interval_ms / 1000.0, mode=request.mode)
+    try:
+        profiler.start()
+        try:
+            await asyncio.sleep(request.seconds)
+        finally:
+            profiler.stop()
+    finally:
+        profiler_lock.release()
+
+    body, media_type = profiler.render(request.format)
+    extension = "speedscope.json" if request.format == "speedscope" else "collapsed.txt"
+    filename = f"ml-profile-{int(time.time())}-{request.mode}.{extension}"
+
+    return Response(
+        content=body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@app.get("/api/v1/admin/profiles/{profile_id}", dependencies=[Depends(require_admin)])
+async def get_request_profile(profile_id: str):
+    """
+    Download a per-request profile captured via the X-Profile header
+    """
+    profile = get_profile_store().get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+
+    body, media_type = profile
+    return Response(content=body, media_type=media_type)
+
+
 # ============================================================================
 # HEALTH CHECK
 # ============================================================================
 
+@app.get("/api/v1/stats")
+async def service_stats():
+    """
+    Runtime statistics
+
+    Components outside this worker's role are null.
+
+    Returns:
+        - startup: Service role, import and startup phase durations
+        - models: Per-model load time, resident size, requests, singleflight
+          and inference queue stats
+        - singleflight: Executed vs coalesced image hash calls
+        - jobs: Job counts by status
+        - admission: Per-lane active/queued/shed counts
+        - index: Sharded search membership and query counters (if enabled)
+        - identifiers: Identifier index size and lookup counters (if enabled)
+        - embedding_migration: Serving embedding version and running
+          migrations (if database matching is enabled)
+    """
+    embeddings = role_includes("embeddings")
+    index = get_sharded_index()
+    store = get_vector_store()
+
+    return {
+        "success": True,
+        "startup": get_startup_report().stats(),
+        "models": get_model_registry().stats() if embeddings else None,
+        "singleflight": {
+            "images": get_image_detector().inflight.stats() if role_includes("images") else None,
+        },
+        "jobs": get_job_manager().stats(),
+        "admission": get_admission_controller().stats(),
+        "index": index.stats() if index is not None else None,
+        "identifiers": (
+            get_identifier_index().stats()
+            if embeddings and identifier_index_enabled() else None
+        ),
+        "embedding_migration": (
+            migration_status(store, get_job_manager().list(), active_only=True)
+            if embeddings and store is not None else None
+        ),
+    }
+
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
@@ -364,24 +1565,49 @@ async def health_check():
         "status": "healthy",
         "service": "ml-service",
         "version": "1.0.0",
+        "role": SERVICE_ROLE,
     }
 
 
 @app.get("/")
 async def root():
     """Root endpoint"""
+    endpoints = {}
+    if role_includes("embeddings"):
+        endpoints.update(
+            {
+                "embeddings": "/api/v1/embeddings/*",
+                "index": "/api/v1/index/*",
+                "identifiers": "/api/v1/identifiers/*",
+            }
+        )
+    if role_includes("images"):
+        endpoints["images"] = "/api/v1/images/*"
+    if SERVICE_ROLE == "all":
+        endpoints["dedup"] = "/api/v1/dedup/check"
+
     return {
         "service": "Scamnemesis ML Service",
         "version": "1.0.0",
-        "endpoints": {
-            "embeddings": "/api/v1/embeddings/*",
-            "images": "/api/v1/images/*",
-            "health": "/health",
-            "docs": "/docs",
-        },
+        "role": SERVICE_ROLE,
+        "endpoints": {**endpoints, "health": "/health", "docs": "/docs"},
     }
 
 
+# ============================================================================
+# ROUTES PER SERVICE ROLE
+# ============================================================================
+
+if role_includes("embeddings"):
+    app.include_router(embedding_router)
+    app.include_router(index_router)
+if role_includes("images"):
+    app.include_router(image_router)
+if SERVICE_ROLE == "all":
+    # The dedup check runs text and image stages in one process
+    app.include_router(dedup_router)
+
+
 # ============================================================================
 # RUN SERVER
 # ============================================================================
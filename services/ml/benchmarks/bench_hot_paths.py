@@ -0,0 +1,333 @@
+"""
+Microbenchmarks for the embedding and image hashing hot paths
+
+All inputs are synthetic and generated locally from a fixed seed (texts from a
+small multilingual vocabulary, random unit vectors, drawn images, random
+hashes), so runs are reproducible and need no network access. The embedding
+model must already be in the local cache.
+
+Usage (from services/ml):
+    python benchmarks/bench_hot_paths.py --output bench.json
+    python benchmarks/bench_hot_paths.py --suite images --quick
+    python benchmarks/bench_hot_paths.py --baseline main.json --max-regression 0.15 \\
+        --fail-on-regression
+
+Results are written as JSON: {"meta": {...}, "results": {case: stats}} where
+stats hold min/median/mean/p95 wall time in milliseconds per call.
+"""
+
+from typing import Callable, Dict, List, Optional
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Service modules live one directory up and use flat imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+logger = logging.getLogger("benchmarks")
+
+VOCABULARY = [
+    "investícia", "kryptomeny", "výnos", "bitcoin", "podvod", "peniaze", "účet",
+    "banka", "zmluva", "Bratislava", "Košice", "Praha", "firma", "web", "email",
+    "telefón", "inzerát", "auto", "predaj", "záloha", "zmizol", "garantovaný",
+    "investment", "guaranteed", "profit", "transfer", "wallet", "refund",
+    "Überweisung", "Gewinn", "Konto", "platba", "faktúra", "kuriér", "balík",
+]
+
+TEXT_LENGTHS = {"short": 8, "medium": 60, "long": 300}
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def measure(fn: Callable[[], object], repeat: int, warmup: int, items: int = 1) -> Dict:
+    """
+    Time repeated calls of fn
+
+    Args:
+        fn: Zero-argument callable to benchmark
+        repeat: Number of timed calls
+        warmup: Number of untimed calls first
+        items: Work items per call (for throughput)
+
+    Returns:
+        Dictionary with timing statistics in milliseconds
+    """
+    for _ in range(warmup):
+        fn()
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000.0)
+
+    median = statistics.median(timings)
+    return {
+        "min_ms": round(min(timings), 4),
+        "median_ms": round(median, 4),
+        "mean_ms": round(statistics.fmean(timings), 4),
+        "p95_ms": round(_percentile(timings, 95), 4),
+        "repeat": repeat,
+        "items": items,
+        "items_per_sec": round(items / (median / 1000.0), 2) if median > 0 else None,
+    }
+
+
+# ============================================================================
+# SYNTHETIC INPUTS
+# ============================================================================
+
+def synthetic_texts(rng: random.Random, count: int, words: int) -> List[str]:
+    return [
+        " ".join(rng.choice(VOCABULARY) for _ in range(words)) for _ in range(count)
+    ]
+
+
+def synthetic_embeddings(seed: int, count: int, dim: int):
+    import numpy as np
+
+    generator = np.random.default_rng(seed)
+    vectors = generator.standard_normal((count, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+
+def synthetic_image(rng: random.Random, width: int, height: int):
+    from PIL import Image, ImageDraw
+
+    img = Image.new("RGB", (width, height), (rng.randrange(256), 80, 160))
+    draw = ImageDraw.Draw(img)
+
+    for _ in range(40):
+        x0, y0 = rng.randrange(width), rng.randrange(height)
+        x1, y1 = rng.randrange(x0, width + 1), rng.randrange(y0, height + 1)
+        color = (rng.randrange(256), rng.randrange(256), rng.randrange(256))
+        if rng.random() < 0.5:
+            draw.rectangle((x0, y0, x1, y1), fill=color)
+        else:
+            draw.ellipse((x0, y0, x1, y1), fill=color)
+
+    return img
+
+
+def synthetic_hashes(rng: random.Random, hash_size: int) -> Dict[str, str]:
+    hex_len = hash_size * hash_size // 4
+    return {
+        hash_type: "".join(rng.choice("0123456789abcdef") for _ in range(hex_len))
+        for hash_type in ("phash", "ahash", "dhash", "whash")
+    }
+
+
+# ============================================================================
+# SUITES
+# ============================================================================
+
+def bench_embeddings(args, rng: random.Random) -> Dict[str, Dict]:
+    from embeddings import EmbeddingService
+
+    results = {}
+    service = EmbeddingService()
+    text_count = 16 if args.quick else 64
+
+    for length_name, words in TEXT_LENGTHS.items():
+        texts = synthetic_texts(rng, text_count, words)
+
+        results[f"generate_embedding/{length_name}"] = measure(
+            lambda: [service.generate_embedding(t) for t in texts],
+            args.repeat, args.warmup, items=len(texts),
+        )
+
+        for batch_size in (1, 8, 32, 64):
+            results[f"batch_generate_embeddings/{length_name}/bs{batch_size}"] = measure(
+                lambda: service.batch_generate_embeddings(texts, batch_size=batch_size),
+                args.repeat, args.warmup, items=len(texts),
+            )
+
+    corpus_sizes = (1_000, 10_000) if args.quick else (1_000, 10_000, 100_000)
+    query = synthetic_embeddings(args.seed, 1, service.embedding_dim)[0]
+
+    for size in corpus_sizes:
+        corpus = synthetic_embeddings(args.seed + size, size, service.embedding_dim)
+        candidate_list = list(corpus)
+        candidate_ids = [f"report-{i}" for i in range(size)]
+
+        results[f"batch_cosine_similarity/n{size}"] = measure(
+            lambda: service.batch_cosine_similarity(query, corpus),
+            args.repeat, args.warmup, items=size,
+        )
+        results[f"find_similar_reports/n{size}"] = measure(
+            lambda: service.find_similar_reports(
+                query, candidate_list, candidate_ids, threshold=0.1, top_k=10
+            ),
+            args.repeat, args.warmup, items=size,
+        )
+
+    return results
+
+
+def bench_images(args, rng: random.Random) -> Dict[str, Dict]:
+    from image_hashing import ImageDuplicateDetector
+
+    results = {}
+    detector = ImageDuplicateDetector(hash_size=8)
+
+    resolutions = [(64, 64), (512, 512), (1920, 1080)]
+    if not args.quick:
+        resolutions.append((4000, 3000))
+
+    with tempfile.TemporaryDirectory(prefix="ml-bench-") as tmp_dir:
+        for width, height in resolutions:
+            img = synthetic_image(rng, width, height)
+
+            for image_format in ("png", "jpeg", "webp"):
+                path = os.path.join(tmp_dir, f"img_{width}x{height}.{image_format}")
+                img.save(path, format=image_format.upper())
+
+                results[f"compute_image_hashes/{image_format}/{width}x{height}"] = measure(
+                    lambda: detector.compute_image_hashes(path),
+                    args.repeat, args.warmup,
+                )
+
+    target = synthetic_hashes(rng, detector.hash_size)
+    candidate_counts = (100, 1_000) if args.quick else (100, 1_000, 10_000)
+
+    for count in candidate_counts:
+        candidates = [
+            {"id": f"img-{i}", "hashes": synthetic_hashes(rng, detector.hash_size)}
+            for i in range(count)
+        ]
+        results[f"find_duplicate_images/n{count}"] = measure(
+            lambda: detector.find_duplicate_images(target, candidates, threshold=10),
+            args.repeat, args.warmup, items=count,
+        )
+
+    return results
+
+
+SUITES = {
+    "embeddings": bench_embeddings,
+    "images": bench_images,
+}
+
+
+# ============================================================================
+# REPORTING
+# ============================================================================
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            stderr=subprocess.DEVNULL,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_to_baseline(
+    results: Dict[str, Dict], baseline: Dict[str, Dict], max_regression: float
+) -> List[Dict]:
+    """
+    Compare median timings against a baseline run
+
+    Returns:
+        List of regressions (cases slower than baseline by more than max_regression)
+    """
+    regressions = []
+
+    for case, stats in sorted(results.items()):
+        base = baseline.get(case)
+        if not base or not base.get("median_ms"):
+            continue
+
+        ratio = stats["median_ms"] / base["median_ms"]
+        marker = ""
+        if ratio > 1.0 + max_regression:
+            marker = "  <-- REGRESSION"
+            regressions.append(
+                {"case": case, "baseline_ms": base["median_ms"],
+                 "current_ms": stats["median_ms"], "ratio": round(ratio, 3)}
+            )
+
+        print(f"{case:60s} {base['median_ms']:10.3f} -> {stats['median_ms']:10.3f} ms "
+              f"({ratio:5.2f}x){marker}")
+
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--suite", choices=["all", *SUITES], default="all")
+    parser.add_argument("--output", help="Write results JSON to this file")
+    parser.add_argument("--baseline", help="Results JSON from a previous run to compare with")
+    parser.add_argument("--max-regression", type=float, default=0.10,
+                        help="Allowed median slowdown vs baseline (0.10 = 10%%)")
+    parser.add_argument("--fail-on-regression", action="store_true",
+                        help="Exit with status 1 if any case regressed")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--quick", action="store_true", help="Smaller inputs for a fast run")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.WARNING)
+
+    suites = list(SUITES) if args.suite == "all" else [args.suite]
+    results: Dict[str, Dict] = {}
+
+    for suite in suites:
+        print(f"Running {suite} benchmarks...", file=sys.stderr)
+        results.update(SUITES[suite](args, random.Random(args.seed)))
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "seed": args.seed,
+            "quick": args.quick,
+            "suites": suites,
+        },
+        "results": results,
+    }
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}", file=sys.stderr)
+    else:
+        for case, stats in results.items():
+            print(f"{case:60s} median {stats['median_ms']:10.3f} ms  "
+                  f"p95 {stats['p95_ms']:10.3f} ms")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+
+        regressions = compare_to_baseline(results, baseline, args.max_regression)
+        if regressions:
+            print(f"{len(regressions)} case(s) regressed by more than "
+                  f"{args.max_regression:.0%}", file=sys.stderr)
+            if args.fail_on_regression:
+                return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
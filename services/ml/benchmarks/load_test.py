@@ -0,0 +1,457 @@
+"""
+End-to-end HTTP load test for the ML service
+
+Starts `api:app` under uvicorn plus a local HTTP server that serves a
+generated image corpus with configurable latency, then drives a weighted mix
+of endpoints at a target request rate (open loop) or concurrency (closed
+loop). Everything binds to 127.0.0.1 and the worker runs with the Hugging Face
+hub in offline mode, so no network access is needed (the embedding model
+must already be cached).
+
+Usage (from services/ml):
+    python benchmarks/load_test.py --concurrency 16 --duration 30
+    python benchmarks/load_test.py --rps 50 --mix generate=3,compute-hash=2 \\
+        --image-latency-ms 80 --output load.json
+
+Reported per endpoint: requests, errors, throughput and p50/p95/p99 latency;
+for the worker process: average/peak CPU and peak RSS (sampled from /proc).
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import aiohttp
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_hot_paths import (  # noqa: E402
+    synthetic_embeddings,
+    synthetic_hashes,
+    synthetic_image,
+    synthetic_texts,
+)
+
+SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_MIX = "generate=4,generate-from-text=2,find-similar=1,compute-hash=3,batch-compute-hash=1,compare=1"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return round(ordered[index], 3)
+
+
+# ============================================================================
+# LOCAL IMAGE SERVER
+# ============================================================================
+
+class ImageServer:
+    """Serves an in-memory image corpus with artificial latency"""
+
+    def __init__(self, images: Dict[str, Tuple[bytes, str]], latency_ms: float, jitter_ms: float):
+        self.images = images
+        self.port = _free_port()
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                delay = latency_ms + random.uniform(0, jitter_ms)
+                if delay > 0:
+                    time.sleep(delay / 1000.0)
+
+                entry = server.images.get(self.path.lstrip("/"))
+                if entry is None:
+                    self.send_error(404)
+                    return
+
+                body, content_type = entry
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", self.port), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    def url(self, name: str) -> str:
+        return f"http://127.0.0.1:{self.port}/{name}"
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+def build_image_corpus(rng: random.Random, count: int, max_side: int) -> Dict[str, Tuple[bytes, str]]:
+    formats = [("jpeg", "image/jpeg"), ("png", "image/png"), ("webp", "image/webp")]
+    corpus = {}
+
+    for i in range(count):
+        image_format, content_type = formats[i % len(formats)]
+        width = rng.randrange(max_side // 4, max_side + 1)
+        height = rng.randrange(max_side // 4, max_side + 1)
+
+        buffer = io.BytesIO()
+        synthetic_image(rng, width, height).save(buffer, format=image_format.upper())
+        corpus[f"img_{i}.{image_format}"] = (buffer.getvalue(), content_type)
+
+    return corpus
+
+
+# ============================================================================
+# WORKER PROCESS
+# ============================================================================
+
+class Worker:
+    """uvicorn running api:app, with /proc based CPU and RSS sampling"""
+
+    def __init__(self, port: int, extra_env: Dict[str, str]):
+        self.port = port
+        env = dict(os.environ)
+        env.update({"HF_HUB_OFFLINE": "1", "TRANSFORMERS_OFFLINE": "1"})
+        env.update(extra_env)
+
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "api:app",
+             "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+            cwd=SERVICE_DIR,
+            env=env,
+        )
+        self.cpu_samples: List[float] = []
+        self.rss_samples: List[int] = []
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    async def wait_ready(self, timeout: float) -> None:
+        deadline = time.monotonic() + timeout
+        async with aiohttp.ClientSession() as session:
+            while time.monotonic() < deadline:
+                if self.process.poll() is not None:
+                    raise RuntimeError("ML service exited during startup")
+                try:
+                    async with session.get(f"{self.base_url}/health") as resp:
+                        if resp.status == 200:
+                            return
+                except aiohttp.ClientError:
+                    pass
+                await asyncio.sleep(0.25)
+        raise RuntimeError(f"ML service not ready after {timeout:.0f}s")
+
+    def _read_proc(self) -> Tuple[float, int]:
+        pid = self.process.pid
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        cpu_seconds = (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+        rss_kb = 0
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    rss_kb = int(line.split()[1])
+                    break
+        return cpu_seconds, rss_kb * 1024
+
+    def _sample(self, interval: float = 0.5) -> None:
+        try:
+            last_cpu, _ = self._read_proc()
+        except OSError:
+            return
+        last_time = time.monotonic()
+
+        while not self._stop.wait(interval):
+            try:
+                cpu, rss = self._read_proc()
+            except OSError:
+                return
+            now = time.monotonic()
+            self.cpu_samples.append(100.0 * (cpu - last_cpu) / (now - last_time))
+            self.rss_samples.append(rss)
+            last_cpu, last_time = cpu, now
+
+    def start_sampling(self) -> None:
+        self._sampler.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+    def resource_summary(self) -> Dict:
+        if not self.cpu_samples:
+            return {"available": False}
+        return {
+            "available": True,
+            "cpu_percent_avg": round(sum(self.cpu_samples) / len(self.cpu_samples), 1),
+            "cpu_percent_max": round(max(self.cpu_samples), 1),
+            "rss_mb_max": round(max(self.rss_samples) / (1024 * 1024), 1),
+        }
+
+
+# ============================================================================
+# REQUEST MIX
+# ============================================================================
+
+def build_payload_factories(
+    rng: random.Random, image_server: ImageServer, candidates: int, seed: int
+) -> Dict[str, Tuple[str, Callable[[], Dict]]]:
+    """Endpoint name -> (path, payload factory)"""
+    image_names = list(image_server.images)
+    texts = synthetic_texts(rng, 256, 40)
+    vectors = synthetic_embeddings(seed, candidates + 1, 384).tolist()
+    candidate_ids = [f"report-{i}" for i in range(candidates)]
+
+    def report():
+        words = rng.choice(texts).split()
+        return {
+            "scammer_name": " ".join(words[:2]),
+            "description": " ".join(words[2:]),
+            "city": rng.choice(["Bratislava", "Košice", "Praha"]),
+            "email": f"{words[0].lower()}@example.com",
+        }
+
+    return {
+        "generate": ("/api/v1/embeddings/generate", lambda: {"report": report()}),
+        "generate-from-text": (
+            "/api/v1/embeddings/generate-from-text",
+            lambda: {"text": rng.choice(texts)},
+        ),
+        "batch-generate": (
+            "/api/v1/embeddings/batch-generate",
+            lambda: {"texts": rng.sample(texts, 32)},
+        ),
+        "find-similar": (
+            "/api/v1/embeddings/find-similar",
+            lambda: {
+                "query_embedding": vectors[-1],
+                "candidate_embeddings": vectors[:-1],
+                "candidate_ids": candidate_ids,
+                "threshold": 0.1,
+                "top_k": 10,
+            },
+        ),
+        "compute-hash": (
+            "/api/v1/images/compute-hash",
+            lambda: {"image_url": image_server.url(rng.choice(image_names))},
+        ),
+        "batch-compute-hash": (
+            "/api/v1/images/batch-compute-hash",
+            lambda: {"image_urls": [image_server.url(n) for n in rng.sample(image_names, 8)]},
+        ),
+        "compare": (
+            "/api/v1/images/compare",
+            lambda: {"hashes1": synthetic_hashes(rng, 8), "hashes2": synthetic_hashes(rng, 8)},
+        ),
+    }
+
+
+def parse_mix(mix: str, available: List[str]) -> Dict[str, float]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.strip().partition("=")
+        if name not in available:
+            raise SystemExit(f"Unknown endpoint in mix: {name} (available: {', '.join(available)})")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+# ============================================================================
+# DRIVER
+# ============================================================================
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+
+    def record(self, endpoint: str, latency_ms: float, ok: bool) -> None:
+        if ok:
+            self.latencies.setdefault(endpoint, []).append(latency_ms)
+        else:
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def summary(self, elapsed: float) -> Dict[str, Dict]:
+        endpoints = sorted(set(self.latencies) | set(self.errors))
+        return {
+            endpoint: {
+                "requests": len(self.latencies.get(endpoint, [])) + self.errors.get(endpoint, 0),
+                "errors": self.errors.get(endpoint, 0),
+                "throughput_rps": round(len(self.latencies.get(endpoint, [])) / elapsed, 2),
+                "p50_ms": _percentile(self.latencies.get(endpoint, []), 50),
+                "p95_ms": _percentile(self.latencies.get(endpoint, []), 95),
+                "p99_ms": _percentile(self.latencies.get(endpoint, []), 99),
+            }
+            for endpoint in endpoints
+        }
+
+
+async def run_load(args, base_url: str, factories, weights: Dict[str, float]) -> Tuple[Recorder, float]:
+    recorder = Recorder()
+    names = list(weights)
+    rng = random.Random(args.seed)
+    timeout = aiohttp.ClientTimeout(total=args.request_timeout)
+    connector = aiohttp.TCPConnector(limit=0)
+
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+
+        async def one_request():
+            endpoint = rng.choices(names, weights=[weights[n] for n in names])[0]
+            path, payload_factory = factories[endpoint]
+            payload = payload_factory()
+
+            start = time.perf_counter()
+            try:
+                async with session.post(base_url + path, json=payload) as resp:
+                    await resp.read()
+                    ok = resp.status == 200
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                ok = False
+            recorder.record(endpoint, (time.perf_counter() - start) * 1000.0, ok)
+
+        start = time.monotonic()
+        deadline = start + args.duration
+
+        if args.rps:
+            # Open loop: fire on a fixed schedule regardless of response times
+            in_flight = set()
+            next_at = start
+            while next_at < deadline:
+                await asyncio.sleep(max(0.0, next_at - time.monotonic()))
+                task = asyncio.create_task(one_request())
+                in_flight.add(task)
+                task.add_done_callback(in_flight.discard)
+                next_at += 1.0 / args.rps
+            if in_flight:
+                await asyncio.gather(*in_flight)
+        else:
+            # Closed loop: N clients issuing back-to-back requests
+            async def client():
+                while time.monotonic() < deadline:
+                    await one_request()
+
+            await asyncio.gather(*(client() for _ in range(args.concurrency)))
+
+        return recorder, time.monotonic() - start
+
+
+async def main_async(args) -> Dict:
+    rng = random.Random(args.seed)
+
+    print(f"Generating {args.images} images...", file=sys.stderr)
+    image_server = ImageServer(
+        build_image_corpus(rng, args.images, args.image_max_side),
+        args.image_latency_ms,
+        args.image_jitter_ms,
+    )
+    image_server.start()
+
+    worker = Worker(args.port or _free_port(), {"TRACE_SAMPLE_RATE": "0"})
+    try:
+        print("Starting ML service...", file=sys.stderr)
+        await worker.wait_ready(args.startup_timeout)
+
+        factories = build_payload_factories(rng, image_server, args.candidates, args.seed)
+        weights = parse_mix(args.mix, list(factories))
+
+        worker.start_sampling()
+        mode = f"{args.rps} rps" if args.rps else f"concurrency {args.concurrency}"
+        print(f"Running load ({mode}) for {args.duration}s...", file=sys.stderr)
+        recorder, elapsed = await run_load(args, worker.base_url, factories, weights)
+    finally:
+        worker.stop()
+        image_server.stop()
+
+    endpoints = recorder.summary(elapsed)
+    total = sum(e["requests"] - e["errors"] for e in endpoints.values())
+
+    return {
+        "config": {
+            "mode": "rps" if args.rps else "concurrency",
+            "rps": args.rps,
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "mix": weights,
+            "image_latency_ms": args.image_latency_ms,
+            "image_jitter_ms": args.image_jitter_ms,
+            "images": args.images,
+        },
+        "elapsed_s": round(elapsed, 2),
+        "throughput_rps": round(total / elapsed, 2),
+        "endpoints": endpoints,
+        "worker": worker.resource_summary(),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    load = parser.add_mutually_exclusive_group()
+    load.add_argument("--rps", type=float, help="Target requests per second (open loop)")
+    load.add_argument("--concurrency", type=int, default=8, help="Concurrent clients (closed loop)")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds of load")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="endpoint=weight,... request mix")
+    parser.add_argument("--images", type=int, default=30, help="Images in the generated corpus")
+    parser.add_argument("--image-max-side", type=int, default=1024)
+    parser.add_argument("--image-latency-ms", type=float, default=50.0)
+    parser.add_argument("--image-jitter-ms", type=float, default=20.0)
+    parser.add_argument("--candidates", type=int, default=500, help="Candidates per find-similar call")
+    parser.add_argument("--port", type=int, help="Port for the ML service (default: random)")
+    parser.add_argument("--startup-timeout", type=float, default=180.0)
+    parser.add_argument("--request-timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--output", help="Write the report JSON to this file")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(main_async(args))
+
+    print(f"\n{'endpoint':22s} {'reqs':>7s} {'err':>5s} {'rps':>8s} "
+          f"{'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s}")
+    for endpoint, stats in report["endpoints"].items():
+        print(f"{endpoint:22s} {stats['requests']:7d} {stats['errors']:5d} "
+              f"{stats['throughput_rps']:8.2f} {stats['p50_ms'] or 0:9.1f} "
+              f"{stats['p95_ms'] or 0:9.1f} {stats['p99_ms'] or 0:9.1f}")
+    print(f"\nTotal throughput: {report['throughput_rps']} rps")
+    print(f"Worker: {report['worker']}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
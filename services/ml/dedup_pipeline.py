@@ -0,0 +1,278 @@
+"""
+One-shot duplicate check for a new report
+Exact identifiers (phone, email, IBAN, ...) are looked up first in the
+in-memory identifier index; a definitive hit ends the check there. Otherwise
+runs the text stage (embed -> match) and every image stage (fetch/decode ->
+hash -> match) concurrently and merges the results, so latency tracks the
+slowest stage instead of the sum of separate HTTP round trips.
+
+Candidate sources:
+- request: candidate embeddings / image hashes sent with the request
+- database: pgvector nearest neighbours (when ML_DB_MATCHING is enabled), in
+  the serving embedding version with that version's model
+- index: sharded in-memory index of embeddings and image hashes (when
+  ML_SHARDS is set); with ML_LEXICAL_BLOCKING on, text matching is
+  restricted to lexical (MinHash/LSH) candidates
+"""
+
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+import asyncio
+import base64
+import binascii
+import logging
+import time
+import uuid
+
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+
+from embedding_migration import serving_embeddings
+from embeddings import get_embedding_service
+from identifier_index import get_identifier_index, identifier_index_enabled, normalize_identifiers
+from image_hashing import get_image_detector
+from lexical_blocking import get_lexical_blocker, lexical_blocking_enabled
+from sharding import get_sharded_index
+from tracing import span
+from vector_store import get_vector_store
+
+logger = logging.getLogger(__name__)
+
+
+class StageTimer:
+    """Collects wall-clock duration per pipeline stage"""
+
+    def __init__(self):
+        self.timings: Dict[str, float] = {}
+
+    @contextmanager
+    def measure(self, name: str):
+        start = time.perf_counter()
+        try:
+            with span(f"pipeline.{name}"):
+                yield
+        finally:
+            self.timings[name] = round((time.perf_counter() - start) * 1000.0, 3)
+
+    async def run(self, name: str, awaitable):
+        with self.measure(name):
+            return await awaitable
+
+
+def _merge_text_matches(sources: Dict[str, List]) -> List[Dict]:
+    """Merge (id, similarity) lists from several sources, keeping the best score"""
+    merged: Dict[str, Dict] = {}
+
+    for source, matches in sources.items():
+        for match_id, score in matches:
+            entry = merged.setdefault(
+                match_id, {"id": match_id, "similarity": score, "sources": []}
+            )
+            entry["similarity"] = max(entry["similarity"], score)
+            entry["sources"].append(source)
+
+    return sorted(merged.values(), key=lambda m: m["similarity"], reverse=True)
+
+
+async def _text_stage(request, timer: StageTimer) -> Dict:
+    service = get_embedding_service()
+    store = get_vector_store()
+    index = get_sharded_index()
+    exclude = [request.report_id] if request.report_id else []
+
+    text = service.create_report_text(request.report.dict())
+    embedding = await timer.run(
+        "text.embed", run_in_threadpool(service.generate_embedding, text)
+    )
+
+    matchers = {}
+    if request.candidate_embeddings:
+        matchers["request"] = timer.run(
+            "text.match_request",
+            run_in_threadpool(
+                service.find_similar_reports,
+                embedding,
+                [np.asarray(e, dtype=np.float32) for e in request.candidate_embeddings],
+                request.candidate_ids,
+                request.text_threshold,
+                request.top_k,
+            ),
+        )
+    if store is not None and request.use_database:
+        matchers["database"] = timer.run(
+            "text.match_database",
+            _database_text_matches(store, service, text, embedding, request, exclude),
+        )
+
+    if index is not None and request.use_index:
+        matchers["index"] = timer.run(
+            "text.match_index",
+            _index_text_matches(index, embedding, request, exclude),
+        )
+
+    results = await asyncio.gather(*matchers.values())
+    matches = _merge_text_matches(dict(zip(matchers, results)))
+
+    return {
+        "matches": matches[: request.top_k],
+        "sources": list(matchers),
+    }
+
+
+async def _database_text_matches(store, service, text, embedding, request, exclude) -> List:
+    version, serving = await serving_embeddings(store)
+    if serving is not service:
+        # The database serves another model's vectors (e.g. after a migration)
+        embedding = await run_in_threadpool(serving.generate_embedding, text)
+    # Non-UUID IDs cannot be in fraud_reports (and would fail the uuid[] cast)
+    exclude = [report_id for report_id in exclude if _is_uuid(report_id)]
+    return await store.find_similar(
+        embedding, request.text_threshold, request.top_k, exclude, version
+    )
+
+
+def _is_uuid(value: str) -> bool:
+    try:
+        uuid.UUID(value)
+    except ValueError:
+        return False
+    return True
+
+
+async def _index_text_matches(index, embedding, request, exclude) -> List:
+    if lexical_blocking_enabled():
+        blocker = get_lexical_blocker()
+        matches, _, _ = await index.search_blocked(
+            embedding,
+            blocker.report_keys(request.report.dict()),
+            request.text_threshold,
+            request.top_k,
+            blocker.max_candidates,
+            exclude,
+        )
+    else:
+        matches, _ = await index.search_embeddings(
+            embedding, request.text_threshold, request.top_k, exclude
+        )
+    return matches
+
+
+async def _image_stage(index: int, image, request, timer: StageTimer) -> Dict:
+    detector = get_image_detector()
+
+    if image.image_base64:
+        try:
+            data = base64.b64decode(image.image_base64, validate=True)
+        except (binascii.Error, ValueError):
+            return {"index": index, "error": "Invalid base64 image data", "matches": []}
+        hashing = run_in_threadpool(detector.compute_image_hashes_from_bytes, data)
+    else:
+        hashing = run_in_threadpool(detector.compute_image_hashes, image.image_url)
+
+    hashes = await timer.run(f"images[{index}].hash", hashing)
+    if not hashes:
+        return {"index": index, "error": "Failed to compute hashes for image", "matches": []}
+
+    matchers = []
+    if request.image_candidates:
+        candidates = [c.dict() for c in request.image_candidates]
+        matchers.append(
+            timer.run(
+                f"images[{index}].match_request",
+                run_in_threadpool(
+                    detector.find_duplicate_images, hashes, candidates, request.image_threshold
+                ),
+            )
+        )
+    sharded_index = get_sharded_index()
+    if sharded_index is not None and request.use_index:
+        matchers.append(
+            timer.run(
+                f"images[{index}].match_index",
+                _index_image_matches(sharded_index, hashes, request),
+            )
+        )
+
+    matches = [m for result in await asyncio.gather(*matchers) for m in result]
+    matches.sort(key=lambda m: m["weighted_score"])
+
+    return {"index": index, "hashes": hashes, "matches": matches, "error": None}
+
+
+async def _index_image_matches(index, hashes: Dict, request) -> List[Dict]:
+    matches, _ = await index.search_images(hashes, request.image_threshold, request.top_k)
+    if request.report_id:
+        matches = [m for m in matches if m["id"] != request.report_id]
+    return matches
+
+
+def _identifier_stage(request, timer: StageTimer) -> Optional[Dict]:
+    """Exact identifier matches (None if the request has no usable identifiers)"""
+    if request.identifiers is None or not identifier_index_enabled():
+        return None
+
+    with timer.measure("identifiers"):
+        identifiers = normalize_identifiers(request.identifiers.dict())
+        if not identifiers:
+            return None
+
+        exclude = [request.report_id] if request.report_id else []
+        matches = get_identifier_index().lookup(identifiers, exclude)
+
+    return {
+        "normalized": identifiers,
+        "matches": matches,
+        "definitive": any(m["definitive"] for m in matches),
+    }
+
+
+async def run_dedup_check(request) -> Dict:
+    """
+    Run the full duplicate check for one report
+
+    Args:
+        request: DedupCheckRequest (see api.py)
+
+    Returns:
+        Exact identifier, text and image matches, duplicate report IDs and
+        stage timings
+    """
+    timer = StageTimer()
+    start = time.perf_counter()
+
+    identifier_result = _identifier_stage(request, timer)
+    if identifier_result is not None and identifier_result["definitive"] and request.stop_on_exact:
+        # Embedding and image work cannot change the verdict
+        timer.timings["total"] = round((time.perf_counter() - start) * 1000.0, 3)
+        return {
+            "identifiers": identifier_result,
+            "text": {"matches": [], "sources": []},
+            "images": [],
+            "duplicate_ids": sorted(m["id"] for m in identifier_result["matches"]),
+            "short_circuited": True,
+            "timings_ms": timer.timings,
+        }
+
+    stages = [_text_stage(request, timer)]
+    stages += [
+        _image_stage(i, image, request, timer) for i, image in enumerate(request.images)
+    ]
+
+    text_result, *image_results = await asyncio.gather(*stages)
+
+    duplicate_ids = {m["id"] for m in text_result["matches"]}
+    if identifier_result is not None:
+        duplicate_ids.update(m["id"] for m in identifier_result["matches"])
+    for image_result in image_results:
+        duplicate_ids.update(m["id"] for m in image_result["matches"])
+
+    timer.timings["total"] = round((time.perf_counter() - start) * 1000.0, 3)
+
+    return {
+        "identifiers": identifier_result,
+        "text": text_result,
+        "images": image_results,
+        "duplicate_ids": sorted(duplicate_ids),
+        "short_circuited": False,
+        "timings_ms": timer.timings,
+    }
@@ -0,0 +1,371 @@
+"""
+Durable search index: write-ahead log, snapshots and background compaction
+Every index mutation is appended to a write-ahead log before the batch is
+acknowledged. The maintainer thread periodically compacts the index (drops
+tombstones), writes the compacted version as a snapshot and deletes the log
+segments it covers, so a restart costs one snapshot load plus a short replay.
+
+Configuration (environment):
+- ML_INDEX_DIR: Base directory for index data, one subdirectory per shard
+  (default <system temp dir>/ml-service/index, outside the bind-mounted app
+  directory; empty = in-memory only)
+- ML_INDEX_FSYNC: fsync the log on every committed batch (default on)
+- ML_INDEX_SNAPSHOT_RECORDS: Log records that trigger a snapshot (default 50000)
+- ML_INDEX_COMPACT_RATIO: Tombstone share that triggers compaction (default 0.2)
+- ML_INDEX_MAINTENANCE_INTERVAL: Seconds between maintenance checks (default 10)
+
+On-disk layout per index:
+- snapshot.npz: Compacted index and the last log sequence number it contains
+- wal-<first lsn>.jsonl: Log segments, one mutation per line
+"""
+
+from typing import Dict, Iterator, List, Optional, Tuple
+import base64
+import glob
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from search_index import SearchIndex, state_from_arrays, state_to_arrays
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FILE = "snapshot.npz"
+
+
+def _env_flag(name: str, default: str) -> bool:
+    return os.environ.get(name, default).strip().lower() in ("1", "true", "yes", "on")
+
+
+# ============================================================================
+# WRITE-AHEAD LOG
+# ============================================================================
+
+def encode_record(op: str, args: Tuple) -> Dict:
+    if op == "upsert_embedding":
+        vector = np.asarray(args[1], dtype=np.float32)
+        return {"op": op, "id": args[0], "v": base64.b64encode(vector.tobytes()).decode()}
+    if op == "upsert_image":
+        return {"op": op, "id": args[0], "image_id": args[1], "hashes": args[2]}
+    if op == "upsert_lexical":
+        keys = np.asarray(args[1], dtype=np.uint64)
+        return {"op": op, "id": args[0], "k": base64.b64encode(keys.tobytes()).decode()}
+    return {"op": op, "id": args[0]}
+
+
+def decode_record(record: Dict) -> Tuple[str, Tuple]:
+    op = record["op"]
+    if op == "upsert_embedding":
+        vector = np.frombuffer(base64.b64decode(record["v"]), dtype=np.float32)
+        return op, (record["id"], vector)
+    if op == "upsert_image":
+        return op, (record["id"], record["image_id"], record["hashes"])
+    if op == "upsert_lexical":
+        return op, (record["id"], np.frombuffer(base64.b64decode(record["k"]), dtype=np.uint64))
+    return op, (record["id"],)
+
+
+class WriteAheadLog:
+    """Append-only JSON-lines log split into segments at each snapshot"""
+
+    def __init__(self, directory: str, fsync: bool = True):
+        self.directory = directory
+        self.fsync = fsync
+        self.last_lsn = 0
+        self._file = None
+        self._segment_start: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _segment_path(self, first_lsn: int) -> str:
+        return os.path.join(self.directory, f"wal-{first_lsn:016d}.jsonl")
+
+    def segments(self) -> List[Tuple[int, str]]:
+        paths = glob.glob(os.path.join(self.directory, "wal-*.jsonl"))
+        return sorted(
+            (int(os.path.basename(p)[4:-6]), p) for p in paths
+        )
+
+    def replay(self, after_lsn: int) -> Iterator[Dict]:
+        """
+        Yield records with lsn > after_lsn, in order
+
+        A torn final line (crash during append) is truncated away.
+        """
+        self.last_lsn = after_lsn
+
+        for _, path in self.segments():
+            valid_bytes = 0
+            with open(path, "rb") as f:
+                for line in f:
+                    try:
+                        if not line.endswith(b"\n"):
+                            raise ValueError("incomplete line")
+                        record = json.loads(line)
+                    except ValueError:
+                        logger.warning(f"Truncating torn write-ahead log record in {path}")
+                        break
+
+                    valid_bytes += len(line)
+                    if record["lsn"] > self.last_lsn:
+                        self.last_lsn = record["lsn"]
+                        yield record
+
+            if valid_bytes < os.path.getsize(path):
+                with open(path, "r+b") as f:
+                    f.truncate(valid_bytes)
+
+    def open(self) -> None:
+        """Start appending to a new segment after the last replayed record"""
+        with self._lock:
+            self._open_segment()
+
+    def _open_segment(self) -> None:
+        self._segment_start = self.last_lsn + 1
+        self._file = open(self._segment_path(self._segment_start), "ab")
+
+    def append(self, record: Dict) -> int:
+        with self._lock:
+            self.last_lsn += 1
+            record["lsn"] = self.last_lsn
+            self._file.write(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n")
+            return self.last_lsn
+
+    def commit(self) -> None:
+        with self._lock:
+            self._sync()
+
+    def _sync(self) -> None:
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def rotate(self) -> int:
+        """
+        Close the current segment and start a new one
+
+        Returns:
+            Last lsn of the closed segments
+        """
+        with self._lock:
+            self._sync()
+            self._file.close()
+            self._open_segment()
+            return self.last_lsn
+
+    def drop_through(self, lsn: int) -> int:
+        """Delete segments holding only records <= lsn (covered by a snapshot)"""
+        dropped = 0
+        for first_lsn, path in self.segments():
+            if first_lsn <= lsn and first_lsn != self._segment_start:
+                os.remove(path)
+                dropped += 1
+        return dropped
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._sync()
+                self._file.close()
+                self._file = None
+
+
+# ============================================================================
+# DURABLE INDEX
+# ============================================================================
+
+class DurableSearchIndex(SearchIndex):
+    """SearchIndex whose mutations are logged and periodically snapshotted"""
+
+    def __init__(self, directory: str, fsync: bool = True):
+        super().__init__()
+        os.makedirs(directory, exist_ok=True)
+
+        self.directory = directory
+        self.wal = WriteAheadLog(directory, fsync=fsync)
+        self.snapshot_lsn = 0
+
+        # Statistics
+        self.snapshots = 0
+        self.replayed = 0
+        self.load_seconds = 0.0
+
+        self._load()
+
+    @property
+    def snapshot_path(self) -> str:
+        return os.path.join(self.directory, SNAPSHOT_FILE)
+
+    def _load(self) -> None:
+        start = time.perf_counter()
+
+        if os.path.exists(self.snapshot_path):
+            with np.load(self.snapshot_path, allow_pickle=False) as arrays:
+                self.snapshot_lsn = int(arrays["lsn"])
+                state = state_from_arrays(arrays)
+            with self._lock:
+                self._install(state)
+
+        with self._lock:
+            for record in self.wal.replay(self.snapshot_lsn):
+                self._apply(*decode_record(record))
+                self.replayed += 1
+
+        self.wal.open()
+        self.load_seconds = time.perf_counter() - start
+
+        stats = self.stats()
+        logger.info(
+            f"Loaded index {self.directory}: {stats['embeddings']} embeddings, "
+            f"{stats['images']} images (snapshot lsn {self.snapshot_lsn}, "
+            f"replayed {self.replayed} log records) in {self.load_seconds:.2f}s"
+        )
+
+    def _record(self, op: str, args: Tuple) -> None:
+        super()._record(op, args)
+        self.wal.append(encode_record(op, args))
+
+    def commit(self) -> None:
+        self.wal.commit()
+
+    def records_since_snapshot(self) -> int:
+        return self.wal.last_lsn - self.snapshot_lsn
+
+    def _compaction_started(self):
+        # Everything logged so far is in the captured view; later records go
+        # to a fresh segment that survives the snapshot
+        return self.wal.rotate()
+
+    def _compaction_built(self, state: Dict, lsn: int) -> None:
+        # Records after lsn may have raced into the captured arrays; replaying
+        # them on load overwrites those entries, so the snapshot stays valid
+        arrays = state_to_arrays(state)
+        arrays["lsn"] = np.array(lsn)
+
+        tmp_path = self.snapshot_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **arrays)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+
+        self.snapshot_lsn = lsn
+        self.snapshots += 1
+        self.wal.drop_through(lsn)
+
+    def stats(self) -> Dict:
+        stats = super().stats()
+        stats.update(
+            {
+                "lsn": self.wal.last_lsn,
+                "snapshot_lsn": self.snapshot_lsn,
+                "records_since_snapshot": self.records_since_snapshot(),
+                "snapshots": self.snapshots,
+                "log_segments": len(self.wal.segments()),
+                "load_seconds": round(self.load_seconds, 3),
+                "replayed": self.replayed,
+            }
+        )
+        return stats
+
+    def close(self) -> None:
+        self.wal.close()
+
+
+# ============================================================================
+# MAINTENANCE
+# ============================================================================
+
+class IndexMaintainer:
+    """Background thread that compacts (and snapshots) an index when due"""
+
+    def __init__(
+        self,
+        index: SearchIndex,
+        interval: float = 10.0,
+        snapshot_records: int = 50000,
+        compact_ratio: float = 0.2,
+    ):
+        self.index = index
+        self.interval = interval
+        self.snapshot_records = snapshot_records
+        self.compact_ratio = compact_ratio
+
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="index-maintainer", daemon=True)
+
+    def start(self) -> "IndexMaintainer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join(timeout=30)
+
+    def due(self) -> Optional[str]:
+        if self.index.tombstone_ratio() >= self.compact_ratio:
+            return "tombstones"
+        if (
+            isinstance(self.index, DurableSearchIndex)
+            and self.index.records_since_snapshot() >= self.snapshot_records
+        ):
+            return "log size"
+        return None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            reason = self.due()
+            if reason is None:
+                continue
+            try:
+                result = self.index.compact()
+                logger.info(
+                    f"Compacted index ({reason}): dropped {result['dropped']} tombstones, "
+                    f"replayed {result['replayed']} concurrent mutations"
+                )
+            except Exception as e:
+                logger.error(f"Index compaction failed: {e}")
+
+
+def open_search_index(directory: Optional[str]) -> Tuple[SearchIndex, IndexMaintainer]:
+    """
+    Open a durable index in directory (or an in-memory one if None) and
+    start its maintainer
+
+    Returns:
+        (index, maintainer)
+    """
+    if directory:
+        index = DurableSearchIndex(directory, fsync=_env_flag("ML_INDEX_FSYNC", "true"))
+    else:
+        index = SearchIndex()
+
+    maintainer = IndexMaintainer(
+        index,
+        interval=float(os.environ.get("ML_INDEX_MAINTENANCE_INTERVAL", "10")),
+        snapshot_records=int(os.environ.get("ML_INDEX_SNAPSHOT_RECORDS", "50000")),
+        compact_ratio=float(os.environ.get("ML_INDEX_COMPACT_RATIO", "0.2")),
+    )
+    return index, maintainer.start()
+
+
+def close_search_index(index: SearchIndex, maintainer: IndexMaintainer) -> None:
+    maintainer.stop()
+    if isinstance(index, DurableSearchIndex):
+        index.close()
+
+
+def index_directory(name: str) -> Optional[str]:
+    """Data directory for a named index under ML_INDEX_DIR (None = in-memory)"""
+    base = os.environ.get(
+        "ML_INDEX_DIR", os.path.join(tempfile.gettempdir(), "ml-service", "index")
+    )
+    if not base:
+        return None
+    # Shard names may be URLs
+    safe_name = "".join(c if c.isalnum() or c in "-_." else "_" for c in name)
+    return os.path.join(base, safe_name)
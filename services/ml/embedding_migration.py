@@ -0,0 +1,367 @@
+"""
+Embedding model migrations with shadow re-embedding
+Vectors of two models are not comparable, so changing the embedding model
+means recomputing every stored vector. A migration re-embeds the corpus with
+the new model into report_embeddings (tagged with the model ID) in the
+background, while queries keep reading the serving version with the model
+that produced it. Once the shadow version is complete and validated, the
+serving pointer (embedding_serving) is switched in one transaction.
+
+Each request reads the serving version once (VectorStore.versions()) and
+embeds its query with that version's model, so a query never compares
+vectors of different models - before, during or after the cutover.
+
+A migrate_embeddings job runs these phases (resumable after a restart):
+1. backfill: embed every active report without a shadow vector, keeping its
+   busy time at a CPU share of the worker; /api/v1/embeddings/store also
+   writes new embeddings to the shadow version while it runs
+2. catch-up: embed reports that appeared during the backfill
+3. index: build the version's HNSW index (CREATE INDEX CONCURRENTLY)
+4. validate: coverage, vector dimension, and a dual read - a sample of
+   reports is queried against both the serving and the shadow version;
+   every report must find itself among its top-k neighbours in the shadow
+   version (recall), and neighbour overlap between the two is reported
+5. cutover: switch serving, unless the job was started with cutover=false
+   (then POST /api/v1/admin/embeddings/cutover)
+
+Like the cutover endpoint, submitting or cancelling a migrate_embeddings job
+needs the admin token.
+
+The serving version None is the fraud_reports.embedding column, embedded with
+the default model (ML_DEFAULT_MODEL); other versions are model IDs from
+ML_MODELS. Rolling back is a cutover to the previous version, which needs
+vectors for every active report.
+
+Configuration (environment):
+- ML_MIGRATION_CPU_SHARE: Share of wall-clock time a migration may spend
+  embedding, 0-1 (default 0.25)
+- ML_MIGRATION_VALIDATION_SAMPLE: Reports queried during validation
+  (default 200)
+- ML_MIGRATION_RECALL_K: Neighbours a sampled report must appear in
+  (default 10)
+- ML_MIGRATION_MIN_RECALL: Minimum self-recall of the shadow version
+  (default 0.95)
+"""
+
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+import logging
+import os
+import time
+
+from fastapi.concurrency import run_in_threadpool
+
+from embeddings import EmbeddingService, get_embedding_service
+from model_registry import get_model_registry
+from vector_store import IncompleteVersionError, check_version, get_vector_store
+
+logger = logging.getLogger(__name__)
+
+PHASES = ("backfill", "catchup", "index", "validate", "cutover", "done")
+
+# Catch-up passes before giving up on reports that keep appearing
+MAX_CATCHUP_ROUNDS = 5
+
+
+def serving_model_id(version: Optional[str]) -> str:
+    """Registry model that produced the vectors of a version"""
+    return version or get_model_registry().default_model_id
+
+
+async def serving_embeddings(store) -> Tuple[Optional[str], EmbeddingService]:
+    """
+    One consistent snapshot of the serving version and its model
+
+    Returns:
+        (version, embedding service) - embed queries with the service and
+        pass the version to VectorStore.find_similar / write_embeddings
+    """
+    version, _ = await store.versions()
+    service = await run_in_threadpool(get_embedding_service, serving_model_id(version))
+    return version, service
+
+
+class Throttle:
+    """Keeps a loop's busy time at a share of wall-clock time"""
+
+    def __init__(self, cpu_share: float, busy_seconds: float = 0.0, paused_seconds: float = 0.0):
+        if not 0 < cpu_share <= 1:
+            raise ValueError(f"cpu_share must be in (0, 1], got {cpu_share}")
+        self.cpu_share = cpu_share
+        self.busy_seconds = busy_seconds
+        self.paused_seconds = paused_seconds
+
+    def pause_after(self, busy: float) -> float:
+        """Record a busy stretch and return the pause that restores the share"""
+        self.busy_seconds += busy
+        pause = busy * (1.0 / self.cpu_share - 1.0)
+        self.paused_seconds += pause
+        return pause
+
+    def stats(self) -> Dict:
+        total = self.busy_seconds + self.paused_seconds
+        return {
+            "cpu_share": self.cpu_share,
+            "effective_cpu_share": round(self.busy_seconds / total, 3) if total else None,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "paused_seconds": round(self.paused_seconds, 3),
+        }
+
+
+def _sleep(ctx, seconds: float) -> None:
+    """Sleep, checking for cancellation twice a second"""
+    deadline = time.monotonic() + seconds
+    while True:
+        ctx.check_cancelled()
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        time.sleep(min(remaining, 0.5))
+
+
+def validate_version(
+    run: Callable,
+    store,
+    version: str,
+    service: EmbeddingService,
+    serving_version: Optional[str],
+    serving_service: EmbeddingService,
+    sample_size: int = 200,
+    recall_k: int = 10,
+    min_recall: float = 0.95,
+) -> Dict:
+    """
+    Check a shadow version before it may serve
+
+    Args:
+        run: Executes a store coroutine from this thread (JobContext.run_async)
+        store: VectorStore
+        version: Shadow version and its model (service)
+        serving_version: Serving version and its model (serving_service)
+        sample_size: Reports queried against both versions
+        recall_k: Neighbours a sampled report must appear in
+        min_recall: Minimum share of sampled reports that find themselves
+
+    Returns:
+        missing, wrong_dimension, sample, recall, neighbour_overlap, passed
+    """
+    missing = run(store.count_reports(True, version))
+    wrong_dimension = run(store.count_wrong_dimension(version, service.embedding_dim))
+
+    sample = run(store.sample_reports(version, sample_size))
+    texts = [service.create_report_text(report) for report in sample]
+    shadow_vectors = service.batch_generate_embeddings(texts)
+    serving_vectors = serving_service.batch_generate_embeddings(texts)
+
+    found = 0
+    overlap = 0.0
+    for report, shadow_embedding, serving_embedding in zip(
+        sample, shadow_vectors, serving_vectors
+    ):
+        shadow_ids = [
+            match_id
+            for match_id, _ in run(store.find_similar(shadow_embedding, -1.0, recall_k, (), version))
+        ]
+        serving_ids = [
+            match_id
+            for match_id, _ in run(
+                store.find_similar(serving_embedding, -1.0, recall_k, (), serving_version)
+            )
+        ]
+
+        found += report["id"] in shadow_ids
+        shadow_neighbours = set(shadow_ids) - {report["id"]}
+        serving_neighbours = set(serving_ids) - {report["id"]}
+        union = shadow_neighbours | serving_neighbours
+        overlap += len(shadow_neighbours & serving_neighbours) / len(union) if union else 1.0
+
+    recall = found / len(sample) if sample else 1.0
+    return {
+        "missing": missing,
+        "wrong_dimension": wrong_dimension,
+        "sample": len(sample),
+        "recall_k": recall_k,
+        "recall": round(recall, 4),
+        "min_recall": min_recall,
+        # Informational: a better model is expected to change some neighbours
+        "neighbour_overlap": round(overlap / len(sample), 4) if sample else None,
+        "passed": missing == 0 and wrong_dimension == 0 and recall >= min_recall,
+    }
+
+
+def migrate_embeddings_job(ctx, params: Dict) -> Dict:
+    """
+    Params:
+        model_id: Registry model to migrate to (becomes the version tag)
+        cpu_share: Share of wall-clock time spent embedding (default
+            ML_MIGRATION_CPU_SHARE)
+        batch_size: Reports per model batch (default 64)
+        validation_sample, recall_k, min_recall: Validation settings (default
+            from the environment)
+        cutover: Switch serving once validation passes (default true)
+    """
+    store = get_vector_store()
+    if store is None:
+        raise RuntimeError("Database matching is not enabled")
+    if not params.get("model_id"):
+        raise ValueError("model_id is required")
+
+    version = check_version(params["model_id"])
+    service = get_embedding_service(version)
+    batch_size = int(params.get("batch_size", 64))
+
+    state = ctx.job.state or {"phase": PHASES[0]}
+    throttle = Throttle(
+        float(params.get("cpu_share", os.environ.get("ML_MIGRATION_CPU_SHARE", "0.25"))),
+        state.get("busy_seconds", 0.0),
+        state.get("paused_seconds", 0.0),
+    )
+
+    def save(cursor, processed: int = 0, **updates) -> None:
+        state.update(updates)
+        state.update(throttle.stats())
+        ctx.checkpoint(cursor, processed, state=state)
+
+    serving, shadow = ctx.run_async(store.refresh_versions())
+    if state["phase"] == PHASES[0] and ctx.job.cursor is None:
+        if version == serving:
+            raise ValueError(f"Embedding version {version} is already serving")
+        if shadow not in (None, version):
+            raise RuntimeError(f"A migration to {shadow} is in progress")
+        if shadow is None:
+            ctx.run_async(store.set_shadow(version))
+        ctx.set_total(ctx.run_async(store.count_reports(True, version)))
+        save(None, phase="backfill", model_id=version, from_version=serving)
+    elif state["phase"] != "done" and version not in (shadow, serving):
+        raise RuntimeError(f"Migration to {version} was aborted")
+
+    def fill(after_id: Optional[str]) -> None:
+        """Embed reports without a shadow vector, throttled"""
+        while True:
+            ctx.check_cancelled()
+            if version not in ctx.run_async(store.versions()):
+                raise RuntimeError(f"Migration to {version} was aborted")
+
+            started = time.perf_counter()
+            rows = ctx.run_async(store.fetch_reports(after_id, batch_size, True, version))
+            if not rows:
+                return
+
+            texts = [service.create_report_text(row) for row in rows]
+            embeddings = service.batch_generate_embeddings(texts, batch_size)
+            ctx.run_async(
+                store.write_embeddings(zip([r["id"] for r in rows], embeddings), version=version)
+            )
+
+            after_id = rows[-1]["id"]
+            pause = throttle.pause_after(time.perf_counter() - started)
+            save(after_id, len(rows))
+            _sleep(ctx, pause)
+
+    for _ in range(MAX_CATCHUP_ROUNDS):
+        phase = state["phase"]
+
+        if phase == "backfill":
+            fill(ctx.job.cursor)
+            save(None, phase="catchup")
+            phase = "catchup"
+
+        if phase == "catchup":
+            for _ in range(MAX_CATCHUP_ROUNDS):
+                missing = ctx.run_async(store.count_reports(True, version))
+                if not missing:
+                    break
+                ctx.set_total(ctx.job.processed + missing)
+                fill(None)
+            save(None, phase="index")
+            phase = "index"
+
+        if phase == "index":
+            ctx.run_async(store.create_version_index(version, service.embedding_dim))
+            save(None, phase="validate")
+            phase = "validate"
+
+        if phase == "validate":
+            serving, _ = ctx.run_async(store.refresh_versions())
+            serving_service = get_embedding_service(serving_model_id(serving))
+            validation = validate_version(
+                ctx.run_async,
+                store,
+                version,
+                service,
+                serving,
+                serving_service,
+                sample_size=int(params.get(
+                    "validation_sample", os.environ.get("ML_MIGRATION_VALIDATION_SAMPLE", "200")
+                )),
+                recall_k=int(params.get("recall_k", os.environ.get("ML_MIGRATION_RECALL_K", "10"))),
+                min_recall=float(params.get(
+                    "min_recall", os.environ.get("ML_MIGRATION_MIN_RECALL", "0.95")
+                )),
+            )
+            if not validation["passed"]:
+                save(None, validation=validation)
+                raise RuntimeError(f"Validation of {version} failed: {validation}")
+
+            if not params.get("cutover", True):
+                save(None, phase="validated", validation=validation)
+                return {"model_id": version, "validation": validation, "serving": serving}
+            save(None, phase="cutover", validation=validation)
+            phase = "cutover"
+
+        if phase == "cutover":
+            try:
+                previous = ctx.run_async(store.switch_serving(version))
+            except IncompleteVersionError:
+                # Reports created since the catch-up: embed them and retry
+                save(None, phase="catchup")
+                continue
+            save(None, phase="done", previous_version=previous)
+            phase = "done"
+
+        if phase == "done":
+            # Reports stored during the switch by workers that had not seen it
+            fill(None)
+            return {
+                "model_id": version,
+                "serving": version,
+                "previous_version": state.get("previous_version"),
+                "validation": state.get("validation"),
+                "embedded": ctx.job.processed,
+            }
+
+    raise RuntimeError(f"Reports kept appearing faster than the migration to {version} embeds them")
+
+
+def migration_status(store, jobs: Iterable, active_only: bool = False) -> Dict:
+    """
+    Serving and shadow version plus progress of migrate_embeddings jobs
+
+    Uses the store's cached versions (no database round trip).
+    """
+    migrations: List[Dict] = []
+    for job in jobs:
+        if job.type != "migrate_embeddings":
+            continue
+        if active_only and job.status not in ("queued", "running"):
+            continue
+        state = job.state or {}
+        migrations.append(
+            {
+                **job.progress(),
+                "model_id": job.params.get("model_id"),
+                "phase": state.get("phase"),
+                "cpu_share": state.get("cpu_share"),
+                "effective_cpu_share": state.get("effective_cpu_share"),
+                "validation": state.get("validation"),
+            }
+        )
+
+    return {
+        "serving": {
+            "model_version": store.serving_version,
+            "model_id": serving_model_id(store.serving_version),
+        },
+        "shadow_version": store.shadow_version,
+        "versioning": store.versioning,
+        "migrations": migrations,
+    }
@@ -2,14 +2,20 @@
 Text embedding service using sentence-transformers
 Model: paraphrase-multilingual-MiniLM-L12-v2
 Supports: 50+ languages including Slovak, Czech, English
+
+torch and sentence_transformers are imported when the first model loads, so
+importing this module stays cheap for workers that never embed.
 """
 
-from sentence_transformers import SentenceTransformer
 import numpy as np
 from typing import List, Dict, Optional, Tuple
-import torch
 import logging
 
+from admission import PriorityLock
+from service_roles import lazy_import
+from singleflight import SingleFlight
+from tracing import span
+
 logger = logging.getLogger(__name__)
 
 
@@ -36,18 +42,38 @@ class EmbeddingService:
         """
         logger.info(f"Loading embedding model: {model_name}")
 
+        torch = lazy_import("torch")
+        sentence_transformers = lazy_import("sentence_transformers")
+
         self.model_name = model_name
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
 
-        self.model = SentenceTransformer(model_name, cache_folder=cache_dir)
+        self.model = sentence_transformers.SentenceTransformer(model_name, cache_folder=cache_dir)
         self.model.to(self.device)
+        self.model.eval()
 
         self.embedding_dim = self.model.get_sentence_embedding_dimension()
 
+        # Concurrent requests for the same text share one forward pass
+        self.inflight = SingleFlight("embeddings")
+
+        # One model call at a time; interactive requests go before bulk chunks
+        self.inference_lock = PriorityLock()
+
         logger.info(
             f"Model loaded on {self.device}. Embedding dimension: {self.embedding_dim}"
         )
 
+    def memory_bytes(self) -> int:
+        """
+        Approximate resident size of the model (parameters + buffers)
+
+        Returns:
+            Size in bytes
+        """
+        tensors = list(self.model.parameters()) + list(self.model.buffers())
+        return sum(t.numel() * t.element_size() for t in tensors)
+
     def create_report_text(self, report: Dict) -> str:
         """
         Combine report fields into single text for embedding
@@ -110,14 +136,22 @@ class EmbeddingService:
             # Return zero vector for empty text
             return np.zeros(self.embedding_dim, dtype=np.float32)
 
-        embedding = self.model.encode(
-            text,
-            convert_to_numpy=True,
-            normalize_embeddings=True,  # L2 normalization
-            show_progress_bar=False,
-        )
+        # Whitespace differences do not change the tokenized input
+        key = " ".join(text.split())
+        embedding, shared = self.inflight.do(key, lambda: self._encode_text(text))
+
+        return embedding.copy() if shared else embedding
 
-        return embedding
+    def _encode_text(self, text: str) -> np.ndarray:
+        """Run the model on a single non-empty text"""
+        with self.inference_lock.hold():
+            with span("embedding.encode", chars=len(text), device=self.device):
+                return self.model.encode(
+                    text,
+                    convert_to_numpy=True,
+                    normalize_embeddings=True,  # L2 normalization
+                    show_progress_bar=False,
+                )
 
     def batch_generate_embeddings(
         self, texts: List[str], batch_size: int = 32
@@ -125,6 +159,10 @@ class EmbeddingService:
         """
         Generate embeddings for multiple texts efficiently
 
+        Texts are length-sorted (as model.encode does internally) and encoded
+        one batch at a time, releasing the inference lock between batches so
+        interactive requests are not stuck behind a large bulk call.
+
         Args:
             texts: List of input texts
             batch_size: Batch size for encoding
@@ -137,13 +175,22 @@ class EmbeddingService:
             text if text and len(text.strip()) > 0 else "[empty]" for text in texts
         ]
 
-        embeddings = self.model.encode(
-            processed_texts,
-            convert_to_numpy=True,
-            normalize_embeddings=True,
-            batch_size=batch_size,
-            show_progress_bar=len(texts) > 100,
-        )
+        # Longest first, so each batch pads to similar lengths
+        order = sorted(range(len(processed_texts)), key=lambda i: -len(processed_texts[i]))
+        embeddings = np.zeros((len(processed_texts), self.embedding_dim), dtype=np.float32)
+
+        with span("embedding.batch_encode", count=len(texts), batch_size=batch_size):
+            for start in range(0, len(order), batch_size):
+                indexes = order[start:start + batch_size]
+
+                with self.inference_lock.hold():
+                    embeddings[indexes] = self.model.encode(
+                        [processed_texts[i] for i in indexes],
+                        convert_to_numpy=True,
+                        normalize_embeddings=True,
+                        batch_size=batch_size,
+                        show_progress_bar=False,
+                    )
 
         return embeddings
 
@@ -255,23 +302,20 @@ class EmbeddingService:
         return centroid
 
 
-# Singleton instance
-_embedding_service: Optional[EmbeddingService] = None
-
-
-def get_embedding_service() -> EmbeddingService:
+def get_embedding_service(model_id: Optional[str] = None) -> EmbeddingService:
     """
-    Get or create singleton embedding service instance
+    Get the embedding service for a model from the model registry
+
+    Args:
+        model_id: Configured model ID (see model_registry), default model if None
 
     Returns:
         EmbeddingService instance
     """
-    global _embedding_service
-
-    if _embedding_service is None:
-        _embedding_service = EmbeddingService()
+    # Imported here - model_registry depends on this module
+    from model_registry import get_model_registry
 
-    return _embedding_service
+    return get_model_registry().get(model_id)
 
 
 # Example usage
@@ -0,0 +1,340 @@
+"""
+Exact-identifier inverted index
+Normalizes phones, emails, IBANs, crypto wallets, license plates, VINs and
+company IDs with the same rules as src/lib/duplicate-detection/normalizers.ts
+and maps each (field, normalized value) to the reports that contain it. A
+dedup check resolves exact identifier hits with a few dict lookups instead of
+database round trips, and can skip the embedding and image stages when a hit
+is definitive.
+
+Configuration (environment):
+- ML_IDENTIFIER_INDEX: Enable the index and its use in dedup checks (default on)
+- ML_IDENTIFIER_DEFINITIVE: Fields whose exact match ends a dedup check early
+  (comma-separated, default all fields)
+
+The index lives in memory; after a restart it is reloaded with the
+load_identifiers job (from normalized_fields) or /api/v1/identifiers/load.
+"""
+
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import os
+import re
+import threading
+
+# Field -> match type reported to the web tier (detector.ts naming)
+MATCH_TYPES = {
+    "phone": "exact_phone",
+    "email": "exact_email",
+    "iban": "exact_iban",
+    "crypto_wallet": "exact_crypto",
+    "license_plate": "exact_license_plate",
+    "vin": "exact_vin",
+    "company_id": "exact_company_id",
+}
+
+IDENTIFIER_FIELDS = tuple(MATCH_TYPES)
+
+# JavaScript \d and \D are ASCII-only; Python's match any Unicode digit
+_NON_DIGIT = re.compile(r"[^0-9]")
+# JavaScript \s and trim(): unlike Python's, they include U+FEFF and
+# exclude U+001C-U+001F and U+0085
+_JS_SPACE = "\t\n\v\f\r \u00a0\u1680\u2000-\u200a\u2028\u2029\u202f\u205f\u3000\ufeff"
+_WHITESPACE = re.compile(f"[{_JS_SPACE}]")
+_TRIM = re.compile(f"^[{_JS_SPACE}]+|[{_JS_SPACE}]+$")
+_EMAIL = re.compile(f"[^{_JS_SPACE}@]+@[^{_JS_SPACE}@]+\\.[^{_JS_SPACE}@]+")
+_IBAN = re.compile(r"[A-Z]{2}[0-9]{2}[A-Z0-9]{1,30}")
+_ETH = re.compile(r"0x[a-fA-F0-9]{40}")
+_BTC = re.compile(r"[13][a-km-zA-HJ-NP-Z1-9]{25,34}|bc1[a-z0-9]{39,59}")
+_PLATE_SEPARATORS = re.compile(r"[\s\-]")
+_PLATE = re.compile(r"[A-Z0-9]{3,10}")
+_VIN = re.compile(r"[A-HJ-NPR-Z0-9]{17}")
+_DIGITS = re.compile(r"[0-9]+")
+
+
+# ============================================================================
+# NORMALIZATION (mirrors normalizers.ts; fullmatch = anchored JS regex)
+# ============================================================================
+
+def _trim(text: str) -> str:
+    """String.prototype.trim()"""
+    return _TRIM.sub("", text)
+
+
+def normalize_phone(phone: Optional[str]) -> Optional[str]:
+    """Digits only, "00" prefix dropped: +421 911 123 456 -> 421911123456"""
+    if not phone:
+        return None
+    normalized = _NON_DIGIT.sub("", phone)
+    if normalized.startswith("00"):
+        normalized = normalized[2:]
+    if len(normalized) < 9:
+        return None
+    return normalized
+
+
+def normalize_email(email: Optional[str]) -> Optional[str]:
+    """Trimmed and lowercased: John.Doe@Example.COM -> john.doe@example.com"""
+    if not email:
+        return None
+    trimmed = _trim(email).lower()
+    if not _EMAIL.fullmatch(trimmed):
+        return None
+    return trimmed
+
+
+def normalize_iban(iban: Optional[str]) -> Optional[str]:
+    """Spaces removed, uppercased: SK31 1200 0000 ... -> SK311200000..."""
+    if not iban:
+        return None
+    normalized = _WHITESPACE.sub("", iban).upper()
+    if not _IBAN.fullmatch(normalized):
+        return None
+    return normalized
+
+
+def normalize_crypto_wallet(address: Optional[str], crypto_type: str = "OTHER") -> Optional[str]:
+    """ETH keeps its case (EIP-55 checksum); BTC and others are lowercased"""
+    if not address:
+        return None
+    trimmed = _trim(address)
+
+    if crypto_type == "ETH":
+        return trimmed if _ETH.fullmatch(trimmed) else None
+    if crypto_type == "BTC":
+        return trimmed.lower() if _BTC.fullmatch(trimmed) else None
+    return trimmed.lower()
+
+
+def normalize_license_plate(plate: Optional[str]) -> Optional[str]:
+    """Spaces and dashes removed, uppercased: ba-123-xy -> BA123XY"""
+    if not plate:
+        return None
+    normalized = _PLATE_SEPARATORS.sub("", plate).upper()
+    if not _PLATE.fullmatch(normalized):
+        return None
+    return normalized
+
+
+def normalize_vin(vin: Optional[str]) -> Optional[str]:
+    """17 characters without I, O and Q"""
+    if not vin:
+        return None
+    normalized = _WHITESPACE.sub("", vin).upper()
+    if not _VIN.fullmatch(normalized):
+        return None
+    return normalized
+
+
+def normalize_company_id(company_id: Optional[str]) -> Optional[str]:
+    """Digits only, leading zeros dropped"""
+    if not company_id:
+        return None
+    normalized = _WHITESPACE.sub("", company_id).lstrip("0")
+    if not _DIGITS.fullmatch(normalized):
+        return None
+    return normalized
+
+
+def normalize_identifiers(raw: Dict) -> Dict[str, str]:
+    """
+    Normalize raw identifier fields (normalizeAllFields in normalizers.ts)
+
+    Args:
+        raw: phone, email, iban, crypto_wallet, crypto_type, license_plate,
+            vin, company_id (any subset)
+
+    Returns:
+        Normalized values of the fields that are present and valid
+    """
+    normalized = {
+        "phone": normalize_phone(raw.get("phone")),
+        "email": normalize_email(raw.get("email")),
+        "iban": normalize_iban(raw.get("iban")),
+        "crypto_wallet": normalize_crypto_wallet(
+            raw.get("crypto_wallet"), raw.get("crypto_type") or "OTHER"
+        ),
+        "license_plate": normalize_license_plate(raw.get("license_plate")),
+        "vin": normalize_vin(raw.get("vin")),
+        "company_id": normalize_company_id(raw.get("company_id")),
+    }
+    return {field: value for field, value in normalized.items() if value}
+
+
+def prenormalized_identifiers(values: Dict) -> Dict[str, str]:
+    """Identifier fields that are already normalized (e.g. normalized_fields rows)"""
+    return {field: values[field] for field in IDENTIFIER_FIELDS if values.get(field)}
+
+
+# ============================================================================
+# INDEX
+# ============================================================================
+
+class IdentifierIndex:
+    """In-memory postings from (field, normalized value) to report IDs"""
+
+    def __init__(self, definitive_fields: Iterable[str] = IDENTIFIER_FIELDS):
+        self.definitive_fields = frozenset(definitive_fields)
+
+        self._postings: Dict[str, Dict[str, Set[str]]] = {f: {} for f in IDENTIFIER_FIELDS}
+        self._by_report: Dict[str, Dict[str, str]] = {}
+        self._lock = threading.Lock()
+
+        # Statistics
+        self.lookups = 0
+        self.hits = 0
+
+    def __len__(self) -> int:
+        return len(self._by_report)
+
+    def _add(self, report_id: str, identifiers: Dict[str, str]) -> None:
+        for field, value in identifiers.items():
+            self._postings[field].setdefault(value, set()).add(report_id)
+        self._by_report[report_id] = identifiers
+
+    def _remove(self, report_id: str) -> bool:
+        identifiers = self._by_report.pop(report_id, None)
+        if identifiers is None:
+            return False
+
+        for field, value in identifiers.items():
+            postings = self._postings[field]
+            report_ids = postings.get(value)
+            if report_ids is not None:
+                report_ids.discard(report_id)
+                if not report_ids:
+                    del postings[value]
+        return True
+
+    def upsert(self, records: Iterable[Tuple[str, Dict[str, str]]]) -> int:
+        """
+        Add or replace the identifiers of reports
+
+        Args:
+            records: (report_id, normalized identifiers); a report with no
+                identifiers is removed
+
+        Returns:
+            Number of reports written
+        """
+        written = 0
+        with self._lock:
+            for report_id, identifiers in records:
+                self._remove(report_id)
+                if identifiers:
+                    self._add(report_id, identifiers)
+                    written += 1
+        return written
+
+    def delete(self, report_ids: Iterable[str]) -> int:
+        with self._lock:
+            return sum(self._remove(report_id) for report_id in report_ids)
+
+    def replace(self, records: Iterable[Tuple[str, Dict[str, str]]]) -> int:
+        """Swap in a freshly built index holding only the given reports"""
+        fresh = IdentifierIndex(self.definitive_fields)
+        written = fresh.upsert(records)
+
+        with self._lock:
+            self._postings = fresh._postings
+            self._by_report = fresh._by_report
+        return written
+
+    def lookup(
+        self, identifiers: Dict[str, str], exclude_ids: Iterable[str] = ()
+    ) -> List[Dict]:
+        """
+        Reports sharing at least one normalized identifier
+
+        Returns:
+            Matches ({id, similarity, match_type, matched, definitive}), most
+            matched fields first
+        """
+        exclude = set(exclude_ids)
+        matched: Dict[str, Dict[str, str]] = {}
+
+        with self._lock:
+            for field, value in identifiers.items():
+                for report_id in self._postings[field].get(value, ()):
+                    if report_id not in exclude:
+                        matched.setdefault(report_id, {})[field] = value
+            self.lookups += 1
+            self.hits += bool(matched)
+
+        matches = []
+        for report_id, fields in matched.items():
+            first_field = next(f for f in IDENTIFIER_FIELDS if f in fields)
+            matches.append(
+                {
+                    "id": report_id,
+                    "similarity": 1.0,
+                    "match_type": MATCH_TYPES[first_field],
+                    "matched": fields,
+                    "definitive": not self.definitive_fields.isdisjoint(fields),
+                }
+            )
+
+        matches.sort(key=lambda m: (-len(m["matched"]), m["id"]))
+        return matches
+
+    def lookup_many(self, queries: Iterable[Tuple[Dict[str, str], Iterable[str]]]) -> List[List[Dict]]:
+        """Batched lookup of (identifiers, exclude_ids) queries"""
+        return [self.lookup(identifiers, exclude_ids) for identifiers, exclude_ids in queries]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "reports": len(self._by_report),
+                "values": {field: len(postings) for field, postings in self._postings.items()},
+                "lookups": self.lookups,
+                "hits": self.hits,
+            }
+
+
+def identifier_index_enabled() -> bool:
+    return os.environ.get("ML_IDENTIFIER_INDEX", "true").strip().lower() in (
+        "1", "true", "yes", "on"
+    )
+
+
+# Singleton instance
+_identifier_index: Optional[IdentifierIndex] = None
+
+
+def get_identifier_index() -> IdentifierIndex:
+    """
+    Get or create singleton identifier index instance
+
+    Returns:
+        IdentifierIndex instance
+    """
+    global _identifier_index
+
+    if _identifier_index is None:
+        definitive = os.environ.get("ML_IDENTIFIER_DEFINITIVE", "")
+        fields = [f.strip() for f in definitive.split(",") if f.strip()]
+        unknown = set(fields) - set(IDENTIFIER_FIELDS)
+        if unknown:
+            raise ValueError(f"Unknown identifier fields in ML_IDENTIFIER_DEFINITIVE: {sorted(unknown)}")
+
+        _identifier_index = IdentifierIndex(fields or IDENTIFIER_FIELDS)
+
+    return _identifier_index
+
+
+# Example usage
+if __name__ == "__main__":
+    index = IdentifierIndex()
+
+    index.upsert(
+        [
+            ("report-1", normalize_identifiers({"phone": "+421 911 123 456", "email": "John.Doe@Example.COM"})),
+            ("report-2", normalize_identifiers({"iban": "SK31 1200 0000 1987 4263 7541"})),
+            ("report-3", normalize_identifiers({"license_plate": "ba-123-xy"})),
+        ]
+    )
+
+    query = normalize_identifiers({"phone": "00421-911-123-456", "license_plate": "BA 123 XY"})
+    print(f"Normalized query: {query}")
+    for match in index.lookup(query):
+        print(f"  {match['id']}: {match['match_type']} {match['matched']}")
+    print(f"Stats: {index.stats()}")
@@ -6,18 +6,76 @@ Supports multiple hash types:
 - aHash: Fast, good for exact duplicates
 - dHash: Good for detecting gradients/edges
 - wHash: Wavelet-based hash
+
+Animated GIF/WebP images are hashed per keyframe: frames are scanned in order
+(at most ML_IMAGE_FRAME_SCAN_LIMIT), downscaled, and a frame becomes a
+keyframe when its 8x8 thumbnail differs from the previous keyframe. At most
+ML_IMAGE_FRAME_BUDGET keyframes, spread over the animation, are hashed. The
+top-level hashes are those of the first frame; "<type>_frames" holds the
+concatenated hashes of all keyframes, and comparisons use the best frame pair.
+
+Configuration (environment):
+- ML_IMAGE_FRAME_BUDGET: Keyframes hashed per animation (default 8; 1 = first frame only)
+- ML_IMAGE_FRAME_SCAN_LIMIT: Frames scanned for keyframes (default 240)
+- ML_IMAGE_FRAME_SIZE: Longest side animation frames are reduced to before
+  hashing (default 256)
+- ML_IMAGE_MAX_BYTES: Largest encoded image accepted, downloaded or inline
+  (default 10 MB)
 """
 
 from PIL import Image
 import imagehash
+import numpy as np
 from typing import Dict, Tuple, List, Optional
 import io
+import os
 import requests
 from pathlib import Path
 import logging
 
+from search_index import hash_to_bytes, pairwise_hamming_distances
+from singleflight import SingleFlight
+from tracing import span
+
 logger = logging.getLogger(__name__)
 
+HASH_TYPES = ("phash", "ahash", "dhash", "whash")
+
+# Thumbnail bits that must change for a frame to become a new keyframe
+KEYFRAME_MIN_DISTANCE = 6
+
+# Encoded size limit for downloads and inline (base64) images
+MAX_IMAGE_BYTES = int(os.environ.get("ML_IMAGE_MAX_BYTES", str(10 * 1024 * 1024)))
+
+# Base64 length of an image at the size limit
+MAX_IMAGE_BASE64_LENGTH = 4 * ((MAX_IMAGE_BYTES + 2) // 3)
+
+
+def _thumbnail_bits(frame: Image.Image) -> np.ndarray:
+    """8x8 mean-thresholded grayscale thumbnail, for cheap frame change detection"""
+    thumbnail = np.asarray(frame.convert("L").resize((8, 8), Image.BOX), dtype=np.float32)
+    return thumbnail > thumbnail.mean()
+
+
+def _download(url: str) -> bytes:
+    """Fetch an image, refusing bodies larger than MAX_IMAGE_BYTES"""
+    with requests.get(url, timeout=10, stream=True) as response:
+        response.raise_for_status()
+
+        declared = response.headers.get("Content-Length")
+        if declared and declared.isdigit() and int(declared) > MAX_IMAGE_BYTES:
+            raise ValueError(f"Image of {declared} bytes exceeds the {MAX_IMAGE_BYTES} byte limit")
+
+        chunks = []
+        size = 0
+        for chunk in response.iter_content(chunk_size=64 * 1024):
+            size += len(chunk)
+            if size > MAX_IMAGE_BYTES:
+                raise ValueError(f"Image exceeds the {MAX_IMAGE_BYTES} byte limit")
+            chunks.append(chunk)
+
+    return b"".join(chunks)
+
 
 class ImageDuplicateDetector:
     """
@@ -30,15 +88,30 @@ class ImageDuplicateDetector:
     - wHash (Wavelet): Sophisticated, CPU-intensive
     """
 
-    def __init__(self, hash_size: int = 8):
+    def __init__(
+        self,
+        hash_size: int = 8,
+        frame_budget: int = 8,
+        frame_scan_limit: int = 240,
+        frame_size: int = 256,
+    ):
         """
         Initialize image duplicate detector
 
         Args:
             hash_size: Size of hash (8 = 64-bit hash, 16 = 256-bit hash)
                       Larger = more precise but slower
+            frame_budget: Max keyframes hashed per animated image
+            frame_scan_limit: Max frames scanned for keyframes
+            frame_size: Longest side animation frames are reduced to
         """
         self.hash_size = hash_size
+        self.frame_budget = max(1, frame_budget)
+        self.frame_scan_limit = max(1, frame_scan_limit)
+        self.frame_size = frame_size
+
+        # Concurrent requests for the same image share one download + hash
+        self.inflight = SingleFlight("images")
         logger.info(f"ImageDuplicateDetector initialized with hash_size={hash_size}")
 
     def load_image(self, image_source: str) -> Optional[Image.Image]:
@@ -55,24 +128,57 @@ class ImageDuplicateDetector:
             if image_source.startswith(("http://", "https://")):
                 # Load from URL
                 logger.debug(f"Loading image from URL: {image_source}")
-                response = requests.get(image_source, timeout=10)
-                response.raise_for_status()
-                img = Image.open(io.BytesIO(response.content))
+                with span("image.download") as download_span:
+                    content = _download(image_source)
+                    if download_span is not None:
+                        download_span.set_attribute("bytes", len(content))
+                source = io.BytesIO(content)
             else:
                 # Load from file
                 logger.debug(f"Loading image from file: {image_source}")
-                img = Image.open(image_source)
+                source = image_source
 
-            # Convert to RGB if necessary (handle RGBA, grayscale, etc.)
-            if img.mode not in ("RGB", "L"):
-                img = img.convert("RGB")
-
-            return img
+            return self._decode_image(source)
 
         except Exception as e:
             logger.error(f"Error loading image {image_source}: {e}")
             return None
 
+    def load_image_bytes(self, data: bytes) -> Optional[Image.Image]:
+        """
+        Load image from raw encoded bytes (e.g. an uploaded file)
+
+        Args:
+            data: Encoded image bytes
+
+        Returns:
+            PIL Image object or None if decoding failed
+        """
+        if len(data) > MAX_IMAGE_BYTES:
+            logger.error(f"Image of {len(data)} bytes exceeds the {MAX_IMAGE_BYTES} byte limit")
+            return None
+        try:
+            return self._decode_image(io.BytesIO(data))
+        except Exception as e:
+            logger.error(f"Error decoding image bytes: {e}")
+            return None
+
+    def _decode_image(self, source) -> Image.Image:
+        with span("image.decode"):
+            img = Image.open(source)
+            if self.frame_budget > 1 and getattr(img, "is_animated", False):
+                # Frames are decoded one by one while hashing (_hash_frames)
+                return img
+
+            # Image.open() is lazy - force the decode inside this span
+            img.load()
+
+            # Convert to RGB if necessary (handle RGBA, grayscale, etc.)
+            if img.mode not in ("RGB", "L"):
+                img = img.convert("RGB")
+
+        return img
+
     def compute_image_hashes(self, image_source: str) -> Dict[str, str]:
         """
         Compute multiple perceptual hashes for an image
@@ -84,31 +190,57 @@ class ImageDuplicateDetector:
             Dictionary with hash types and their hex values
             Example: {'phash': 'a1b2c3d4...', 'ahash': '...', ...}
         """
+        hashes, shared = self.inflight.do(
+            image_source.strip(), lambda: self._compute_image_hashes(image_source)
+        )
+
+        return dict(hashes) if shared else hashes
+
+    def compute_image_hashes_from_bytes(self, data: bytes) -> Dict[str, str]:
+        """
+        Compute multiple perceptual hashes for encoded image bytes
+
+        Args:
+            data: Encoded image bytes
+
+        Returns:
+            Dictionary with hash types and their hex values (empty on failure)
+        """
+        img = self.load_image_bytes(data)
+
+        if img is None:
+            return {}
+
+        return self._hash_image(img, f"<{len(data)} bytes>")
+
+    def _compute_image_hashes(self, image_source: str) -> Dict[str, str]:
+        """Load an image and compute its hashes (see compute_image_hashes)"""
         img = self.load_image(image_source)
 
         if img is None:
             return {}
 
+        return self._hash_image(img, image_source)
+
+    def _hash_image(self, img: Image.Image, image_source: str) -> Dict[str, str]:
         try:
-            # Compute all hash types
-            p_hash = imagehash.phash(img, hash_size=self.hash_size)
-            a_hash = imagehash.average_hash(img, hash_size=self.hash_size)
-            d_hash = imagehash.dhash(img, hash_size=self.hash_size)
-            w_hash = imagehash.whash(img, hash_size=self.hash_size)
+            if self.frame_budget > 1 and getattr(img, "is_animated", False):
+                return self._hash_frames(img, image_source)
+
+            with span("image.hash", hash_size=self.hash_size):
+                hashes = self._frame_hashes(img)
 
             # Get image metadata
             width, height = img.size
             format_name = img.format or "unknown"
 
-            hashes = {
-                "phash": str(p_hash),
-                "ahash": str(a_hash),
-                "dhash": str(d_hash),
-                "whash": str(w_hash),
-                "width": width,
-                "height": height,
-                "format": format_name.lower(),
-            }
+            hashes.update(
+                {
+                    "width": width,
+                    "height": height,
+                    "format": format_name.lower(),
+                }
+            )
 
             logger.debug(f"Computed hashes for {image_source}: {hashes}")
             return hashes
@@ -117,6 +249,114 @@ class ImageDuplicateDetector:
             logger.error(f"Error computing hashes for {image_source}: {e}")
             return {}
 
+    def _frame_hashes(self, img: Image.Image) -> Dict[str, str]:
+        """All hash types of one image or frame"""
+        return {
+            "phash": str(imagehash.phash(img, hash_size=self.hash_size)),
+            "ahash": str(imagehash.average_hash(img, hash_size=self.hash_size)),
+            "dhash": str(imagehash.dhash(img, hash_size=self.hash_size)),
+            "whash": str(imagehash.whash(img, hash_size=self.hash_size)),
+        }
+
+    def _reduce_frame(self, img: Image.Image) -> Image.Image:
+        """Current frame as RGB, box-reduced so its longest side is near frame_size"""
+        frame = img.convert("RGB")
+        factor = max(frame.size) // self.frame_size
+        if factor > 1:
+            frame = frame.reduce(factor)
+        return frame
+
+    def _select_keyframes(self, img: Image.Image) -> Tuple[List[Tuple[int, Image.Image]], int]:
+        """
+        Scan frames in order and pick at most frame_budget keyframes
+
+        Frames decode sequentially (GIF and WebP frames build on earlier
+        ones), so decoding is bounded by the scan limit. Only keyframe
+        candidates are converted to reduced RGB copies, and those are thinned
+        to every other one whenever they exceed twice the budget - memory and
+        hashing work depend on the budget only.
+
+        Returns:
+            ([(frame index, reduced frame)], frames scanned)
+        """
+        candidates: List[Tuple[int, Image.Image]] = []
+        stride = 1
+        detected = 0
+        last_bits = None
+        scanned = 0
+
+        for index in range(self.frame_scan_limit):
+            try:
+                img.seek(index)
+            except EOFError:
+                break
+            scanned += 1
+
+            bits = _thumbnail_bits(img)
+            if last_bits is not None and np.count_nonzero(bits != last_bits) < KEYFRAME_MIN_DISTANCE:
+                continue
+            last_bits = bits
+
+            if detected % stride == 0:
+                candidates.append((index, self._reduce_frame(img)))
+                if len(candidates) > 2 * self.frame_budget:
+                    candidates = candidates[::2]
+                    stride *= 2
+            detected += 1
+
+        if len(candidates) > self.frame_budget:
+            positions = np.linspace(0, len(candidates) - 1, self.frame_budget).round().astype(int)
+            candidates = [candidates[p] for p in sorted(set(positions.tolist()))]
+
+        return candidates, scanned
+
+    def _hash_frames(self, img: Image.Image, image_source: str) -> Dict[str, str]:
+        """Hashes of an animated image: first frame plus every keyframe"""
+        try:
+            with span("image.keyframes", budget=self.frame_budget) as keyframe_span:
+                keyframes, scanned = self._select_keyframes(img)
+                if keyframe_span is not None:
+                    keyframe_span.set_attribute("scanned", scanned)
+                    keyframe_span.set_attribute("keyframes", len(keyframes))
+
+            with span("image.hash", hash_size=self.hash_size, frames=len(keyframes)):
+                frame_hashes = [self._frame_hashes(frame) for _, frame in keyframes]
+
+            hashes = dict(frame_hashes[0])
+            for hash_type in HASH_TYPES:
+                hashes[f"{hash_type}_frames"] = "".join(h[hash_type] for h in frame_hashes)
+
+            width, height = img.size
+            hashes.update(
+                {
+                    "width": width,
+                    "height": height,
+                    "format": (img.format or "unknown").lower(),
+                    "frames": len(keyframes),
+                    "frames_scanned": scanned,
+                }
+            )
+
+            logger.debug(
+                f"Hashed {len(keyframes)} keyframes of {scanned} scanned frames for {image_source}"
+            )
+            return hashes
+
+        finally:
+            img.close()
+
+    @staticmethod
+    def _hash_matrix(hashes: Dict[str, str], hash_type: str) -> Optional[np.ndarray]:
+        """(frames, bytes) packed hashes of one type; a still image is one frame"""
+        single = hashes.get(hash_type)
+        if not single:
+            return None
+        row = hash_to_bytes(single)
+        frames = hashes.get(f"{hash_type}_frames")
+        if frames:
+            return hash_to_bytes(frames).reshape(-1, len(row))
+        return row[None, :]
+
     def hamming_distance(self, hash1: str, hash2: str) -> int:
         """
         Calculate Hamming distance between two hash strings
@@ -152,19 +392,55 @@ class ImageDuplicateDetector:
         Returns:
             Tuple of (is_duplicate, distances_dict, weighted_score)
         """
+        is_duplicate, distances, weighted_score, _ = self.best_frame_match(
+            hashes1, hashes2, threshold
+        )
+        return is_duplicate, distances, weighted_score
+
+    def best_frame_match(
+        self,
+        hashes1: Dict[str, str],
+        hashes2: Dict[str, str],
+        threshold: int = 10,
+    ) -> Tuple[bool, Dict[str, int], float, Optional[Tuple[int, int]]]:
+        """
+        Compare two hash sets by their closest pair of frames
+
+        Still images count as a single frame; the distances of every frame
+        pair are computed at once on the packed hashes.
+
+        Returns:
+            Tuple of (is_duplicate, distances_dict, weighted_score,
+            (frame in hashes1, frame in hashes2) of the best pair)
+        """
         if not hashes1 or not hashes2:
-            return False, {}, 999.0
+            return False, {}, 999.0, None
 
-        distances = {}
+        pair_distances = {}
+        # (frames in hashes1, frames in hashes2), set by the first usable type
+        frame_counts = None
 
-        # Calculate Hamming distance for each hash type
-        for hash_type in ["phash", "ahash", "dhash", "whash"]:
+        # Hamming distance of every frame pair for each hash type
+        for hash_type in HASH_TYPES:
             if hash_type in hashes1 and hash_type in hashes2:
-                dist = self.hamming_distance(hashes1[hash_type], hashes2[hash_type])
-                distances[hash_type] = dist
-
-        if not distances:
-            return False, {}, 999.0
+                try:
+                    left = self._hash_matrix(hashes1, hash_type)
+                    right = self._hash_matrix(hashes2, hash_type)
+                    if left is None or right is None or left.shape[1] != right.shape[1]:
+                        raise ValueError("hash lengths differ")
+                    counts = (left.shape[0], right.shape[0])
+                    if frame_counts is not None and counts != frame_counts:
+                        raise ValueError(
+                            f"{hash_type} has {counts} frames, expected {frame_counts}"
+                        )
+                    frame_counts = counts
+                    pair_distances[hash_type] = pairwise_hamming_distances(left, right)
+                except ValueError as e:
+                    logger.error(f"Error calculating Hamming distance: {e}")
+                    pair_distances[hash_type] = np.full((1, 1), 999, dtype=np.int32)
+
+        if not pair_distances:
+            return False, {}, 999.0, None
 
         # Calculate weighted score (pHash is most reliable)
         weights = {
@@ -174,15 +450,25 @@ class ImageDuplicateDetector:
             "whash": 0.05, # Wavelet hash - bonus if available
         }
 
-        weighted_score = sum(
-            distances.get(hash_type, 100) * weight
+        # A failed hash type is a (1, 1) matrix and broadcasts over all pairs
+        shape = np.broadcast_shapes(*(d.shape for d in pair_distances.values()))
+        pair_scores = sum(
+            np.broadcast_to(pair_distances[hash_type], shape) * weight
+            if hash_type in pair_distances
+            else np.full(shape, 100 * weight)
             for hash_type, weight in weights.items()
         )
 
+        best = np.unravel_index(int(np.argmin(pair_scores)), shape)
+        distances = {
+            hash_type: int(np.broadcast_to(d, shape)[best]) for hash_type, d in pair_distances.items()
+        }
+        weighted_score = float(pair_scores[best])
+
         # Consider duplicate if weighted score is below threshold
         is_duplicate = weighted_score <= threshold
 
-        return is_duplicate, distances, weighted_score
+        return is_duplicate, distances, weighted_score, (int(best[0]), int(best[1]))
 
     def find_duplicate_images(
         self,
@@ -205,23 +491,25 @@ class ImageDuplicateDetector:
         duplicates = []
 
         for candidate in candidate_list:
-            is_dup, distances, weighted_score = self.compare_images(
-                target_hashes, candidate.get("hashes", {}), threshold
+            candidate_hashes = candidate.get("hashes", {})
+            is_dup, distances, weighted_score, frame_pair = self.best_frame_match(
+                target_hashes, candidate_hashes, threshold
             )
 
             if is_dup:
-                duplicates.append(
-                    {
-                        "id": candidate["id"],
-                        "distances": distances,
-                        "weighted_score": weighted_score,
-                        "avg_distance": (
-                            sum(distances.values()) / len(distances)
-                            if distances
-                            else 999
-                        ),
-                    }
-                )
+                match = {
+                    "id": candidate["id"],
+                    "distances": distances,
+                    "weighted_score": weighted_score,
+                    "avg_distance": (
+                        sum(distances.values()) / len(distances)
+                        if distances
+                        else 999
+                    ),
+                }
+                if "phash_frames" in target_hashes or "phash_frames" in candidate_hashes:
+                    match["frame_pair"] = frame_pair
+                duplicates.append(match)
 
         # Sort by weighted score (lower = more similar)
         duplicates.sort(key=lambda x: x["weighted_score"])
@@ -285,7 +573,12 @@ def get_image_detector(hash_size: int = 8) -> ImageDuplicateDetector:
     global _image_detector
 
     if _image_detector is None:
-        _image_detector = ImageDuplicateDetector(hash_size=hash_size)
+        _image_detector = ImageDuplicateDetector(
+            hash_size=hash_size,
+            frame_budget=int(os.environ.get("ML_IMAGE_FRAME_BUDGET", "8")),
+            frame_scan_limit=int(os.environ.get("ML_IMAGE_FRAME_SCAN_LIMIT", "240")),
+            frame_size=int(os.environ.get("ML_IMAGE_FRAME_SIZE", "256")),
+        )
 
     return _image_detector
 
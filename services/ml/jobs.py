@@ -0,0 +1,787 @@
+"""
+Background job subsystem for long-running bulk operations
+Jobs run on a dedicated thread pool (separate from the request threadpool),
+report progress and throughput, can be cancelled, and checkpoint their state
+to local disk so a restarted worker resumes where it stopped.
+
+Job types:
+- reembed: Embed inline texts/reports, or every report in the database
+- rehash: Compute perceptual hashes for a list of image URLs
+- cluster: Group embeddings into duplicate clusters by similarity threshold
+- load_identifiers: Fill the exact-identifier index from normalized_fields or
+  inline records
+- migrate_embeddings: Re-embed the database with another model into a shadow
+  version, validate it and switch serving (see embedding_migration)
+
+Only the job types of the service role are registered (rehash for images,
+the others for embeddings; see service_roles). Workers sharing ML_JOB_DIR
+ignore each other's jobs: a worker lists, resumes and cancels only job types
+it can run. A worker holds an exclusive lock on each job it runs, so of two
+replicas of the same role only one resumes an unfinished job.
+
+Configuration (environment):
+- ML_JOB_DIR: Directory for job checkpoints and results (default
+  <system temp dir>/ml-service/jobs; never inside the app directory, which
+  compose bind-mounts from the source tree). Replicas sharing it must see
+  each other's flock() locks (same host, or a file system that supports them).
+- ML_JOB_WORKERS: Concurrent jobs (default 1)
+
+On-disk layout per job:
+- <id>.params.json: Submitted params, written once (may hold every input item)
+- <id>.json: Job metadata and checkpoint - cursor, counters and small handler
+  state (replaced atomically)
+- <id>.state.npy: Bulky handler state as an array (e.g. cluster union-find
+  parents), replaced atomically before the checkpoint that refers to it
+- <id>.results.jsonl: Result lines, truncated to the checkpointed size on resume
+- <id>.lock: Locked by the worker running the job (released when it finishes
+  or the worker exits)
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+
+import numpy as np
+
+from admission import BULK, lane_context
+from embedding_migration import migrate_embeddings_job, serving_model_id
+from embeddings import get_embedding_service
+from identifier_index import get_identifier_index, normalize_identifiers, prenormalized_identifiers
+from image_hashing import get_image_detector
+from service_roles import role_includes
+from vector_store import get_vector_store
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = ("queued", "running")
+
+
+class JobCancelled(Exception):
+    """Raised inside a handler when its job has been cancelled"""
+
+
+class Job:
+    """State of a single background job"""
+
+    def __init__(self, job_type: str, params: Dict, job_id: Optional[str] = None):
+        self.id = job_id or uuid.uuid4().hex
+        self.type = job_type
+        self.params = params
+        self.status = "queued"
+        self.total: Optional[int] = None
+        self.processed = 0
+        self.failed = 0
+        self.cursor: Any = None  # Handler-defined resume position
+        self.state: Any = None  # Handler-defined intermediate state
+        self.results_offset = 0  # Bytes of committed result lines
+        self.result: Optional[Dict] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self.finished_at: Optional[float] = None
+        self.resumed = 0
+
+        # Throughput of the current run (not persisted)
+        self.run_started_at: Optional[float] = None
+        self.run_start_processed = 0
+
+    def to_dict(self) -> Dict:
+        """Checkpoint metadata (params are stored once, separately)"""
+        return {
+            "id": self.id,
+            "type": self.type,
+            "status": self.status,
+            "total": self.total,
+            "processed": self.processed,
+            "failed": self.failed,
+            "cursor": self.cursor,
+            "state": self.state,
+            "results_offset": self.results_offset,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+            "finished_at": self.finished_at,
+            "resumed": self.resumed,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict, params: Optional[Dict] = None) -> "Job":
+        # Checkpoints written before params moved to their own file embed them
+        job = cls(data["type"], params if params is not None else data["params"], job_id=data["id"])
+        for key in (
+            "status", "total", "processed", "failed", "cursor", "state",
+            "results_offset", "result", "error", "created_at", "updated_at",
+            "finished_at", "resumed",
+        ):
+            setattr(job, key, data.get(key, getattr(job, key)))
+        return job
+
+    def progress(self) -> Dict:
+        """Public view: status, progress and throughput (without params/state)"""
+        throughput = None
+        eta = None
+        if self.status == "running" and self.run_started_at:
+            elapsed = time.time() - self.run_started_at
+            done = self.processed - self.run_start_processed
+            if elapsed > 0:
+                throughput = round(done / elapsed, 2)
+            if throughput and self.total is not None:
+                eta = round(max(self.total - self.processed, 0) / throughput, 1)
+
+        return {
+            "id": self.id,
+            "type": self.type,
+            "status": self.status,
+            "total": self.total,
+            "processed": self.processed,
+            "failed": self.failed,
+            "percent": (
+                round(100.0 * self.processed / self.total, 2) if self.total else None
+            ),
+            "items_per_sec": throughput,
+            "eta_seconds": eta,
+            "resumed": self.resumed,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobContext:
+    """Handed to job handlers for checkpointing and cancellation checks"""
+
+    def __init__(self, manager: "JobManager", job: Job):
+        self.manager = manager
+        self.job = job
+
+    @property
+    def cancelled(self) -> bool:
+        return self.job.id in self.manager._cancel_requested
+
+    def check_cancelled(self) -> None:
+        if self.cancelled:
+            raise JobCancelled()
+
+    def set_total(self, total: int) -> None:
+        self.job.total = total
+        self.manager._save(self.job)
+
+    def checkpoint(
+        self,
+        cursor: Any,
+        processed: int,
+        results: Optional[List[Dict]] = None,
+        state: Any = None,
+        failed: int = 0,
+        state_array: Optional[np.ndarray] = None,
+    ) -> None:
+        """
+        Commit progress: append result lines, then persist the new cursor
+
+        Args:
+            cursor: Position to resume from
+            processed: Items completed by this step
+            results: Result lines produced by this step
+            state: Small handler state needed to resume (JSON-serializable)
+            failed: Items that failed in this step
+            state_array: Bulky handler state, kept in a .npy sidecar; it is
+                written before the cursor, so a handler resuming from the
+                previous cursor must tolerate state that is one step ahead
+        """
+        job = self.job
+        if results:
+            job.results_offset = self.manager._append_results(job, results)
+        if state_array is not None:
+            self.manager._save_state_array(job, state_array)
+
+        job.cursor = cursor
+        job.state = state
+        job.processed += processed
+        job.failed += failed
+        self.manager._save(job)
+
+    def load_state_array(self) -> Optional[np.ndarray]:
+        """State array of the last checkpoint (None if there is none)"""
+        return self.manager._load_state_array(self.job)
+
+    def run_async(self, coro, timeout: Optional[float] = None):
+        """Run a coroutine (e.g. a database call) on the service event loop"""
+        future = asyncio.run_coroutine_threadsafe(coro, self.manager.loop)
+        return future.result(timeout)
+
+
+JobHandler = Callable[[JobContext, Dict], Optional[Dict]]
+
+
+class JobManager:
+    """Submits, runs, checkpoints and resumes background jobs"""
+
+    def __init__(self, job_dir: str, max_workers: int = 1):
+        self.job_dir = job_dir
+        self.max_workers = max_workers
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+
+        self._handlers: Dict[str, JobHandler] = {}
+        self._jobs: Dict[str, Job] = {}
+        self._futures: Dict[str, Any] = {}
+        self._cancel_requested = set()
+        self._owned: Dict[str, Any] = {}  # Job ID -> open, flock()ed lock file
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._shutting_down = False
+
+        os.makedirs(job_dir, exist_ok=True)
+
+    def register(self, job_type: str, handler: JobHandler) -> None:
+        self._handlers[job_type] = handler
+
+    @property
+    def job_types(self) -> List[str]:
+        return sorted(self._handlers)
+
+    # ------------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------------
+
+    def start(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Start the executor and resume jobs left unfinished by a previous worker"""
+        self.loop = loop
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="ml-job"
+        )
+
+        for filename in sorted(os.listdir(self.job_dir)):
+            if not filename.endswith(".json") or filename.endswith(".params.json"):
+                continue
+            try:
+                with open(os.path.join(self.job_dir, filename), encoding="utf-8") as f:
+                    data = json.load(f)
+                job = Job.from_dict(data, self._load_params(data["id"]))
+            except (OSError, ValueError, KeyError) as e:
+                logger.error(f"Skipping unreadable job checkpoint {filename}: {e}")
+                continue
+
+            if job.type not in self._handlers:
+                # Belongs to a worker whose role runs this job type (shared
+                # ML_JOB_DIR); not listed, resumed or cancellable here
+                continue
+
+            if job.status in ACTIVE_STATUSES and not self._claim(job.id):
+                # Running on another replica of this role
+                logger.info(f"Job {job.id} ({job.type}) is owned by another worker")
+                continue
+
+            self._jobs[job.id] = job
+            if job.status in ACTIVE_STATUSES:
+                job.resumed += 1
+                job.status = "queued"
+                logger.info(f"Resuming job {job.id} ({job.type}) at {job.processed} items")
+                self._enqueue(job)
+
+    def shutdown(self) -> None:
+        """Stop accepting work; running jobs stop at their next checkpoint"""
+        if self._executor is None:
+            return
+
+        # Running jobs keep status "running" on disk and resume after restart
+        self._shutting_down = True
+        with self._lock:
+            self._cancel_requested.update(
+                job_id for job_id, job in self._jobs.items() if job.status in ACTIVE_STATUSES
+            )
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        self._executor = None
+
+        # Interrupted jobs can be resumed by another worker from now on
+        with self._lock:
+            owned, self._owned = self._owned, {}
+        for lock_file in owned.values():
+            lock_file.close()
+
+    # ------------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------------
+
+    def submit(self, job_type: str, params: Dict) -> Job:
+        if job_type not in self._handlers:
+            raise ValueError(f"Unknown job type: {job_type}")
+        if self._executor is None:
+            raise RuntimeError("Job manager is not running")
+
+        job = Job(job_type, params)
+        self._claim(job.id)
+        self._save_params(job)
+        self._save(job)
+        with self._lock:
+            self._jobs[job.id] = job
+        self._enqueue(job)
+
+        logger.info(f"Submitted job {job.id} ({job_type})")
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def list(self) -> List[Job]:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return sorted(jobs, key=lambda j: j.created_at, reverse=True)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        job = self._jobs.get(job_id)
+        if job is None or job.status not in ACTIVE_STATUSES:
+            return job
+
+        with self._lock:
+            self._cancel_requested.add(job_id)
+            future = self._futures.get(job_id)
+
+        # Not started yet - cancel immediately, otherwise at the next checkpoint
+        if future is not None and future.cancel():
+            self._finish(job, "cancelled")
+
+        return job
+
+    def read_results(self, job_id: str, offset: int = 0, limit: int = 100) -> List[Dict]:
+        """Committed result lines [offset, offset + limit) of a job"""
+        job = self._jobs[job_id]
+        path = self._results_path(job_id)
+        if not os.path.exists(path):
+            return []
+
+        results = []
+        with open(path, "rb") as f:
+            committed = f.read(job.results_offset)
+        for index, line in enumerate(committed.splitlines()):
+            if index < offset:
+                continue
+            if len(results) >= limit:
+                break
+            results.append(json.loads(line))
+        return results
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            statuses = [job.status for job in self._jobs.values()]
+
+        counts: Dict[str, int] = {}
+        for status in statuses:
+            counts[status] = counts.get(status, 0) + 1
+        return counts
+
+    # ------------------------------------------------------------------------
+    # Execution
+    # ------------------------------------------------------------------------
+
+    def _enqueue(self, job: Job) -> None:
+        future = self._executor.submit(self._run, job)
+        with self._lock:
+            self._futures[job.id] = future
+
+    def _run(self, job: Job) -> None:
+        if job.id in self._cancel_requested:
+            if not self._shutting_down:
+                self._finish(job, "cancelled")
+            return
+
+        # Drop result lines written after the last checkpoint
+        path = self._results_path(job.id)
+        if os.path.exists(path):
+            with open(path, "r+b") as f:
+                f.truncate(job.results_offset)
+
+        job.status = "running"
+        job.run_started_at = time.time()
+        job.run_start_processed = job.processed
+        self._save(job)
+
+        try:
+            # Jobs always yield to interactive requests inside the model
+            with lane_context(BULK):
+                result = self._handlers[job.type](JobContext(self, job), job.params)
+        except JobCancelled:
+            if self._shutting_down:
+                # Interrupted by shutdown - leave "running" so it resumes
+                logger.info(f"Job {job.id} interrupted by shutdown at {job.processed} items")
+                return
+            self._finish(job, "cancelled")
+            return
+        except Exception as e:
+            logger.error(f"Job {job.id} ({job.type}) failed: {e}")
+            job.error = str(e)
+            self._finish(job, "failed")
+            return
+
+        job.result = result
+        self._finish(job, "completed")
+
+    def _finish(self, job: Job, status: str) -> None:
+        job.status = status
+        job.finished_at = time.time()
+        with self._lock:
+            self._futures.pop(job.id, None)
+            self._cancel_requested.discard(job.id)
+            lock_file = self._owned.pop(job.id, None)
+        self._save(job)
+        if lock_file is not None:
+            lock_file.close()
+        logger.info(f"Job {job.id} ({job.type}) {status}: {job.processed} items")
+
+    # ------------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------------
+
+    def _job_path(self, job_id: str) -> str:
+        return os.path.join(self.job_dir, f"{job_id}.json")
+
+    def _results_path(self, job_id: str) -> str:
+        return os.path.join(self.job_dir, f"{job_id}.results.jsonl")
+
+    def _params_path(self, job_id: str) -> str:
+        return os.path.join(self.job_dir, f"{job_id}.params.json")
+
+    def _state_array_path(self, job_id: str) -> str:
+        return os.path.join(self.job_dir, f"{job_id}.state.npy")
+
+    def _lock_path(self, job_id: str) -> str:
+        return os.path.join(self.job_dir, f"{job_id}.lock")
+
+    def _claim(self, job_id: str) -> bool:
+        """Take the job's lock file (False if another worker holds it)"""
+        lock_file = open(self._lock_path(job_id), "ab")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return False
+
+        with self._lock:
+            self._owned[job_id] = lock_file
+        return True
+
+    def _write_atomic(self, path: str, write: Callable) -> None:
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def _save(self, job: Job) -> None:
+        job.updated_at = time.time()
+        payload = json.dumps(job.to_dict()).encode("utf-8")
+        self._write_atomic(self._job_path(job.id), lambda f: f.write(payload))
+
+    def _save_params(self, job: Job) -> None:
+        payload = json.dumps(job.params).encode("utf-8")
+        self._write_atomic(self._params_path(job.id), lambda f: f.write(payload))
+
+    def _load_params(self, job_id: str) -> Optional[Dict]:
+        path = self._params_path(job_id)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save_state_array(self, job: Job, array: np.ndarray) -> None:
+        self._write_atomic(
+            self._state_array_path(job.id), lambda f: np.save(f, array, allow_pickle=False)
+        )
+
+    def _load_state_array(self, job: Job) -> Optional[np.ndarray]:
+        path = self._state_array_path(job.id)
+        if not os.path.exists(path):
+            return None
+        return np.load(path, allow_pickle=False)
+
+    def _append_results(self, job: Job, results: List[Dict]) -> int:
+        with open(self._results_path(job.id), "ab") as f:
+            for item in results:
+                f.write(json.dumps(item, ensure_ascii=False).encode("utf-8") + b"\n")
+            f.flush()
+            os.fsync(f.fileno())
+            return f.tell()
+
+
+# ============================================================================
+# JOB TYPES
+# ============================================================================
+
+def _item_text(service, item: Dict) -> str:
+    if item.get("report"):
+        return service.create_report_text(item["report"])
+    return item.get("text") or ""
+
+
+def reembed_job(ctx: JobContext, params: Dict) -> Dict:
+    """
+    Params:
+        items: [{"id", "text" | "report"}] - inline input, or
+        source: "database" - every active report in fraud_reports
+        missing_only: (database) only reports without an embedding
+        write_to_database: Store embeddings in the serving embedding version
+        batch_size: Texts per model batch (default 64)
+        model_id: Registry model to embed with (default model if omitted;
+            database writes always use the serving version's model)
+    """
+    batch_size = int(params.get("batch_size", 64))
+    write_back = params.get("write_to_database") or params.get("source") == "database"
+
+    store = get_vector_store()
+    if write_back and store is None:
+        raise RuntimeError("Database matching is not enabled")
+
+    version = None
+    model_id = params.get("model_id")
+    if write_back:
+        # Never mix models within a version; other models go through migrate_embeddings
+        version, _ = ctx.run_async(store.versions())
+        if model_id not in (None, serving_model_id(version)):
+            raise ValueError(
+                f"Model {model_id} does not match the serving embedding version; "
+                "use a migrate_embeddings job"
+            )
+        model_id = serving_model_id(version)
+    service = get_embedding_service(model_id)
+
+    if params.get("source") == "database":
+        missing_only = bool(params.get("missing_only", False))
+        if ctx.job.total is None:
+            ctx.set_total(ctx.run_async(store.count_reports(missing_only, version)))
+
+        after_id = ctx.job.cursor
+        while True:
+            ctx.check_cancelled()
+            rows = ctx.run_async(store.fetch_reports(after_id, batch_size, missing_only, version))
+            if not rows:
+                break
+
+            texts = [service.create_report_text(row) for row in rows]
+            embeddings = service.batch_generate_embeddings(texts, batch_size)
+            ctx.run_async(
+                store.write_embeddings(zip([r["id"] for r in rows], embeddings), version=version)
+            )
+
+            after_id = rows[-1]["id"]
+            ctx.checkpoint(after_id, len(rows))
+
+        return {"embedded": ctx.job.processed}
+
+    items = params.get("items") or []
+    if ctx.job.total is None:
+        ctx.set_total(len(items))
+
+    position = ctx.job.cursor or 0
+    while position < len(items):
+        ctx.check_cancelled()
+        batch = items[position:position + batch_size]
+        texts = [_item_text(service, item) for item in batch]
+        embeddings = service.batch_generate_embeddings(texts, batch_size)
+
+        if write_back:
+            ctx.run_async(
+                store.write_embeddings(zip([i["id"] for i in batch], embeddings), version=version)
+            )
+
+        results = [
+            {"id": item["id"], "embedding": embedding.tolist()}
+            for item, embedding in zip(batch, embeddings)
+        ]
+        position += len(batch)
+        ctx.checkpoint(position, len(batch), results=results)
+
+    return {"embedded": ctx.job.processed}
+
+
+def rehash_job(ctx: JobContext, params: Dict) -> Dict:
+    """
+    Params:
+        items: [{"id", "image_url"}]
+        checkpoint_every: Images per checkpoint (default 20)
+    """
+    detector = get_image_detector()
+    items = params.get("items") or []
+    step = int(params.get("checkpoint_every", 20))
+
+    if ctx.job.total is None:
+        ctx.set_total(len(items))
+
+    position = ctx.job.cursor or 0
+    while position < len(items):
+        ctx.check_cancelled()
+        batch = items[position:position + step]
+
+        results = []
+        failed = 0
+        for item in batch:
+            hashes = detector.compute_image_hashes(item["image_url"])
+            if not hashes:
+                failed += 1
+            results.append({"id": item["id"], "hashes": hashes})
+
+        position += len(batch)
+        ctx.checkpoint(position, len(batch), results=results, failed=failed)
+
+    return {"hashed": ctx.job.processed - ctx.job.failed, "failed": ctx.job.failed}
+
+
+def cluster_job(ctx: JobContext, params: Dict) -> Dict:
+    """
+    Single-link clustering: reports with similarity >= threshold share a cluster
+
+    Params:
+        items: [{"id", "embedding"}] (normalized embeddings)
+        threshold: Similarity threshold (default 0.85)
+        chunk_size: Rows compared per step (default 256)
+    """
+    items = params.get("items") or []
+    threshold = float(params.get("threshold", 0.85))
+    chunk_size = int(params.get("chunk_size", 256))
+
+    if ctx.job.cursor == "done":
+        # Clusters were already written before a restart
+        return ctx.job.result
+
+    ids = [item["id"] for item in items]
+    matrix = np.asarray([item["embedding"] for item in items], dtype=np.float32)
+
+    if ctx.job.total is None:
+        ctx.set_total(len(items))
+
+    # Union-find parents are the resumable state (.npy sidecar)
+    saved = ctx.load_state_array() if ctx.job.cursor else None
+    parent = saved.tolist() if saved is not None else list(range(len(items)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    position = ctx.job.cursor or 0
+    while position < len(items):
+        ctx.check_cancelled()
+        end = min(position + chunk_size, len(items))
+
+        # Compare rows [position, end) with every later row
+        similarities = matrix[position:end] @ matrix.T
+        rows, cols = np.nonzero(similarities >= threshold)
+        for row, col in zip(rows.tolist(), cols.tolist()):
+            i = position + row
+            if col > i:
+                root_i, root_j = find(i), find(col)
+                if root_i != root_j:
+                    parent[root_j] = root_i
+
+        # Re-applying unions from a step past the cursor is harmless
+        ctx.checkpoint(end, end - position, state_array=np.asarray(parent, dtype=np.int64))
+        position = end
+
+    clusters: Dict[int, List[str]] = {}
+    for index, report_id in enumerate(ids):
+        clusters.setdefault(find(index), []).append(report_id)
+
+    results = [
+        {"cluster": n, "report_ids": members}
+        for n, members in enumerate(m for m in clusters.values() if len(m) > 1)
+    ]
+    summary = {
+        "clusters": len(results),
+        "clustered_reports": sum(len(r["report_ids"]) for r in results),
+    }
+    ctx.job.result = summary
+    ctx.checkpoint("done", 0, results=results)
+
+    return summary
+
+
+def load_identifiers_job(ctx: JobContext, params: Dict) -> Dict:
+    """
+    Params:
+        items: [{"id", "identifiers"}] - inline raw identifiers, or
+        source: "database" - normalized_fields of every active report
+        batch_size: Reports per page (default 5000)
+
+    Reports are upserted into the live index, so lookups keep working (and
+    concurrent updates are kept) while it loads.
+    """
+    index = get_identifier_index()
+    batch_size = int(params.get("batch_size", 5000))
+
+    if params.get("source") == "database":
+        store = get_vector_store()
+        if store is None:
+            raise RuntimeError("Database matching is not enabled")
+        if ctx.job.total is None:
+            ctx.set_total(ctx.run_async(store.count_identifiers()))
+
+        after_id = ctx.job.cursor
+        while True:
+            ctx.check_cancelled()
+            rows = ctx.run_async(store.fetch_identifiers(after_id, batch_size))
+            if not rows:
+                break
+
+            index.upsert((row["id"], prenormalized_identifiers(row)) for row in rows)
+            after_id = rows[-1]["id"]
+            ctx.checkpoint(after_id, len(rows))
+
+        return {"loaded": ctx.job.processed, "reports": len(index)}
+
+    items = params.get("items") or []
+    if ctx.job.total is None:
+        ctx.set_total(len(items))
+
+    position = ctx.job.cursor or 0
+    while position < len(items):
+        ctx.check_cancelled()
+        batch = items[position:position + batch_size]
+        index.upsert(
+            (item["id"], normalize_identifiers(item.get("identifiers") or {})) for item in batch
+        )
+        position += len(batch)
+        ctx.checkpoint(position, len(batch))
+
+    return {"loaded": ctx.job.processed, "reports": len(index)}
+
+
+# Singleton instance
+_job_manager: Optional[JobManager] = None
+
+
+def get_job_manager() -> JobManager:
+    """
+    Get or create singleton job manager with the built-in job types
+
+    Returns:
+        JobManager instance
+    """
+    global _job_manager
+
+    if _job_manager is None:
+        _job_manager = JobManager(
+            os.environ.get(
+                "ML_JOB_DIR", os.path.join(tempfile.gettempdir(), "ml-service", "jobs")
+            ),
+            max_workers=int(os.environ.get("ML_JOB_WORKERS", "1")),
+        )
+        if role_includes("embeddings"):
+            _job_manager.register("reembed", reembed_job)
+            _job_manager.register("cluster", cluster_job)
+            _job_manager.register("load_identifiers", load_identifiers_job)
+            _job_manager.register("migrate_embeddings", migrate_embeddings_job)
+        if role_includes("images"):
+            _job_manager.register("rehash", rehash_job)
+
+    return _job_manager
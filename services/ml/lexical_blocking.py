@@ -0,0 +1,210 @@
+"""
+Lexical blocking with MinHash + LSH
+Reports are reduced to diacritic-folded character shingles over the fields
+create_report_text() uses, summarized as MinHash signatures and cut into LSH
+bands. Reports sharing any band key become candidates, which are then
+re-scored with embeddings (SearchIndex.search_blocked) - a duplicate check
+touches a few hundred vectors instead of the whole corpus.
+
+Identity fields (names, contacts, address) and the description are signed
+separately: "Ján Novák, Hlavná 123" still collides with "Jan Novak, Hlavna 125"
+even when the two descriptions are worded differently. scam_type is left out
+since it would put every report of a type into the same buckets.
+
+Configuration (environment):
+- ML_LEXICAL_BLOCKING: Use blocking for index searches (default off; keys
+  are stored on every index upsert, so it can be switched on once the index
+  is backfilled). Shingles miss translated or paraphrased duplicates the
+  embedding would find.
+- ML_LSH_BANDS: Bands per field group (default 16)
+- ML_LSH_ROWS: MinHash values per band (default 4); with the defaults, pairs
+  above ~0.5 Jaccard similarity are very likely to collide
+- ML_SHINGLE_SIZE: Characters per shingle (default 3)
+- ML_LSH_MAX_CANDIDATES: Candidates re-scored per shard (default 200)
+
+Changing bands or rows changes the keys; the index must be rebuilt.
+"""
+
+from typing import Dict, List, Optional
+import os
+import re
+import unicodedata
+import zlib
+
+import numpy as np
+
+# Field groups signed separately (order fixes the key layout)
+FIELD_GROUPS = {
+    "identity": ("scammer_name", "company_name", "email", "website", "address", "city"),
+    "description": ("description",),
+}
+
+# Same truncation as EmbeddingService.create_report_text()
+MAX_DESCRIPTION_LENGTH = 500
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+
+def fold_text(text: str) -> str:
+    """Lowercase, strip diacritics and collapse punctuation/whitespace"""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return _NON_ALNUM.sub(" ", stripped).strip()
+
+
+def shingles(text: str, size: int = 3) -> set:
+    """Character shingles of folded text, padded so short words count"""
+    folded = fold_text(text)
+    if not folded:
+        return set()
+    padded = f" {folded} "
+    if len(padded) <= size:
+        return {padded}
+    return {padded[i : i + size] for i in range(len(padded) - size + 1)}
+
+
+class LexicalBlocker:
+    """Computes LSH band keys for reports and texts"""
+
+    def __init__(
+        self,
+        bands: int = 16,
+        rows: int = 4,
+        shingle_size: int = 3,
+        max_candidates: int = 200,
+        seed: int = 1,
+    ):
+        self.bands = bands
+        self.rows = rows
+        self.shingle_size = shingle_size
+        self.max_candidates = max_candidates
+
+        permutations = bands * rows
+        rng = np.random.default_rng(seed)
+        # Multiply-shift hashing: h(x) = ((a * x + b) mod 2^64) >> 32, a odd
+        self._a = rng.integers(1, 1 << 63, size=permutations, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 1 << 63, size=permutations, dtype=np.uint64)
+        # Combines the rows of a band (and the group) into one 64-bit key
+        self._row_mix = rng.integers(1, 1 << 63, size=rows, dtype=np.uint64) | np.uint64(1)
+        self._group_salt = {
+            group: np.uint64(zlib.crc32(group.encode()) + 1) for group in FIELD_GROUPS
+        }
+
+    @property
+    def key_count(self) -> int:
+        """Keys per report (bands x field groups)"""
+        return self.bands * len(FIELD_GROUPS)
+
+    def signature(self, shingle_set: set) -> Optional[np.ndarray]:
+        """MinHash signature of a shingle set (None for an empty set)"""
+        if not shingle_set:
+            return None
+        hashed = np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) for s in shingle_set),
+            dtype=np.uint64,
+            count=len(shingle_set),
+        )
+        with np.errstate(over="ignore"):
+            values = (np.outer(self._a, hashed) + self._b[:, None]) >> np.uint64(32)
+        return values.min(axis=1)
+
+    def _band_keys(self, signature: Optional[np.ndarray], salt: np.uint64) -> np.ndarray:
+        if signature is None:
+            # 0 = no key; never matched
+            return np.zeros(self.bands, dtype=np.uint64)
+        with np.errstate(over="ignore"):
+            banded = signature.reshape(self.bands, self.rows)
+            keys = (banded * self._row_mix).sum(axis=1, dtype=np.uint64) ^ salt
+            keys = keys * np.uint64(0x9E3779B97F4A7C15) + np.arange(self.bands, dtype=np.uint64)
+        keys[keys == 0] = 1
+        return keys
+
+    def group_texts(self, report: Dict) -> Dict[str, List[str]]:
+        texts = {}
+        for group, fields in FIELD_GROUPS.items():
+            values = [str(report[f]) for f in fields if report.get(f)]
+            if group == "description":
+                values = [v[:MAX_DESCRIPTION_LENGTH] for v in values]
+            texts[group] = values
+        return texts
+
+    def _keys_for_groups(self, texts: Dict[str, List[str]]) -> np.ndarray:
+        keys = []
+        for group in FIELD_GROUPS:
+            shingle_set = set()
+            for value in texts.get(group, ()):
+                shingle_set |= shingles(value, self.shingle_size)
+            keys.append(self._band_keys(self.signature(shingle_set), self._group_salt[group]))
+        return np.concatenate(keys)
+
+    def report_keys(self, report: Dict) -> np.ndarray:
+        """LSH keys of a report (fields as in create_report_text)"""
+        return self._keys_for_groups(self.group_texts(report))
+
+    def text_keys(self, text: str) -> np.ndarray:
+        """LSH keys of free text (treated as a description)"""
+        return self._keys_for_groups({"description": [text]})
+
+    def keys_for(self, report: Optional[Dict], text: Optional[str]) -> Optional[np.ndarray]:
+        """Keys from a report if given, else from text; None if neither"""
+        if report is not None:
+            return self.report_keys(report)
+        if text:
+            return self.text_keys(text)
+        return None
+
+
+def lexical_blocking_enabled() -> bool:
+    return os.environ.get("ML_LEXICAL_BLOCKING", "false").strip().lower() in (
+        "1", "true", "yes", "on"
+    )
+
+
+# Singleton instance
+_lexical_blocker: Optional[LexicalBlocker] = None
+
+
+def get_lexical_blocker() -> LexicalBlocker:
+    """
+    Get or create singleton lexical blocker instance
+
+    Returns:
+        LexicalBlocker instance
+    """
+    global _lexical_blocker
+
+    if _lexical_blocker is None:
+        _lexical_blocker = LexicalBlocker(
+            bands=int(os.environ.get("ML_LSH_BANDS", "16")),
+            rows=int(os.environ.get("ML_LSH_ROWS", "4")),
+            shingle_size=int(os.environ.get("ML_SHINGLE_SIZE", "3")),
+            max_candidates=int(os.environ.get("ML_LSH_MAX_CANDIDATES", "200")),
+        )
+
+    return _lexical_blocker
+
+
+# Example usage
+if __name__ == "__main__":
+    blocker = LexicalBlocker()
+
+    report1 = {
+        "scammer_name": "Ján Novák",
+        "description": "Ponúkal falošnú investíciu do kryptomien s garantovaným výnosom 20% mesačne.",
+        "address": "Hlavná 123, Bratislava",
+    }
+    report2 = {
+        "scammer_name": "Jan Novak",
+        "description": "Sľuboval vysoké zisky z investície do Bitcoinu, nakoniec zmizol s peniazmi.",
+        "address": "Hlavná 125, Bratislava",
+    }
+    report3 = {
+        "scammer_name": "Peter Kováč",
+        "description": "Predával neexistujúce autá cez inzerciu.",
+        "address": "Mierová 45, Košice",
+    }
+
+    keys1, keys2, keys3 = (blocker.report_keys(r) for r in (report1, report2, report3))
+    print(f"Folded: {fold_text(report1['scammer_name'])!r}")
+    print(f"Shared bands report1 <-> report2: {int(np.sum((keys1 == keys2) & (keys1 != 0)))}")
+    print(f"Shared bands report1 <-> report3: {int(np.sum((keys1 == keys3) & (keys1 != 0)))}")
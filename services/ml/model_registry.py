@@ -0,0 +1,236 @@
+"""
+Registry of embedding models addressable by ID
+Models are loaded lazily on first use; when the resident size of loaded
+models exceeds the memory budget, the least recently used ones are evicted.
+
+Configuration (environment):
+- ML_MODELS: Comma-separated "id=huggingface-name" pairs
+  (default "minilm=paraphrase-multilingual-MiniLM-L12-v2")
+- ML_DEFAULT_MODEL: ID used when a request names no model (default: first entry)
+- ML_MODEL_MEMORY_BUDGET_MB: Budget for all loaded models (default 3072)
+- MODEL_CACHE_DIR: Download cache for model weights
+"""
+
+from collections import OrderedDict
+from typing import Dict, Optional
+import gc
+import logging
+import os
+import threading
+import time
+
+from embeddings import EmbeddingService
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODELS = "minilm=paraphrase-multilingual-MiniLM-L12-v2"
+
+
+class UnknownModelError(KeyError):
+    """Raised for a model ID that is not configured"""
+
+
+class _ModelEntry:
+    def __init__(self, model_id: str, model_name: str):
+        self.model_id = model_id
+        self.model_name = model_name
+        self.service: Optional[EmbeddingService] = None
+        self.load_lock = threading.Lock()
+
+        # Statistics
+        self.loads = 0
+        self.evictions = 0
+        self.requests = 0
+        self.last_load_seconds: Optional[float] = None
+        self.memory_bytes = 0
+        self.last_used: Optional[float] = None
+
+    def stats(self) -> Dict:
+        service = self.service
+        stats = {
+            "model_name": self.model_name,
+            "loaded": service is not None,
+            "requests": self.requests,
+            "loads": self.loads,
+            "evictions": self.evictions,
+            "load_seconds": (
+                round(self.last_load_seconds, 3) if self.last_load_seconds else None
+            ),
+            "resident_mb": round(self.memory_bytes / (1024 * 1024), 1),
+            "last_used": self.last_used,
+        }
+        if service is not None:
+            stats["dimension"] = service.embedding_dim
+            stats["singleflight"] = service.inflight.stats()
+            stats["inference"] = service.inference_lock.stats()
+        return stats
+
+
+class ModelRegistry:
+    """Maps model IDs to lazily loaded EmbeddingService instances"""
+
+    def __init__(
+        self,
+        models: Dict[str, str],
+        default_model_id: str,
+        memory_budget_bytes: int,
+        cache_dir: Optional[str] = None,
+    ):
+        if default_model_id not in models:
+            raise ValueError(f"Default model '{default_model_id}' is not configured")
+
+        self.default_model_id = default_model_id
+        self.memory_budget_bytes = memory_budget_bytes
+        self.cache_dir = cache_dir
+
+        self._entries = {
+            model_id: _ModelEntry(model_id, name) for model_id, name in models.items()
+        }
+        # Loaded model IDs, least recently used first
+        self._lru: "OrderedDict[str, None]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def model_ids(self):
+        return list(self._entries)
+
+    def get(self, model_id: Optional[str] = None) -> EmbeddingService:
+        """
+        Get the service for a model, loading it if needed
+
+        Args:
+            model_id: Configured model ID (default model if None)
+
+        Returns:
+            EmbeddingService instance
+        """
+        model_id = model_id or self.default_model_id
+        entry = self._entries.get(model_id)
+        if entry is None:
+            raise UnknownModelError(model_id)
+
+        entry.requests += 1
+        entry.last_used = time.time()
+
+        service = entry.service
+        if service is None:
+            service = self._load(entry)
+
+        with self._lock:
+            if model_id in self._lru:
+                self._lru.move_to_end(model_id)
+
+        return service
+
+    def _load(self, entry: _ModelEntry) -> EmbeddingService:
+        # Per-model lock: concurrent first requests load the model only once
+        with entry.load_lock:
+            if entry.service is not None:
+                return entry.service
+
+            start = time.perf_counter()
+            service = EmbeddingService(entry.model_name, cache_dir=self.cache_dir)
+            entry.last_load_seconds = time.perf_counter() - start
+            entry.memory_bytes = service.memory_bytes()
+            entry.loads += 1
+            entry.service = service
+
+            logger.info(
+                f"Loaded model '{entry.model_id}' in {entry.last_load_seconds:.2f}s "
+                f"({entry.memory_bytes / (1024 * 1024):.0f} MB)"
+            )
+
+            with self._lock:
+                self._lru[entry.model_id] = None
+                self._lru.move_to_end(entry.model_id)
+                self._evict_over_budget(keep=entry.model_id)
+
+            return service
+
+    def _evict_over_budget(self, keep: str) -> None:
+        """Drop least recently used models until the budget fits (caller holds _lock)"""
+        evicted = False
+
+        while self.resident_bytes() > self.memory_budget_bytes:
+            victim = next((m for m in self._lru if m != keep), None)
+            if victim is None:
+                logger.warning(
+                    f"Model '{keep}' alone exceeds the memory budget "
+                    f"({self.memory_budget_bytes / (1024 * 1024):.0f} MB)"
+                )
+                break
+
+            del self._lru[victim]
+            entry = self._entries[victim]
+            # Requests still holding the service finish normally; memory is
+            # released once the last reference goes away
+            entry.service = None
+            entry.evictions += 1
+            evicted = True
+            logger.info(f"Evicted model '{victim}' (least recently used)")
+
+        if evicted:
+            gc.collect()
+
+    def resident_bytes(self) -> int:
+        return sum(
+            entry.memory_bytes
+            for entry in self._entries.values()
+            if entry.service is not None
+        )
+
+    def loaded_services(self) -> Dict[str, EmbeddingService]:
+        return {
+            model_id: entry.service
+            for model_id, entry in self._entries.items()
+            if entry.service is not None
+        }
+
+    def stats(self) -> Dict:
+        return {
+            "default_model": self.default_model_id,
+            "memory_budget_mb": round(self.memory_budget_bytes / (1024 * 1024), 1),
+            "resident_mb": round(self.resident_bytes() / (1024 * 1024), 1),
+            "models": {
+                model_id: entry.stats() for model_id, entry in self._entries.items()
+            },
+        }
+
+
+def parse_models(value: str) -> Dict[str, str]:
+    """Parse "id=name,id=name" into an ordered mapping"""
+    models: Dict[str, str] = {}
+    for part in value.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        model_id, _, model_name = part.partition("=")
+        models[model_id.strip()] = (model_name or model_id).strip()
+    return models
+
+
+# Singleton instance
+_model_registry: Optional[ModelRegistry] = None
+
+
+def get_model_registry() -> ModelRegistry:
+    """
+    Get or create singleton model registry instance
+
+    Returns:
+        ModelRegistry instance
+    """
+    global _model_registry
+
+    if _model_registry is None:
+        models = parse_models(os.environ.get("ML_MODELS", DEFAULT_MODELS))
+        _model_registry = ModelRegistry(
+            models,
+            default_model_id=os.environ.get("ML_DEFAULT_MODEL", next(iter(models))),
+            memory_budget_bytes=int(
+                float(os.environ.get("ML_MODEL_MEMORY_BUDGET_MB", "3072")) * 1024 * 1024
+            ),
+            cache_dir=os.environ.get("MODEL_CACHE_DIR"),
+        )
+
+    return _model_registry
@@ -0,0 +1,230 @@
+"""
+On-demand sampling profiler for the live ML worker
+A background thread snapshots Python stacks of all threads at a fixed interval
+and aggregates them into collapsed stacks (flamegraph.pl / speedscope) or
+speedscope JSON. Nothing runs unless a profile is explicitly requested.
+
+Modes:
+- wall: every sample counts, including threads blocked on I/O or locks
+- cpu: samples whose leaf frame is a known blocking call (selector, lock or
+       condition wait, socket read, idle pool worker) are dropped - an
+       approximation of on-CPU time
+"""
+
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Python leaf functions treated as "off-CPU" in cpu mode (C calls such as
+# time.sleep() do not appear as frames, so their callers cannot be told apart)
+_IDLE_FUNCTIONS = {
+    "select",  # selectors - event loop waiting for I/O
+    "wait",  # threading.Condition / Event
+    "_wait_for_tstate_lock",  # Thread.join
+    "acquire",
+    "readinto",  # socket reads
+    "accept",
+    "_worker",  # idle concurrent.futures worker blocked on its queue
+}
+
+SUPPORTED_MODES = ("wall", "cpu")
+SUPPORTED_FORMATS = ("collapsed", "speedscope")
+
+Frame = Tuple[str, str, int]  # (function, file, first line)
+
+
+def _frame_label(frame: Frame) -> str:
+    function, filename, line = frame
+    return f"{function} ({os.path.basename(filename)}:{line})".replace(";", ":")
+
+
+class SamplingProfiler:
+    """
+    Samples Python stacks of every thread in this process
+
+    Usage:
+        profiler = SamplingProfiler(interval=0.005, mode="wall")
+        profiler.start()
+        ...
+        profiler.stop()
+        profiler.to_collapsed()
+    """
+
+    def __init__(self, interval: float = 0.005, mode: str = "wall"):
+        if mode not in SUPPORTED_MODES:
+            raise ValueError(f"Unsupported profile mode: {mode}")
+
+        self.interval = max(interval, 0.001)
+        self.mode = mode
+
+        # (thread name, root-first stack) -> sample count
+        self.samples: Counter = Counter()
+        self.sample_count = 0
+        self.started_at: Optional[float] = None
+        self.duration = 0.0
+
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self.started_at = time.time()
+        self._thread = threading.Thread(
+            target=self._run, name="sampling-profiler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self.started_at is not None:
+            self.duration = time.time() - self.started_at
+
+    def _run(self) -> None:
+        own_ident = threading.get_ident()
+
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+
+                stack: List[Frame] = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+                    frame = frame.f_back
+
+                if not stack:
+                    continue
+                if self.mode == "cpu" and stack[0][0] in _IDLE_FUNCTIONS:
+                    continue
+
+                stack.reverse()
+                self.samples[(names.get(ident, str(ident)), tuple(stack))] += 1
+
+            self.sample_count += 1
+
+    # ------------------------------------------------------------------------
+    # Output formats
+    # ------------------------------------------------------------------------
+
+    def to_collapsed(self) -> str:
+        """
+        Brendan Gregg collapsed-stack format: "thread;frame;frame count" per line
+        """
+        lines = []
+        for (thread_name, stack), count in self.samples.most_common():
+            labels = [thread_name.replace(";", ":")] + [_frame_label(f) for f in stack]
+            lines.append(f"{';'.join(labels)} {count}")
+
+        return "\n".join(lines) + ("\n" if lines else "")
+
+    def to_speedscope(self, name: str = "ml-service") -> Dict:
+        """
+        speedscope file format with one sampled profile per thread
+        https://www.speedscope.app/file-format-schema.json
+        """
+        frame_index: Dict[Frame, int] = {}
+        frames: List[Dict] = []
+        per_thread: Dict[str, Tuple[List[List[int]], List[float]]] = {}
+
+        for (thread_name, stack), count in self.samples.items():
+            indexes = []
+            for frame in stack:
+                if frame not in frame_index:
+                    frame_index[frame] = len(frames)
+                    frames.append(
+                        {"name": frame[0], "file": frame[1], "line": frame[2]}
+                    )
+                indexes.append(frame_index[frame])
+
+            samples, weights = per_thread.setdefault(thread_name, ([], []))
+            samples.append(indexes)
+            weights.append(count * self.interval)
+
+        profiles = [
+            {
+                "type": "sampled",
+                "name": f"{thread_name} ({self.mode})",
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights,
+            }
+            for thread_name, (samples, weights) in sorted(per_thread.items())
+        ]
+
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "scamnemesis-ml-profiler",
+            "shared": {"frames": frames},
+            "profiles": profiles,
+        }
+
+    def render(self, output_format: str) -> Tuple[str, str]:
+        """
+        Render the profile
+
+        Returns:
+            Tuple of (body, media_type)
+        """
+        if output_format == "speedscope":
+            return json.dumps(self.to_speedscope()), "application/json"
+        if output_format == "collapsed":
+            return self.to_collapsed(), "text/plain"
+        raise ValueError(f"Unsupported profile format: {output_format}")
+
+
+class ProfileStore:
+    """Keeps the most recent per-request profiles for later download"""
+
+    def __init__(self, max_profiles: int = 20):
+        self.max_profiles = max_profiles
+        self._profiles: Dict[str, Tuple[str, str]] = {}
+        self._lock = threading.Lock()
+
+    def put(self, profile_id: str, body: str, media_type: str) -> None:
+        with self._lock:
+            self._profiles[profile_id] = (body, media_type)
+            while len(self._profiles) > self.max_profiles:
+                self._profiles.pop(next(iter(self._profiles)))
+
+    def get(self, profile_id: str) -> Optional[Tuple[str, str]]:
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+
+# Only one profiler may run at a time - overlapping profiles would sample
+# each other and double the overhead
+profiler_lock = threading.Lock()
+
+# Singleton instance
+_profile_store: Optional[ProfileStore] = None
+
+
+def get_profile_store() -> ProfileStore:
+    """
+    Get or create singleton profile store instance
+
+    Returns:
+        ProfileStore instance
+    """
+    global _profile_store
+
+    if _profile_store is None:
+        _profile_store = ProfileStore(
+            max_profiles=int(os.environ.get("PROFILE_STORE_SIZE", "20"))
+        )
+
+    return _profile_store
@@ -0,0 +1,716 @@
+"""
+In-memory search index for report embeddings and image hashes
+Brute-force but vectorized: embeddings are scanned with one matrix-vector
+product, image hashes with XOR + popcount over packed bytes. Used as the
+per-shard index behind sharding.py.
+
+Reports can also carry LSH band keys (lexical_blocking.py); search_blocked()
+then scores only the reports sharing a band key with the query, plus every
+report that has an embedding but no keys (e.g. indexed before blocking or
+without text). When that leaves fewer candidates than top_k it falls back to
+the exhaustive search, so blocking never returns less than a full answer
+would need. Band keys are kept sorted per band for binary search, plus a
+short unsorted tail of recently added rows that is merged into the sorted
+bands once it reaches LSH_MAX_TAIL rows.
+
+Deletes and re-upserted LSH keys leave tombstoned rows behind (embeddings
+and image hashes are overwritten in place); compact() rebuilds the arrays
+without them off the lock and swaps the new version in, replaying mutations
+that arrived meanwhile, so queries keep running during compaction.
+Persistence (write-ahead log + snapshots) lives in durable_index.py.
+"""
+
+from typing import Dict, List, Optional, Tuple
+import threading
+import time
+
+import numpy as np
+
+HASH_TYPES = ("phash", "ahash", "dhash", "whash")
+
+# Same weighting as ImageDuplicateDetector.compare_images()
+HASH_WEIGHTS = {
+    "phash": 0.5,
+    "dhash": 0.3,
+    "ahash": 0.15,
+    "whash": 0.05,
+}
+
+# Unsorted LSH rows scanned linearly before they are merged into the sorted bands
+LSH_MAX_TAIL = 4096
+
+# Set bits per byte value
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def hash_to_bytes(hex_hash: str) -> np.ndarray:
+    """Hex hash string (imagehash str()) -> packed uint8 array"""
+    return np.frombuffer(bytes.fromhex(hex_hash), dtype=np.uint8)
+
+
+def hamming_distances(matrix: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """
+    Hamming distance between a query hash and every row of a packed hash matrix
+
+    Args:
+        matrix: (N, bytes) uint8 array
+        query: (bytes,) uint8 array
+
+    Returns:
+        (N,) array of differing bit counts
+    """
+    return _POPCOUNT[np.bitwise_xor(matrix, query)].sum(axis=1, dtype=np.int32)
+
+
+def pairwise_hamming_distances(left: np.ndarray, right: np.ndarray) -> np.ndarray:
+    """
+    Hamming distance between every pair of rows of two packed hash matrices
+
+    Args:
+        left: (K, bytes) uint8 array
+        right: (M, bytes) uint8 array
+
+    Returns:
+        (K, M) array of differing bit counts
+    """
+    return _POPCOUNT[np.bitwise_xor(left[:, None, :], right[None, :, :])].sum(
+        axis=2, dtype=np.int32
+    )
+
+
+class _Rows:
+    """Growable row storage with ID -> row mapping and tombstones"""
+
+    def __init__(self):
+        self.ids: List = []
+        self.row_of: Dict = {}
+        self.alive = np.zeros(0, dtype=bool)
+        self.tombstones = 0
+
+    def __len__(self) -> int:
+        return len(self.row_of)
+
+    def _grow(self, arrays: Dict[str, np.ndarray], needed: int) -> Dict[str, np.ndarray]:
+        capacity = len(self.alive)
+        if needed <= capacity:
+            return arrays
+
+        new_capacity = max(needed, capacity * 2, 64)
+        alive = np.zeros(new_capacity, dtype=bool)
+        alive[:capacity] = self.alive
+        self.alive = alive
+
+        grown = {}
+        for name, array in arrays.items():
+            new_array = np.zeros((new_capacity,) + array.shape[1:], dtype=array.dtype)
+            new_array[:capacity] = array
+            grown[name] = new_array
+        return grown
+
+    def assign(self, key, arrays: Dict[str, np.ndarray]) -> Tuple[int, Dict[str, np.ndarray]]:
+        """Row for key (existing row is overwritten, new keys are appended)"""
+        row = self.row_of.get(key)
+        if row is None:
+            row = len(self.ids)
+            arrays = self._grow(arrays, row + 1)
+            self.ids.append(key)
+            self.row_of[key] = row
+        self.alive[row] = True
+        return row, arrays
+
+    def remove(self, key) -> bool:
+        row = self.row_of.pop(key, None)
+        if row is None:
+            return False
+        self.alive[row] = False
+        self.tombstones += 1
+        return True
+
+    def capture(self, arrays: Dict[str, np.ndarray]) -> Dict:
+        """Point-in-time view for compaction (caller holds the index lock)"""
+        count = len(self.ids)
+        return {
+            "ids": self.ids[:count],
+            "alive": self.alive[:count].copy(),
+            "arrays": {name: array for name, array in arrays.items()},
+        }
+
+    @classmethod
+    def compacted(cls, captured: Dict) -> Tuple["_Rows", Dict[str, np.ndarray]]:
+        """Rows and arrays holding only the live rows of a captured view"""
+        keep = np.nonzero(captured["alive"])[0]
+        arrays = {name: array[keep] for name, array in captured["arrays"].items()}
+        return cls.from_ids([captured["ids"][i] for i in keep]), arrays
+
+    @classmethod
+    def from_ids(cls, ids: List) -> "_Rows":
+        rows = cls()
+        rows.ids = list(ids)
+        rows.row_of = {key: row for row, key in enumerate(rows.ids)}
+        rows.alive = np.ones(len(rows.ids), dtype=bool)
+        return rows
+
+
+def _image_lookup(rows: _Rows) -> Dict[str, set]:
+    """Report ID -> image IDs of the live image rows"""
+    images_of: Dict[str, set] = {}
+    for report_id, image_id in rows.row_of:
+        images_of.setdefault(report_id, set()).add(image_id)
+    return images_of
+
+
+def _build_lsh(keys: Optional[np.ndarray]) -> Dict:
+    """Per-band sorted keys and their rows for rows [0, len(keys))"""
+    if keys is None or len(keys) == 0:
+        return {"built": 0, "keys": None, "rows": None}
+
+    order = np.argsort(keys, axis=0, kind="stable")
+    return {
+        "built": len(keys),
+        "keys": np.ascontiguousarray(np.take_along_axis(keys, order, axis=0).T),
+        "rows": np.ascontiguousarray(order.T),
+    }
+
+
+def _merge_lsh(lsh: Dict, keys: np.ndarray) -> Dict:
+    """Band tables of lsh extended with the unsorted rows [built, len(keys))"""
+    built = lsh["built"]
+    if not built:
+        return _build_lsh(keys)
+
+    tail_keys = keys[built:]
+    order = np.argsort(tail_keys, axis=0, kind="stable")
+    merged_keys = []
+    merged_rows = []
+    for band in range(keys.shape[1]):
+        band_tail = tail_keys[order[:, band], band]
+        positions = np.searchsorted(lsh["keys"][band], band_tail, side="right")
+        merged_keys.append(np.insert(lsh["keys"][band], positions, band_tail))
+        merged_rows.append(np.insert(lsh["rows"][band], positions, order[:, band] + built))
+
+    return {
+        "built": len(keys),
+        "keys": np.stack(merged_keys),
+        "rows": np.stack(merged_rows),
+    }
+
+
+class SearchIndex:
+    """
+    Embeddings keyed by report ID and image hashes keyed by (report ID, image ID)
+    """
+
+    def __init__(self, dimension: Optional[int] = None):
+        # Dimension is taken from the first embedding unless given
+        self.dimension = dimension
+        self._lock = threading.RLock()
+
+        self._embedding_rows = _Rows()
+        self._embeddings: Dict[str, np.ndarray] = {}
+
+        self._image_rows = _Rows()
+        self._hashes: Dict[str, np.ndarray] = {}
+        self._images_of: Dict[str, set] = {}
+
+        self._lexical_rows = _Rows()
+        self._lexical: Dict[str, np.ndarray] = {}
+        self._lsh = _build_lsh(None)
+
+        # Reports with an embedding but no LSH keys (always scored when blocking)
+        self._unkeyed: set = set()
+
+        # Mutations made while a compaction is building (None = not compacting)
+        self._pending: Optional[List[Tuple[str, Tuple]]] = None
+        self._compaction_lock = threading.Lock()
+
+        # Statistics
+        self.compactions = 0
+        self.last_compaction_seconds: Optional[float] = None
+
+    # ------------------------------------------------------------------------
+    # Mutations
+    # ------------------------------------------------------------------------
+
+    def upsert_embedding(self, report_id: str, embedding) -> None:
+        vector = np.asarray(embedding, dtype=np.float32)
+
+        with self._lock:
+            self._apply_upsert_embedding(report_id, vector)
+            self._record("upsert_embedding", (report_id, vector))
+
+    def upsert_image(self, report_id: str, image_id: str, hashes: Dict[str, str]) -> None:
+        packed = {t: hash_to_bytes(hashes[t]) for t in HASH_TYPES if t in hashes}
+        if len(packed) != len(HASH_TYPES):
+            raise ValueError(f"Image hashes must include {', '.join(HASH_TYPES)}")
+
+        with self._lock:
+            self._apply_upsert_image(report_id, image_id, packed)
+            self._record("upsert_image", (report_id, image_id, hashes))
+
+    def upsert_lexical(self, report_id: str, keys) -> None:
+        """Set a report's LSH band keys (0 = no key for that band)"""
+        keys = np.asarray(keys, dtype=np.uint64)
+
+        with self._lock:
+            self._apply_upsert_lexical(report_id, keys)
+            self._record("upsert_lexical", (report_id, keys))
+
+    def delete_report(self, report_id: str) -> int:
+        """Remove a report's embedding, LSH keys and all of its images"""
+        with self._lock:
+            removed = self._apply_delete(report_id)
+            self._record("delete", (report_id,))
+            return removed
+
+    def commit(self) -> None:
+        """Make preceding mutations durable (no-op for the in-memory index)"""
+
+    def _record(self, op: str, args: Tuple) -> None:
+        """Called under the lock after each mutation"""
+        if self._pending is not None:
+            self._pending.append((op, args))
+
+    def _apply(self, op: str, args: Tuple) -> None:
+        if op == "upsert_embedding":
+            self._apply_upsert_embedding(args[0], np.asarray(args[1], dtype=np.float32))
+        elif op == "upsert_image":
+            packed = {t: hash_to_bytes(h) for t, h in args[2].items() if t in HASH_TYPES}
+            self._apply_upsert_image(args[0], args[1], packed)
+        elif op == "upsert_lexical":
+            self._apply_upsert_lexical(args[0], np.asarray(args[1], dtype=np.uint64))
+        elif op == "delete":
+            self._apply_delete(args[0])
+        else:
+            raise ValueError(f"Unknown index operation: {op}")
+
+    def _apply_upsert_embedding(self, report_id: str, vector: np.ndarray) -> None:
+        if not self._embeddings:
+            self.dimension = self.dimension or len(vector)
+            self._embeddings = {
+                "vectors": np.zeros((0, self.dimension), dtype=np.float32)
+            }
+        if vector.shape != (self.dimension,):
+            raise ValueError(f"Expected embedding of dimension {self.dimension}")
+
+        row, self._embeddings = self._embedding_rows.assign(report_id, self._embeddings)
+        self._embeddings["vectors"][row] = vector
+        if report_id not in self._lexical_rows.row_of:
+            self._unkeyed.add(report_id)
+
+    def _apply_upsert_image(self, report_id: str, image_id: str, packed: Dict) -> None:
+        if not self._hashes:
+            self._hashes = {
+                t: np.zeros((0, len(packed[t])), dtype=np.uint8) for t in HASH_TYPES
+            }
+        row, self._hashes = self._image_rows.assign((report_id, image_id), self._hashes)
+        for hash_type, value in packed.items():
+            self._hashes[hash_type][row] = value
+        self._images_of.setdefault(report_id, set()).add(image_id)
+
+    def _apply_upsert_lexical(self, report_id: str, keys: np.ndarray) -> None:
+        if not self._lexical:
+            self._lexical = {"keys": np.zeros((0, len(keys)), dtype=np.uint64)}
+        width = self._lexical["keys"].shape[1]
+        if keys.shape != (width,):
+            raise ValueError(f"Expected {width} LSH keys (index built with other LSH settings)")
+
+        # Always a fresh row: rows covered by the sorted band keys never change
+        self._lexical_rows.remove(report_id)
+        row, self._lexical = self._lexical_rows.assign(report_id, self._lexical)
+        self._lexical["keys"][row] = keys
+        self._unkeyed.discard(report_id)
+
+        count = len(self._lexical_rows.ids)
+        if count - self._lsh["built"] >= LSH_MAX_TAIL:
+            # New arrays, so views captured by a running compaction stay intact
+            self._lsh = _merge_lsh(self._lsh, self._lexical["keys"][:count])
+
+    def _apply_delete(self, report_id: str) -> int:
+        self._lexical_rows.remove(report_id)
+        self._unkeyed.discard(report_id)
+        removed = int(self._embedding_rows.remove(report_id))
+        for image_id in self._images_of.pop(report_id, ()):
+            removed += int(self._image_rows.remove((report_id, image_id)))
+        return removed
+
+    # ------------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------------
+
+    def search_embeddings(
+        self, query, threshold: float = 0.85, top_k: Optional[int] = None
+    ) -> List[Tuple[str, float]]:
+        """
+        Reports with cosine similarity >= threshold (embeddings are normalized)
+
+        Returns:
+            List of (report_id, similarity) tuples, sorted by similarity
+        """
+        query = np.asarray(query, dtype=np.float32)
+
+        with self._lock:
+            rows = self._embedding_rows
+            count = len(rows.ids)
+            if count == 0 or query.shape != (self.dimension,):
+                return []
+
+            scores = self._embeddings["vectors"][:count] @ query
+            candidates = np.nonzero(rows.alive[:count] & (scores >= threshold))[0]
+
+            if top_k is not None and len(candidates) > top_k:
+                best = np.argpartition(-scores[candidates], top_k - 1)[:top_k]
+                candidates = candidates[best]
+
+            results = [
+                (rows.ids[i], float(min(max(scores[i], 0.0), 1.0))) for i in candidates
+            ]
+
+        results.sort(key=lambda x: x[1], reverse=True)
+        return results
+
+    def _lexical_candidates(self, query_keys: np.ndarray, max_candidates: int) -> np.ndarray:
+        """Live lexical rows sharing a band key, most shared bands first (caller holds lock)"""
+        rows = self._lexical_rows
+        count = len(rows.ids)
+        if count == 0 or query_keys.shape != self._lexical["keys"].shape[1:]:
+            return np.zeros(0, dtype=np.int64)
+
+        bands = np.nonzero(query_keys)[0]
+        hits = []
+
+        lsh = self._lsh
+        built = lsh["built"]
+        if built:
+            for band in bands:
+                band_keys = lsh["keys"][band]
+                lo = np.searchsorted(band_keys, query_keys[band], side="left")
+                hi = np.searchsorted(band_keys, query_keys[band], side="right")
+                hits.append(lsh["rows"][band, lo:hi])
+
+        if count > built:
+            tail = self._lexical["keys"][built:count][:, bands]
+            matched = (tail == query_keys[bands]).sum(axis=1)
+            hits.append(np.repeat(np.arange(built, count), matched))
+
+        if not hits:
+            return np.zeros(0, dtype=np.int64)
+
+        candidates, shared = np.unique(np.concatenate(hits), return_counts=True)
+        live = rows.alive[candidates]
+        candidates, shared = candidates[live], shared[live]
+
+        if len(candidates) > max_candidates:
+            candidates = candidates[np.argpartition(-shared, max_candidates - 1)[:max_candidates]]
+        return candidates
+
+    def search_blocked(
+        self,
+        query,
+        query_keys,
+        threshold: float = 0.85,
+        top_k: Optional[int] = None,
+        max_candidates: int = 200,
+    ) -> Tuple[List[Tuple[str, float]], int]:
+        """
+        Like search_embeddings, but only scores reports sharing an LSH band
+        (plus reports without LSH keys)
+
+        Falls back to search_embeddings when blocking yields fewer than top_k
+        candidates (at least one).
+
+        Returns:
+            (matches sorted by similarity, number of candidates scored)
+        """
+        query = np.asarray(query, dtype=np.float32)
+        query_keys = np.asarray(query_keys, dtype=np.uint64)
+
+        with self._lock:
+            if not self._embeddings or query.shape != (self.dimension,):
+                return [], 0
+
+            candidate_ids = list(self._unkeyed)
+            if self._lexical:
+                candidate_ids += [
+                    self._lexical_rows.ids[row]
+                    for row in self._lexical_candidates(query_keys, max_candidates)
+                ]
+            row_of = self._embedding_rows.row_of
+            embedding_rows = [
+                (report_id, row_of[report_id]) for report_id in candidate_ids if report_id in row_of
+            ]
+
+            if len(embedding_rows) < max(top_k or 1, 1):
+                # Too few lexical candidates to fill the answer: score everything
+                return (
+                    self.search_embeddings(query, threshold, top_k),
+                    len(self._embedding_rows),
+                )
+
+            ids, row_indexes = zip(*embedding_rows)
+            scores = self._embeddings["vectors"][list(row_indexes)] @ query
+
+        matches = [
+            (report_id, float(min(max(score, 0.0), 1.0)))
+            for report_id, score in zip(ids, scores)
+            if score >= threshold
+        ]
+        matches.sort(key=lambda x: x[1], reverse=True)
+        return matches[:top_k] if top_k is not None else matches, len(ids)
+
+    def search_images(
+        self, hashes: Dict[str, str], threshold: float = 10, top_k: Optional[int] = None
+    ) -> List[Dict]:
+        """
+        Images whose weighted Hamming score is <= threshold
+
+        Returns:
+            List of matches (report id, image id, distances, weighted_score),
+            sorted by weighted_score (lower = more similar)
+        """
+        query = {t: hash_to_bytes(hashes[t]) for t in HASH_TYPES if t in hashes}
+
+        with self._lock:
+            rows = self._image_rows
+            count = len(rows.ids)
+            if count == 0 or not query:
+                return []
+
+            distances = {
+                t: hamming_distances(self._hashes[t][:count], q) for t, q in query.items()
+            }
+            # Missing hash types count as distance 100, as in compare_images()
+            weighted = sum(
+                distances[t] * w if t in distances else np.full(count, 100 * w)
+                for t, w in HASH_WEIGHTS.items()
+            )
+            candidates = np.nonzero(rows.alive[:count] & (weighted <= threshold))[0]
+
+            if top_k is not None and len(candidates) > top_k:
+                best = np.argpartition(weighted[candidates], top_k - 1)[:top_k]
+                candidates = candidates[best]
+
+            results = []
+            for i in candidates:
+                image_distances = {t: int(d[i]) for t, d in distances.items()}
+                report_id, image_id = rows.ids[i]
+                results.append(
+                    {
+                        "id": report_id,
+                        "image_id": image_id,
+                        "distances": image_distances,
+                        "weighted_score": float(weighted[i]),
+                        "avg_distance": sum(image_distances.values()) / len(image_distances),
+                    }
+                )
+
+        results.sort(key=lambda x: x["weighted_score"])
+        return results
+
+    # ------------------------------------------------------------------------
+    # Compaction
+    # ------------------------------------------------------------------------
+
+    def tombstone_ratio(self) -> float:
+        with self._lock:
+            all_rows = (self._embedding_rows, self._image_rows, self._lexical_rows)
+            rows = sum(len(r.ids) for r in all_rows)
+            tombstones = sum(r.tombstones for r in all_rows)
+            return tombstones / rows if rows else 0.0
+
+    def compact(self) -> Dict:
+        """
+        Rebuild the arrays without tombstones and swap them in
+
+        The rebuild runs without the lock; mutations made meanwhile are
+        recorded and replayed onto the new version before the swap.
+
+        Returns:
+            Live entries and tombstones dropped
+        """
+        with self._compaction_lock:
+            start = time.perf_counter()
+
+            with self._lock:
+                captured = self._capture()
+                self._pending = []
+                token = self._compaction_started()
+
+            try:
+                state = {
+                    "embeddings": _Rows.compacted(captured["embeddings"]),
+                    "images": _Rows.compacted(captured["images"]),
+                    "lexical": _Rows.compacted(captured["lexical"]),
+                    "dimension": captured["dimension"],
+                }
+                state["images_of"] = _image_lookup(state["images"][0])
+                state["lsh"] = _build_lsh(state["lexical"][1].get("keys"))
+                self._compaction_built(state, token)
+            except Exception:
+                with self._lock:
+                    self._pending = None
+                raise
+
+            with self._lock:
+                self._install(state)
+                pending, self._pending = self._pending, None
+                for op, args in pending:
+                    self._apply(op, args)
+
+            self.compactions += 1
+            self.last_compaction_seconds = time.perf_counter() - start
+            dropped = sum(
+                len(view["ids"]) - int(view["alive"].sum())
+                for view in (captured["embeddings"], captured["images"], captured["lexical"])
+            )
+
+            return {
+                "embeddings": len(self._embedding_rows),
+                "images": len(self._image_rows),
+                "lexical": len(self._lexical_rows),
+                "dropped": dropped,
+                "replayed": len(pending),
+            }
+
+    def _capture(self) -> Dict:
+        return {
+            "embeddings": self._embedding_rows.capture(self._embeddings),
+            "images": self._image_rows.capture(self._hashes),
+            "lexical": self._lexical_rows.capture(self._lexical),
+            "dimension": self.dimension,
+        }
+
+    def _install(self, state: Dict) -> None:
+        """Replace the whole index contents (caller holds the lock)"""
+        self._embedding_rows, self._embeddings = state["embeddings"]
+        self._image_rows, self._hashes = state["images"]
+        self.dimension = state["dimension"]
+        self._images_of = state.get("images_of") or _image_lookup(self._image_rows)
+        self._lexical_rows, self._lexical = state["lexical"]
+        self._lsh = state.get("lsh") or _build_lsh(self._lexical.get("keys"))
+        self._unkeyed = {
+            report_id for report_id in self._embedding_rows.row_of
+            if report_id not in self._lexical_rows.row_of
+        }
+
+    def _compaction_started(self):
+        """Hook called under the lock when a compaction captures its view"""
+        return None
+
+    def _compaction_built(self, state: Dict, token) -> None:
+        """Hook called off the lock with the compacted version, before the swap"""
+
+    # ------------------------------------------------------------------------
+    # Export (rebalancing) and stats
+    # ------------------------------------------------------------------------
+
+    def report_ids(self) -> List[str]:
+        with self._lock:
+            ids = set(self._embedding_rows.row_of)
+            ids.update(self._images_of)
+            ids.update(self._lexical_rows.row_of)
+            return sorted(ids)
+
+    def export_reports(self, report_ids: List[str]) -> Dict:
+        """Embeddings and image hashes of the given reports (for moving them)"""
+        wanted = set(report_ids)
+
+        with self._lock:
+            embeddings = {
+                report_id: self._embeddings["vectors"][row].copy()
+                for report_id, row in self._embedding_rows.row_of.items()
+                if report_id in wanted
+            }
+            images = [
+                {
+                    "report_id": report_id,
+                    "image_id": image_id,
+                    "hashes": {t: self._hashes[t][row].tobytes().hex() for t in HASH_TYPES},
+                }
+                for (report_id, image_id), row in self._image_rows.row_of.items()
+                if report_id in wanted
+            ]
+            lexical = {
+                report_id: self._lexical["keys"][row].copy()
+                for report_id, row in self._lexical_rows.row_of.items()
+                if report_id in wanted
+            }
+
+        return {"embeddings": embeddings, "images": images, "lexical": lexical}
+
+    def import_reports(self, data: Dict) -> None:
+        for report_id, embedding in data["embeddings"].items():
+            self.upsert_embedding(report_id, embedding)
+        for image in data["images"]:
+            self.upsert_image(image["report_id"], image["image_id"], image["hashes"])
+        for report_id, keys in data.get("lexical", {}).items():
+            self.upsert_lexical(report_id, keys)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "embeddings": len(self._embedding_rows),
+                "images": len(self._image_rows),
+                "lexical": len(self._lexical_rows),
+                "tombstones": (
+                    self._embedding_rows.tombstones
+                    + self._image_rows.tombstones
+                    + self._lexical_rows.tombstones
+                ),
+                "compactions": self.compactions,
+                "last_compaction_seconds": (
+                    round(self.last_compaction_seconds, 3)
+                    if self.last_compaction_seconds is not None else None
+                ),
+            }
+
+
+# ============================================================================
+# STATE SERIALIZATION (snapshots)
+# ============================================================================
+
+def state_to_arrays(state: Dict) -> Dict[str, np.ndarray]:
+    """Flatten a compacted index state into named arrays (for np.savez)"""
+    embedding_rows, embedding_arrays = state["embeddings"]
+    image_rows, hash_arrays = state["images"]
+    lexical_rows, lexical_arrays = state["lexical"]
+
+    arrays = {
+        "dimension": np.array(state["dimension"] or 0),
+        "embedding_ids": np.array(embedding_rows.ids, dtype=str),
+        "image_report_ids": np.array([key[0] for key in image_rows.ids], dtype=str),
+        "image_ids": np.array([key[1] for key in image_rows.ids], dtype=str),
+        "lexical_ids": np.array(lexical_rows.ids, dtype=str),
+    }
+    if "keys" in lexical_arrays:
+        arrays["lexical_keys"] = lexical_arrays["keys"]
+    if "vectors" in embedding_arrays:
+        arrays["vectors"] = embedding_arrays["vectors"]
+    for hash_type, array in hash_arrays.items():
+        arrays[f"hash_{hash_type}"] = array
+    return arrays
+
+
+def state_from_arrays(arrays) -> Dict:
+    """Inverse of state_to_arrays (accepts an open np.load() archive)"""
+    names = set(arrays.keys())
+
+    embedding_rows = _Rows.from_ids(arrays["embedding_ids"].tolist())
+    embedding_arrays = {"vectors": arrays["vectors"]} if "vectors" in names else {}
+
+    image_rows = _Rows.from_ids(
+        list(zip(arrays["image_report_ids"].tolist(), arrays["image_ids"].tolist()))
+    )
+    hash_arrays = {t: arrays[f"hash_{t}"] for t in HASH_TYPES if f"hash_{t}" in names}
+
+    # Snapshots written before lexical blocking have no lexical arrays
+    lexical_rows = _Rows.from_ids(
+        arrays["lexical_ids"].tolist() if "lexical_ids" in names else []
+    )
+    lexical_arrays = {"keys": arrays["lexical_keys"]} if "lexical_keys" in names else {}
+
+    return {
+        "embeddings": (embedding_rows, embedding_arrays),
+        "images": (image_rows, hash_arrays),
+        "lexical": (lexical_rows, lexical_arrays),
+        "dimension": int(arrays["dimension"]) or None,
+    }
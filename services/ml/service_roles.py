@@ -0,0 +1,121 @@
+"""
+Service roles and startup accounting
+The same image runs as an embedding worker, an image-hashing worker or both,
+so each workload scales on its own. A role registers only its routes,
+startup work and background job types:
+- embeddings: /embeddings, /index, /identifiers, /shard; reembed, cluster,
+  load_identifiers and migrate_embeddings jobs
+- images: /images; rehash jobs
+- all: both, plus the combined /dedup/check
+
+torch and sentence_transformers are imported on first use (lazy_import), so
+an images worker never loads them. Import and startup durations are kept in
+the startup report (/api/v1/stats).
+
+Configuration (environment):
+- ML_SERVICE_ROLE: embeddings, images or all (default all)
+"""
+
+from contextlib import contextmanager
+from types import ModuleType
+from typing import Dict, Iterator, Optional
+import importlib
+import logging
+import os
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Role -> components it serves
+ROLES = {
+    "embeddings": ("embeddings",),
+    "images": ("images",),
+    "all": ("embeddings", "images"),
+}
+
+
+def service_role() -> str:
+    role = os.environ.get("ML_SERVICE_ROLE", "all").strip().lower() or "all"
+    if role not in ROLES:
+        raise ValueError(f"Unknown ML_SERVICE_ROLE '{role}' (available: {', '.join(ROLES)})")
+    return role
+
+
+def role_includes(component: str) -> bool:
+    """Whether this worker's role serves a component ("embeddings" or "images")"""
+    return component in ROLES[service_role()]
+
+
+class StartupReport:
+    """Wall-clock durations of imports and startup phases"""
+
+    def __init__(self):
+        self.imports: Dict[str, float] = {}
+        self.phases: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def record_import(self, name: str, seconds: float) -> None:
+        with self._lock:
+            self.imports[name] = round(seconds, 3)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.phases[name] = round(time.perf_counter() - start, 3)
+
+    def summary(self) -> str:
+        with self._lock:
+            parts = [f"{name} {seconds:.2f}s" for name, seconds in {**self.imports, **self.phases}.items()]
+        return ", ".join(parts)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "role": service_role(),
+                "imports_seconds": dict(self.imports),
+                "phases_seconds": dict(self.phases),
+            }
+
+
+# Singleton instance
+_startup_report: Optional[StartupReport] = None
+
+
+def get_startup_report() -> StartupReport:
+    """
+    Get or create singleton startup report instance
+
+    Returns:
+        StartupReport instance
+    """
+    global _startup_report
+
+    if _startup_report is None:
+        _startup_report = StartupReport()
+
+    return _startup_report
+
+
+def lazy_import(name: str) -> ModuleType:
+    """
+    Import a heavy module on first use and record how long it took
+
+    Later calls return the already imported module.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    seconds = time.perf_counter() - start
+
+    get_startup_report().record_import(name, seconds)
+    logger.info(f"Imported {name} in {seconds:.2f}s")
+    return module
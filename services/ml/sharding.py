@@ -0,0 +1,766 @@
+"""
+Sharded search over report embeddings and image hashes
+The corpus is partitioned by report ID across shards (rendezvous hashing, so
+a membership change only moves the reports whose owner changed). Queries fan
+out to every shard concurrently and the per-shard top-k/threshold results are
+merged, so query latency stays flat as shards are added with the corpus.
+
+Shards are either local worker processes (each holding one SearchIndex) or
+remote ML service nodes serving their partition via /api/v1/shard/{op}.
+Each shard's index is durable (see durable_index.py) unless ML_INDEX_DIR is
+empty; on startup every shard is rebalanced in case membership changed while
+the service was down.
+
+Configuration (environment):
+- ML_SHARDS: Comma-separated shard specs, "local:N" for N local worker
+  processes and/or node base URLs, e.g. "local:4" or
+  "http://ml-1:8000,http://ml-2:8000" (unset = sharded search disabled)
+- ML_SHARD_TIMEOUT: Seconds to wait for one shard call (default 5)
+- ML_SHARD_COMPACT_TIMEOUT: Seconds to wait for an admin-triggered shard
+  compaction, which rebuilds and snapshots the whole partition (default 600)
+- ML_SHARD_START_TIMEOUT: Seconds a local shard may take to load its
+  snapshot and log (default 300)
+- ML_SHARD_TOKEN: Shared secret between coordinator and remote nodes, sent as
+  X-Shard-Token; a node serves /api/v1/shard/{op} only when it is set
+"""
+
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import asyncio
+import hashlib
+import heapq
+import itertools
+import logging
+import multiprocessing
+import os
+import threading
+
+import numpy as np
+from fastapi.concurrency import run_in_threadpool
+
+from durable_index import close_search_index, index_directory, open_search_index
+from search_index import SearchIndex
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+LOCAL_PREFIX = "local"
+
+# Index name of this node's own partition (served to remote coordinators)
+NODE_INDEX_NAME = "node"
+
+MUTATING_OPS = {"upsert_embeddings", "upsert_images", "upsert_lexical", "delete", "import"}
+
+SHARD_TOKEN_HEADER = "X-Shard-Token"
+
+
+def shard_token() -> Optional[str]:
+    return os.environ.get("ML_SHARD_TOKEN") or None
+
+
+class ShardError(Exception):
+    """Raised when a shard call fails or times out"""
+
+    def __init__(self, shard: str, message: str):
+        super().__init__(f"Shard {shard}: {message}")
+        self.shard = shard
+
+
+# ============================================================================
+# SHARD OPERATIONS (run inside the process that owns the index)
+# ============================================================================
+
+def execute(index: SearchIndex, op: str, args: Dict):
+    """Apply one shard operation to a local index"""
+    try:
+        return _execute(index, op, args)
+    finally:
+        if op in MUTATING_OPS:
+            # One log flush (fsync) per batch
+            index.commit()
+
+
+def _execute(index: SearchIndex, op: str, args: Dict):
+    if op == "upsert_embeddings":
+        for report_id, embedding in args["items"]:
+            index.upsert_embedding(report_id, embedding)
+        return len(args["items"])
+
+    if op == "upsert_images":
+        for image in args["items"]:
+            index.upsert_image(image["report_id"], image["image_id"], image["hashes"])
+        return len(args["items"])
+
+    if op == "upsert_lexical":
+        for report_id, keys in args["items"]:
+            index.upsert_lexical(report_id, keys)
+        return len(args["items"])
+
+    if op == "delete":
+        return sum(index.delete_report(report_id) for report_id in args["report_ids"])
+
+    if op == "search_embeddings":
+        return index.search_embeddings(args["query"], args["threshold"], args["top_k"])
+
+    if op == "search_blocked":
+        return index.search_blocked(
+            args["query"], args["keys"], args["threshold"], args["top_k"], args["max_candidates"]
+        )
+
+    if op == "search_images":
+        return index.search_images(args["hashes"], args["threshold"], args["top_k"])
+
+    if op == "report_ids":
+        return index.report_ids()
+
+    if op == "export":
+        return index.export_reports(args["report_ids"])
+
+    if op == "import":
+        index.import_reports(args["data"])
+        return len(args["data"]["embeddings"]) + len(args["data"]["images"])
+
+    if op == "compact":
+        return index.compact()
+
+    if op == "stats":
+        return index.stats()
+
+    raise ValueError(f"Unknown shard operation: {op}")
+
+
+def to_jsonable(value):
+    """Convert numpy values in a shard result/argument for HTTP transport"""
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, dict):
+        return {k: to_jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_jsonable(v) for v in value]
+    return value
+
+
+# Sent by a worker once its index is loaded
+READY = (-1, True, "ready")
+
+
+def _shard_worker(conn, directory: Optional[str]) -> None:
+    """Worker process main loop: (seq, op, args) in, (seq, ok, result) out"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+    index, maintainer = open_search_index(directory)
+    conn.send(READY)
+
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+        if message is None:
+            break
+
+        seq, op, args = message
+        try:
+            conn.send((seq, True, execute(index, op, args)))
+        except Exception as e:
+            conn.send((seq, False, f"{type(e).__name__}: {e}"))
+
+    close_search_index(index, maintainer)
+    conn.close()
+
+
+# ============================================================================
+# SHARDS
+# ============================================================================
+
+class LocalProcessShard:
+    """Shard held by a local worker process, addressed over a pipe"""
+
+    def __init__(self, name: str, timeout: float, start_timeout: float = 300.0):
+        self.name = name
+        self.timeout = timeout
+        self.start_timeout = start_timeout
+
+        # spawn: never fork a parent holding model weights and threads
+        context = multiprocessing.get_context("spawn")
+        self._conn, child_conn = context.Pipe()
+        self._process = context.Process(
+            target=_shard_worker,
+            args=(child_conn, index_directory(name)),
+            name=f"shard-{name}",
+            daemon=True,
+        )
+        self._process.start()
+        child_conn.close()
+
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+
+    def _wait_ready(self) -> None:
+        if not self._conn.poll(self.start_timeout) or self._conn.recv() != READY:
+            raise ShardError(self.name, f"did not start within {self.start_timeout}s")
+
+    async def start(self) -> None:
+        """Wait until the worker has loaded its index"""
+        await run_in_threadpool(self._wait_ready)
+
+    def _request(self, op: str, args: Dict, timeout: float):
+        with self._lock:
+            seq = next(self._seq)
+            self._conn.send((seq, op, args))
+
+            while True:
+                if not self._conn.poll(timeout):
+                    raise ShardError(self.name, f"{op} timed out after {timeout}s")
+                reply_seq, ok, result = self._conn.recv()
+                # Late replies to earlier timed-out calls are dropped
+                if reply_seq == seq:
+                    break
+
+        if not ok:
+            raise ShardError(self.name, result)
+        return result
+
+    async def call(self, op: str, *, timeout: Optional[float] = None, **args):
+        """Run op on the shard (timeout overrides the shard's default)"""
+        if not self._process.is_alive():
+            raise ShardError(self.name, "worker process is not running")
+        return await run_in_threadpool(self._request, op, args, timeout or self.timeout)
+
+    async def close(self) -> None:
+        def stop():
+            try:
+                with self._lock:
+                    self._conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+            # Allow a running compaction to finish and the log to be flushed
+            self._process.join(timeout=30)
+            if self._process.is_alive():
+                self._process.terminate()
+            self._conn.close()
+
+        await run_in_threadpool(stop)
+
+
+class HttpShard:
+    """Shard served by another ML service node"""
+
+    def __init__(self, base_url: str, timeout: float):
+        self.name = base_url.rstrip("/")
+        self.timeout = timeout
+        self._session = None
+
+    async def start(self) -> None:
+        """Nodes load their partition at their own startup"""
+
+    async def call(self, op: str, *, timeout: Optional[float] = None, **args):
+        """Run op on the node (timeout overrides the shard's default)"""
+        import aiohttp
+
+        if self._session is None:
+            token = shard_token()
+            self._session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+                headers={SHARD_TOKEN_HEADER: token} if token else None,
+            )
+
+        try:
+            async with self._session.post(
+                f"{self.name}/api/v1/shard/{op}",
+                json=to_jsonable(args),
+                timeout=aiohttp.ClientTimeout(total=timeout) if timeout else None,
+            ) as response:
+                body = await response.json()
+                if response.status != 200:
+                    raise ShardError(self.name, body.get("detail", f"HTTP {response.status}"))
+                return body["result"]
+        except ShardError:
+            raise
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise ShardError(self.name, f"{op} failed: {type(e).__name__}: {e}")
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+def parse_shard_specs(specs: Iterable[str]) -> List[str]:
+    """Expand shard specs ("local:N", "local", URLs) into shard names"""
+    names: List[str] = []
+    local_count = 0
+
+    for spec in specs:
+        spec = spec.strip()
+        if not spec:
+            continue
+        if spec == LOCAL_PREFIX or spec.startswith(LOCAL_PREFIX + ":"):
+            count = int(spec.partition(":")[2] or 1)
+            names += [f"{LOCAL_PREFIX}-{local_count + i}" for i in range(count)]
+            local_count += count
+        elif spec.startswith(("http://", "https://")):
+            names.append(spec.rstrip("/"))
+        else:
+            raise ValueError(f"Invalid shard spec: {spec}")
+
+    if not names:
+        raise ValueError("At least one shard is required")
+    if len(set(names)) != len(names):
+        raise ValueError("Duplicate shard in membership")
+    return names
+
+
+def owner_of(report_id: str, shard_names: Sequence[str]) -> str:
+    """Rendezvous (highest random weight) hashing of a report onto a shard"""
+    return max(
+        shard_names,
+        key=lambda name: hashlib.blake2b(
+            f"{name}\0{report_id}".encode(), digest_size=8
+        ).digest(),
+    )
+
+
+# ============================================================================
+# COORDINATOR
+# ============================================================================
+
+def _merge_similarities(
+    per_shard: List[List[Tuple[str, float]]], exclude: set, top_k: int
+) -> List[Tuple[str, float]]:
+    """Top-k (report_id, similarity) over all shards"""
+    # A report can briefly sit on two shards while being moved
+    best: Dict[str, float] = {}
+    for matches in per_shard:
+        for report_id, score in matches:
+            if report_id not in exclude and score > best.get(report_id, -1.0):
+                best[report_id] = score
+
+    return heapq.nlargest(top_k, best.items(), key=lambda x: x[1])
+
+
+class ShardedIndex:
+    """Routes writes to the owning shard and scatter-gathers queries"""
+
+    def __init__(
+        self, timeout: float = 5.0, start_timeout: float = 300.0, compact_timeout: float = 600.0
+    ):
+        self.timeout = timeout
+        self.start_timeout = start_timeout
+        self.compact_timeout = compact_timeout
+        self._shards: Dict[str, object] = {}
+        # Owners for writes; queries go to every shard in _shards, which
+        # during a rebalance also holds shards that are being drained
+        self._members: List[str] = []
+        # Writes and rebalancing are serialized; queries are not
+        self._write_lock = asyncio.Lock()
+
+        # Statistics
+        self.queries = 0
+        self.partial_queries = 0
+        self.shard_failures = 0
+        self.rebalances = 0
+        self.moved_reports = 0
+
+    def _create_shard(self, name: str):
+        if name.startswith(LOCAL_PREFIX + "-"):
+            return LocalProcessShard(name, self.timeout, self.start_timeout)
+        return HttpShard(name, self.timeout)
+
+    @property
+    def members(self) -> List[str]:
+        return list(self._members)
+
+    # ------------------------------------------------------------------------
+    # Membership
+    # ------------------------------------------------------------------------
+
+    async def set_members(self, names: List[str]) -> Dict:
+        """
+        Change shard membership and move reports to their new owners
+
+        Reports are copied to the new owner before being deleted from the old
+        one, so queries issued during the move never miss them. Every shard
+        is checked, including at startup when persisted partitions may have
+        been written under a different membership.
+
+        Returns:
+            Added/removed shards and number of moved reports
+        """
+        async with self._write_lock:
+            added = [n for n in names if n not in self._shards]
+            removed = [n for n in self._shards if n not in names]
+
+            for name in added:
+                self._shards[name] = self._create_shard(name)
+            await asyncio.gather(*(self._shards[name].start() for name in added))
+
+            self._members = list(names)
+
+            moved = 0
+            with span("index.rebalance", added=len(added), removed=len(removed)):
+                for name in list(self._shards):
+                    moved += await self._drain(name)
+
+            for name in removed:
+                shard = self._shards.pop(name)
+                await shard.close()
+
+            self.rebalances += 1
+            self.moved_reports += moved
+
+            logger.info(
+                f"Shard membership: {len(names)} shards "
+                f"(+{len(added)}/-{len(removed)}), moved {moved} reports"
+            )
+            return {"members": self.members, "added": added, "removed": removed, "moved": moved}
+
+    async def _drain(self, name: str) -> int:
+        """Move reports held by one shard that now belong elsewhere"""
+        shard = self._shards[name]
+        report_ids = await shard.call("report_ids")
+
+        moves: Dict[str, List[str]] = {}
+        for report_id in report_ids:
+            owner = owner_of(report_id, self._members)
+            if owner != name:
+                moves.setdefault(owner, []).append(report_id)
+
+        for owner, ids in moves.items():
+            data = await shard.call("export", report_ids=ids)
+            await self._shards[owner].call("import", data=data)
+            await shard.call("delete", report_ids=ids)
+
+        return sum(len(ids) for ids in moves.values())
+
+    # ------------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------------
+
+    def _partition(self, report_ids: Iterable[str]) -> Dict[str, List[int]]:
+        """Item positions grouped by owning shard"""
+        groups: Dict[str, List[int]] = {}
+        for i, report_id in enumerate(report_ids):
+            groups.setdefault(owner_of(report_id, self._members), []).append(i)
+        return groups
+
+    async def upsert(
+        self,
+        embeddings: Sequence[Tuple[str, np.ndarray]] = (),
+        images: Sequence[Dict] = (),
+        lexical: Sequence[Tuple[str, np.ndarray]] = (),
+    ) -> Dict[str, int]:
+        """
+        Add or replace report embeddings, image hashes and LSH keys
+
+        Shards are written concurrently and independently: when one fails,
+        the others keep what they wrote. The ShardError names the failed
+        shards; upserts are idempotent, so the whole call can be retried.
+
+        Args:
+            embeddings: (report_id, embedding) pairs
+            images: Dicts with report_id, image_id and hashes
+            lexical: (report_id, LSH band keys) pairs
+        """
+        async with self._write_lock:
+            calls = []
+            for owner, positions in self._partition(r for r, _ in embeddings).items():
+                items = [embeddings[i] for i in positions]
+                calls.append((owner, "upsert_embeddings", {"items": items}))
+            for owner, positions in self._partition(i["report_id"] for i in images).items():
+                items = [images[i] for i in positions]
+                calls.append((owner, "upsert_images", {"items": items}))
+            for owner, positions in self._partition(r for r, _ in lexical).items():
+                items = [lexical[i] for i in positions]
+                calls.append((owner, "upsert_lexical", {"items": items}))
+
+            with span("index.upsert", embeddings=len(embeddings), images=len(images)):
+                await self._write(calls)
+
+        return {"embeddings": len(embeddings), "images": len(images), "lexical": len(lexical)}
+
+    async def delete(self, report_ids: List[str]) -> int:
+        """Remove reports from their owners (partial on failure, like upsert)"""
+        async with self._write_lock:
+            calls = [
+                (owner, "delete", {"report_ids": [report_ids[i] for i in positions]})
+                for owner, positions in self._partition(report_ids).items()
+            ]
+            return sum(await self._write(calls))
+
+    async def _write(self, calls: List[Tuple[str, str, Dict]]) -> List:
+        """Run (shard, op, args) calls concurrently; raise if any failed"""
+        results = await asyncio.gather(
+            *(self._shards[name].call(op, **args) for name, op, args in calls),
+            return_exceptions=True,
+        )
+
+        failed = sorted({name for (name, _, _), r in zip(calls, results) if isinstance(r, Exception)})
+        if failed:
+            for result in results:
+                if isinstance(result, Exception):
+                    logger.warning(f"Shard write failed: {result}")
+            written = len({name for name, _, _ in calls}) - len(failed)
+            raise ShardError(
+                ",".join(failed),
+                f"write failed ({written} other shards were written; retry the request)",
+            )
+        return results
+
+    # ------------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------------
+
+    async def _scatter(self, op: str, **args) -> Tuple[List, List[str]]:
+        """Run a query on every shard; failed shards are reported, not raised"""
+        shards = list(self._shards.values())
+        self.queries += 1
+
+        with span(f"index.{op}", shards=len(shards)):
+            results = await asyncio.gather(
+                *(shard.call(op, **args) for shard in shards), return_exceptions=True
+            )
+
+        gathered, failed = [], []
+        for shard, result in zip(shards, results):
+            if isinstance(result, Exception):
+                logger.warning(f"Shard query failed: {result}")
+                failed.append(shard.name)
+            else:
+                gathered.append(result)
+
+        if failed:
+            self.partial_queries += 1
+            self.shard_failures += len(failed)
+            if not gathered:
+                raise ShardError(",".join(failed), f"{op} failed on every shard")
+
+        return gathered, failed
+
+    async def search_embeddings(
+        self,
+        query: np.ndarray,
+        threshold: float = 0.85,
+        top_k: int = 10,
+        exclude_ids: Sequence[str] = (),
+    ) -> Tuple[List[Tuple[str, float]], List[str]]:
+        """
+        Reports with cosine similarity >= threshold across all shards
+
+        Returns:
+            (top_k (report_id, similarity) tuples sorted by similarity,
+             names of shards that failed to answer)
+        """
+        exclude = set(exclude_ids)
+        per_shard, failed = await self._scatter(
+            "search_embeddings", query=query, threshold=threshold, top_k=top_k + len(exclude)
+        )
+
+        return _merge_similarities(per_shard, exclude, top_k), failed
+
+    async def search_blocked(
+        self,
+        query: np.ndarray,
+        keys: np.ndarray,
+        threshold: float = 0.85,
+        top_k: int = 10,
+        max_candidates: int = 200,
+        exclude_ids: Sequence[str] = (),
+    ) -> Tuple[List[Tuple[str, float]], List[str], int]:
+        """
+        Embedding search restricted to reports sharing an LSH band with the query
+
+        Args:
+            max_candidates: Vectors scored per shard at most
+
+        Returns:
+            (top_k (report_id, similarity) tuples, names of failed shards,
+             total candidates scored)
+        """
+        exclude = set(exclude_ids)
+        per_shard, failed = await self._scatter(
+            "search_blocked",
+            query=query,
+            keys=keys,
+            threshold=threshold,
+            top_k=top_k + len(exclude),
+            max_candidates=max_candidates,
+        )
+
+        merged = _merge_similarities([matches for matches, _ in per_shard], exclude, top_k)
+        return merged, failed, sum(scored for _, scored in per_shard)
+
+    async def search_images(
+        self, hashes: Dict[str, str], threshold: float = 10, top_k: int = 10
+    ) -> Tuple[List[Dict], List[str]]:
+        """
+        Images with weighted Hamming score <= threshold across all shards
+
+        Returns:
+            (top_k matches sorted by weighted_score, names of failed shards)
+        """
+        per_shard, failed = await self._scatter(
+            "search_images", hashes=hashes, threshold=threshold, top_k=top_k
+        )
+
+        best: Dict[Tuple[str, str], Dict] = {}
+        for matches in per_shard:
+            for match in matches:
+                key = (match["id"], match["image_id"])
+                if key not in best or match["weighted_score"] < best[key]["weighted_score"]:
+                    best[key] = match
+
+        merged = heapq.nsmallest(top_k, best.values(), key=lambda m: m["weighted_score"])
+        return merged, failed
+
+    # ------------------------------------------------------------------------
+    # Lifecycle and stats
+    # ------------------------------------------------------------------------
+
+    async def compact(self) -> Dict[str, Dict]:
+        """Compact (and snapshot) every shard now instead of waiting for the maintainer"""
+        async with self._write_lock:
+            names = list(self._shards)
+            results = await asyncio.gather(
+                *(self._shards[n].call("compact", timeout=self.compact_timeout) for n in names),
+                return_exceptions=True,
+            )
+        return {
+            name: (
+                {"error": str(result)} if isinstance(result, Exception) else result
+            )
+            for name, result in zip(names, results)
+        }
+
+    async def shard_stats(self) -> Dict[str, Dict]:
+        """Per-shard index sizes (queries each shard)"""
+        names = list(self._shards)
+        results = await asyncio.gather(
+            *(self._shards[n].call("stats") for n in names), return_exceptions=True
+        )
+        return {
+            name: (
+                {"error": str(result)} if isinstance(result, Exception) else result
+            )
+            for name, result in zip(names, results)
+        }
+
+    def stats(self) -> Dict:
+        return {
+            "members": self.members,
+            "queries": self.queries,
+            "partial_queries": self.partial_queries,
+            "shard_failures": self.shard_failures,
+            "rebalances": self.rebalances,
+            "moved_reports": self.moved_reports,
+        }
+
+    async def close(self) -> None:
+        await asyncio.gather(*(shard.close() for shard in self._shards.values()))
+        self._shards.clear()
+        self._members = []
+
+
+# ============================================================================
+# SINGLETONS
+# ============================================================================
+
+_sharded_index: Optional[ShardedIndex] = None
+_local_index: Optional[Tuple[SearchIndex, object]] = None
+
+
+async def init_sharded_index() -> Optional[ShardedIndex]:
+    """
+    Start the configured shards (call once at startup)
+
+    Returns:
+        ShardedIndex instance, or None when ML_SHARDS is not set
+    """
+    global _sharded_index
+
+    # A node that already holds a partition loads it before serving shard calls
+    node_directory = index_directory(NODE_INDEX_NAME)
+    if node_directory and os.path.isdir(node_directory):
+        await run_in_threadpool(get_local_index)
+
+    specs = os.environ.get("ML_SHARDS", "").strip()
+    if not specs or _sharded_index is not None:
+        return _sharded_index
+
+    index = ShardedIndex(
+        timeout=float(os.environ.get("ML_SHARD_TIMEOUT", "5")),
+        start_timeout=float(os.environ.get("ML_SHARD_START_TIMEOUT", "300")),
+        compact_timeout=float(os.environ.get("ML_SHARD_COMPACT_TIMEOUT", "600")),
+    )
+    await index.set_members(parse_shard_specs(specs.split(",")))
+    _sharded_index = index
+    return _sharded_index
+
+
+def get_sharded_index() -> Optional[ShardedIndex]:
+    """Get the sharded index (None when sharded search is disabled)"""
+    return _sharded_index
+
+
+async def close_sharded_index() -> None:
+    """Stop local shards and flush this node's own partition"""
+    global _sharded_index, _local_index
+
+    if _sharded_index is not None:
+        await _sharded_index.close()
+        _sharded_index = None
+
+    if _local_index is not None:
+        await run_in_threadpool(close_search_index, *_local_index)
+        _local_index = None
+
+
+def get_local_index() -> SearchIndex:
+    """
+    Get or create the partition this node serves as a remote shard
+
+    Returns:
+        SearchIndex instance
+    """
+    global _local_index
+
+    if _local_index is None:
+        _local_index = open_search_index(index_directory(NODE_INDEX_NAME))
+
+    return _local_index[0]
+
+
+# Example usage
+if __name__ == "__main__":
+    import time
+
+    logging.basicConfig(level=logging.INFO)
+
+    async def main():
+        rng = np.random.default_rng(0)
+        corpus = rng.standard_normal((20000, 384)).astype(np.float32)
+        corpus /= np.linalg.norm(corpus, axis=1, keepdims=True)
+        ids = [f"report-{i}" for i in range(len(corpus))]
+
+        index = ShardedIndex()
+        await index.set_members(parse_shard_specs(["local:2"]))
+        await index.upsert(embeddings=list(zip(ids, corpus)))
+
+        query = corpus[123]
+        start = time.perf_counter()
+        matches, _ = await index.search_embeddings(query, threshold=0.5, top_k=5)
+        print(f"2 shards: {matches[:1]} in {(time.perf_counter() - start) * 1000:.1f}ms")
+
+        result = await index.set_members(parse_shard_specs(["local:4"]))
+        print(f"Rebalanced to 4 shards, moved {result['moved']} reports")
+        print(await index.shard_stats())
+
+        matches, _ = await index.search_embeddings(query, threshold=0.5, top_k=5)
+        print(f"4 shards: {matches[:1]}")
+
+        await index.close()
+
+    asyncio.run(main())
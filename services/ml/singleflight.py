@@ -0,0 +1,91 @@
+"""
+Single-flight execution of identical concurrent calls
+While a computation for a key is in progress, other callers asking for the
+same key wait for it and share its result instead of repeating the work.
+Nothing is cached - the entry is dropped as soon as the leader finishes.
+"""
+
+from typing import Any, Callable, Dict, Optional, Tuple
+import threading
+
+from tracing import span
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Thread-safe duplicate call suppression keyed by a hashable value
+
+    Usage:
+        flight = SingleFlight("embeddings")
+        result, shared = flight.do(key, lambda: expensive(key))
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Any, _Call] = {}
+        self._lock = threading.Lock()
+
+        # Statistics
+        self.executions = 0  # Calls that ran the computation
+        self.coalesced = 0  # Calls that waited on another caller's computation
+
+    def do(self, key: Any, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        Run fn for key unless an identical call is already in flight
+
+        Args:
+            key: Normalized identity of the computation
+            fn: Zero-argument callable producing the result
+
+        Returns:
+            Tuple of (result, shared) - shared is True if the result came from
+            another caller's computation (callers must not mutate it in place)
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.coalesced += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.executions += 1
+                leader = True
+
+        if not leader:
+            with span("singleflight.wait", flight=self.name):
+                call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+        return call.result, False
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            in_flight = len(self._calls)
+
+        return {
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "in_flight": in_flight,
+        }
@@ -0,0 +1,89 @@
+"""
+Shared fixtures for the ML service tests
+
+Run from services/ml:
+    python -m pytest tests
+"""
+
+from typing import Dict, List, Tuple
+import os
+import sys
+import time
+
+import numpy as np
+import pytest
+
+# Service modules are flat (imported by name, as in the Docker image)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DIMENSION = 16
+LSH_WIDTH = 8
+
+
+def wait_for(predicate, timeout: float = 10.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def unit_vectors(count: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((count, DIMENSION)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def random_hashes(rng: np.random.Generator) -> Dict[str, str]:
+    return {t: rng.bytes(8).hex() for t in ("phash", "ahash", "dhash", "whash")}
+
+
+def index_contents(index) -> Tuple[Dict, Dict, Dict]:
+    """(embeddings, image hashes, LSH keys) of every live report in an index"""
+    data = index.export_reports(index.report_ids())
+    embeddings = {k: v.tolist() for k, v in data["embeddings"].items()}
+    images = {(i["report_id"], i["image_id"]): i["hashes"] for i in data["images"]}
+    lexical = {k: v.tolist() for k, v in data["lexical"].items()}
+    return embeddings, images, lexical
+
+
+def random_mutations(count: int, seed: int = 0) -> List[Tuple[str, Tuple]]:
+    """
+    Mixed upserts, re-upserts and deletes over a small ID space, so replayed
+    or reordered operations change the outcome
+    """
+    rng = np.random.default_rng(seed)
+    vectors = unit_vectors(count, seed)
+    mutations = []
+    for i in range(count):
+        report_id = f"report-{rng.integers(0, count // 4)}"
+        kind = rng.integers(0, 10)
+        if kind < 4:
+            mutations.append(("upsert_embedding", (report_id, vectors[i])))
+        elif kind < 6:
+            image_id = f"image-{rng.integers(0, 3)}"
+            mutations.append(("upsert_image", (report_id, image_id, random_hashes(rng))))
+        elif kind < 9:
+            keys = rng.integers(1, 50, size=LSH_WIDTH).astype(np.uint64)
+            mutations.append(("upsert_lexical", (report_id, keys)))
+        else:
+            mutations.append(("delete", (report_id,)))
+    return mutations
+
+
+def apply_mutation(index, op: str, args: Tuple) -> None:
+    if op == "upsert_embedding":
+        index.upsert_embedding(*args)
+    elif op == "upsert_image":
+        index.upsert_image(*args)
+    elif op == "upsert_lexical":
+        index.upsert_lexical(*args)
+    else:
+        index.delete_report(*args)
+
+
+@pytest.fixture
+def index_dir(tmp_path, monkeypatch):
+    """ML_INDEX_DIR pointing at a fresh temporary directory"""
+    directory = tmp_path / "index"
+    monkeypatch.setenv("ML_INDEX_DIR", str(directory))
+    return directory
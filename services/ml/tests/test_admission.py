@@ -0,0 +1,144 @@
+"""
+Admission control lanes (429 + Retry-After) and PriorityLock ordering
+"""
+
+import asyncio
+import threading
+
+import httpx
+from fastapi import FastAPI
+
+import api
+from admission import (
+    BULK,
+    INTERACTIVE,
+    AdmissionController,
+    Lane,
+    PriorityLock,
+    current_lane,
+    is_admission_controlled,
+)
+from conftest import wait_for
+
+
+def lanes_app(monkeypatch, interactive: Lane, bulk: Lane):
+    """Minimal app behind the service's admission middleware"""
+    controller = AdmissionController({INTERACTIVE: interactive, BULK: bulk})
+    monkeypatch.setattr(api, "get_admission_controller", lambda: controller)
+
+    app = FastAPI()
+    app.middleware("http")(api.admission_middleware)
+    release = asyncio.Event()
+
+    @app.post("/api/v1/work")
+    async def work():
+        lane = current_lane.get()
+        await release.wait()
+        return {"lane": lane}
+
+    return app, release
+
+
+async def saturate(app, release, requests):
+    """Hold one interactive request in flight while issuing requests"""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        holder = asyncio.create_task(client.post("/api/v1/work"))
+        await asyncio.sleep(0.05)
+
+        tasks = [asyncio.create_task(client.post("/api/v1/work", headers=h)) for h in requests]
+        await asyncio.sleep(0.2)
+        release.set()
+        return await holder, await asyncio.gather(*tasks)
+
+
+def test_saturated_lane_sheds_with_retry_after(monkeypatch):
+    app, release = lanes_app(
+        monkeypatch,
+        Lane(INTERACTIVE, max_concurrency=1, max_queue=0, queue_timeout=5, retry_after=7),
+        Lane(BULK, max_concurrency=1, max_queue=0, queue_timeout=5, retry_after=30),
+    )
+
+    holder, (shed, bulk) = asyncio.run(
+        saturate(app, release, [{}, {"X-Priority": "bulk"}])
+    )
+
+    assert holder.status_code == 200
+    assert shed.status_code == 429
+    assert shed.headers["Retry-After"] == "7"
+    # The bulk lane has its own slots
+    assert bulk.status_code == 200 and bulk.json() == {"lane": BULK}
+
+
+def test_queued_request_times_out_with_429(monkeypatch):
+    app, release = lanes_app(
+        monkeypatch,
+        Lane(INTERACTIVE, max_concurrency=1, max_queue=1, queue_timeout=0.05, retry_after=2),
+        Lane(BULK, max_concurrency=1, max_queue=0, queue_timeout=5, retry_after=30),
+    )
+
+    _, (timed_out,) = asyncio.run(saturate(app, release, [{}]))
+
+    assert timed_out.status_code == 429
+    assert timed_out.headers["Retry-After"] == "2"
+
+
+def test_queued_request_runs_when_a_slot_frees(monkeypatch):
+    interactive = Lane(INTERACTIVE, max_concurrency=1, max_queue=1, queue_timeout=5, retry_after=1)
+    app, release = lanes_app(
+        monkeypatch,
+        interactive,
+        Lane(BULK, max_concurrency=1, max_queue=0, queue_timeout=5, retry_after=30),
+    )
+
+    _, (queued,) = asyncio.run(saturate(app, release, [{}]))
+
+    assert queued.status_code == 200
+    assert interactive.stats()["admitted"] == 2
+    assert interactive.stats()["active"] == 0
+
+
+def test_lane_classification():
+    controller = AdmissionController({INTERACTIVE: None, BULK: None})
+
+    assert controller.classify("/api/v1/embeddings/generate", None) == INTERACTIVE
+    assert controller.classify("/api/v1/embeddings/batch-generate", None) == BULK
+    assert controller.classify("/api/v1/embeddings/generate", "Bulk") == BULK
+    assert controller.classify("/api/v1/embeddings/batch-generate", "urgent") == BULK
+    assert is_admission_controlled("POST", "/api/v1/dedup/check")
+    assert not is_admission_controlled("POST", "/api/v1/admin/profile")
+    assert not is_admission_controlled("GET", "/api/v1/stats")
+
+
+def test_priority_lock_serves_interactive_before_queued_bulk():
+    lock = PriorityLock()
+    order = []
+    holding = threading.Event()
+    release = threading.Event()
+
+    def holder():
+        with lock.hold(INTERACTIVE):
+            holding.set()
+            release.wait(10)
+
+    def waiter(lane):
+        with lock.hold(lane):
+            order.append(lane)
+
+    threads = [threading.Thread(target=holder)]
+    threads[0].start()
+    assert holding.wait(10)
+
+    # Bulk starts waiting first, interactive arrives later
+    threads.append(threading.Thread(target=waiter, args=(BULK,)))
+    threads[-1].start()
+    wait_for(lambda: lock.stats()["waiting_bulk"] == 1)
+    threads.append(threading.Thread(target=waiter, args=(INTERACTIVE,)))
+    threads[-1].start()
+    wait_for(lambda: lock.stats()["waiting_interactive"] == 1)
+
+    release.set()
+    for thread in threads:
+        thread.join(10)
+
+    assert order == [INTERACTIVE, BULK]
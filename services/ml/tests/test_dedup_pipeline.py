@@ -0,0 +1,127 @@
+"""
+One-shot dedup pipeline: concurrent stages, merged matches, image size limit
+"""
+
+import asyncio
+import base64
+import io
+import time
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+from pydantic import ValidationError
+
+import dedup_pipeline
+import image_hashing
+from api import DedupCheckRequest, DedupImage
+from conftest import unit_vectors
+from image_hashing import ImageDuplicateDetector
+
+STAGE_SECONDS = 0.3
+
+
+class SlowEmbeddingService:
+    """Deterministic embeddings that take STAGE_SECONDS to compute"""
+
+    def __init__(self, vector: np.ndarray):
+        self.vector = vector
+
+    def create_report_text(self, report):
+        return " | ".join(str(v) for v in report.values() if v)
+
+    def generate_embedding(self, text):
+        time.sleep(STAGE_SECONDS)
+        return self.vector
+
+    def find_similar_reports(self, query, candidates, ids, threshold, top_k=None):
+        scores = [(i, float(np.dot(query, c))) for i, c in zip(ids, candidates)]
+        return sorted([s for s in scores if s[1] >= threshold], key=lambda s: -s[1])[:top_k]
+
+
+class SlowImageDetector(ImageDuplicateDetector):
+    def compute_image_hashes_from_bytes(self, data):
+        time.sleep(STAGE_SECONDS)
+        return super().compute_image_hashes_from_bytes(data)
+
+
+def png_bytes(seed: int) -> bytes:
+    image = Image.new("RGB", (96, 96), "white")
+    draw = ImageDraw.Draw(image)
+    rng = np.random.default_rng(seed)
+    for _ in range(6):
+        x, y = rng.integers(0, 80, size=2)
+        draw.rectangle([int(x), int(y), int(x) + 16, int(y) + 16], fill="black")
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    vectors = unit_vectors(3, seed=10)
+    detector = SlowImageDetector()
+    service = SlowEmbeddingService(vectors[0])
+    monkeypatch.setattr(dedup_pipeline, "get_embedding_service", lambda: service)
+    monkeypatch.setattr(dedup_pipeline, "get_image_detector", lambda: detector)
+    monkeypatch.setattr(dedup_pipeline, "get_vector_store", lambda: None)
+    monkeypatch.setattr(dedup_pipeline, "get_sharded_index", lambda: None)
+    return vectors, detector
+
+
+def test_stages_run_concurrently_and_results_merge(pipeline):
+    vectors, detector = pipeline
+    image = png_bytes(1)
+    hashes = detector.compute_image_hashes_from_bytes(image)
+    request = DedupCheckRequest(
+        report={"scammer_name": "Jan Novak", "description": "Fake rental"},
+        images=[
+            DedupImage(image_base64=base64.b64encode(image).decode()),
+            DedupImage(image_base64=base64.b64encode(png_bytes(2)).decode()),
+        ],
+        candidate_embeddings=[vectors[0].tolist(), vectors[1].tolist()],
+        candidate_ids=["text-dup", "unrelated"],
+        image_candidates=[
+            {"id": "image-dup", "hashes": {k: v for k, v in hashes.items() if isinstance(v, str)}}
+        ],
+    )
+
+    start = time.perf_counter()
+    result = asyncio.run(dedup_pipeline.run_dedup_check(request))
+    elapsed = time.perf_counter() - start
+
+    # Text and both image stages overlap instead of adding up
+    assert elapsed < 2.5 * STAGE_SECONDS
+    assert [m["id"] for m in result["text"]["matches"]] == ["text-dup"]
+    assert result["text"]["sources"] == ["request"]
+    assert [m["id"] for m in result["images"][0]["matches"]] == ["image-dup"]
+    assert result["duplicate_ids"] == ["image-dup", "text-dup"]
+    assert {"text.embed", "images[0].hash", "images[1].hash", "total"} <= set(result["timings_ms"])
+
+
+def test_merge_keeps_best_score_and_every_source():
+    merged = dedup_pipeline._merge_text_matches(
+        {"database": [("a", 0.9), ("b", 0.86)], "index": [("a", 0.95)]}
+    )
+
+    assert merged == [
+        {"id": "a", "similarity": 0.95, "sources": ["database", "index"]},
+        {"id": "b", "similarity": 0.86, "sources": ["database"]},
+    ]
+
+
+def test_oversized_images_are_refused(pipeline, monkeypatch):
+    monkeypatch.setattr(image_hashing, "MAX_IMAGE_BYTES", 1000)
+    request = DedupCheckRequest(
+        report={"description": "x"},
+        images=[DedupImage(image_base64=base64.b64encode(png_bytes(3) + b"\0" * 1000).decode())],
+    )
+
+    result = asyncio.run(dedup_pipeline.run_dedup_check(request))
+
+    assert result["images"][0]["error"] == "Failed to compute hashes for image"
+
+
+def test_base64_longer_than_the_limit_fails_validation():
+    with pytest.raises(ValidationError):
+        DedupImage(image_base64="A" * (image_hashing.MAX_IMAGE_BASE64_LENGTH + 4))
@@ -0,0 +1,115 @@
+"""
+Write-ahead log replay and snapshot recovery of DurableSearchIndex
+"""
+
+import os
+import tempfile
+
+import numpy as np
+import pytest
+
+from conftest import apply_mutation, index_contents, random_mutations, unit_vectors
+from durable_index import SNAPSHOT_FILE, DurableSearchIndex, index_directory
+from search_index import SearchIndex
+
+
+class SimulatedCrash(Exception):
+    pass
+
+
+def crash(index: DurableSearchIndex) -> None:
+    """Drop the index without close() (committed records are on disk)"""
+    index.wal._file.close()
+    index.wal._file = None
+
+
+def test_replay_restores_committed_mutations(tmp_path):
+    mutations = random_mutations(400, seed=1)
+    reference = SearchIndex()
+    index = DurableSearchIndex(str(tmp_path), fsync=False)
+    for op, args in mutations:
+        apply_mutation(reference, op, args)
+        apply_mutation(index, op, args)
+    index.commit()
+    crash(index)
+
+    reopened = DurableSearchIndex(str(tmp_path), fsync=False)
+    assert reopened.replayed == len(mutations)
+    assert index_contents(reopened) == index_contents(reference)
+    reopened.close()
+
+
+def test_crash_between_snapshot_and_log_truncation(tmp_path, monkeypatch):
+    mutations = random_mutations(600, seed=2)
+    before, after = mutations[:400], mutations[400:]
+
+    reference = SearchIndex()
+    index = DurableSearchIndex(str(tmp_path), fsync=False)
+    for op, args in before:
+        apply_mutation(reference, op, args)
+        apply_mutation(index, op, args)
+    index.commit()
+
+    # The snapshot is written, then the process dies before deleting the
+    # log segments it covers
+    def die(lsn):
+        raise SimulatedCrash()
+
+    monkeypatch.setattr(index.wal, "drop_through", die)
+    with pytest.raises(SimulatedCrash):
+        index.compact()
+
+    assert os.path.exists(os.path.join(tmp_path, SNAPSHOT_FILE))
+    assert len(index.wal.segments()) == 2
+
+    # Writes after the snapshot go to the new segment
+    for op, args in after:
+        apply_mutation(reference, op, args)
+        apply_mutation(index, op, args)
+    index.commit()
+    crash(index)
+
+    reopened = DurableSearchIndex(str(tmp_path), fsync=False)
+    # Records of the old segment are covered by the snapshot and skipped
+    assert reopened.snapshot_lsn == len(before)
+    assert reopened.replayed == len(after)
+    assert index_contents(reopened) == index_contents(reference)
+
+    # The next snapshot drops the stale segment
+    reopened.compact()
+    assert len(reopened.wal.segments()) == 1
+    reopened.close()
+
+    again = DurableSearchIndex(str(tmp_path), fsync=False)
+    assert again.replayed == 0
+    assert index_contents(again) == index_contents(reference)
+    again.close()
+
+
+def test_torn_final_record_is_truncated(tmp_path):
+    index = DurableSearchIndex(str(tmp_path), fsync=False)
+    vectors = unit_vectors(3)
+    for i, vector in enumerate(vectors):
+        index.upsert_embedding(f"report-{i}", vector)
+    index.commit()
+    crash(index)
+
+    _, path = index.wal.segments()[-1]
+    with open(path, "ab") as f:
+        f.write(b'{"op": "delete", "id": "report-0"')
+
+    reopened = DurableSearchIndex(str(tmp_path), fsync=False)
+    assert reopened.replayed == 3
+    assert sorted(reopened.report_ids()) == ["report-0", "report-1", "report-2"]
+    assert np.allclose(reopened.export_reports(["report-0"])["embeddings"]["report-0"], vectors[0])
+    reopened.close()
+
+
+def test_index_data_defaults_outside_the_app_directory(monkeypatch):
+    monkeypatch.delenv("ML_INDEX_DIR", raising=False)
+
+    directory = index_directory("http://shard-1:8000")
+
+    assert directory == os.path.join(
+        tempfile.gettempdir(), "ml-service", "index", "http___shard-1_8000"
+    )
@@ -0,0 +1,198 @@
+"""
+Embedding migrations: validation, throttling, version names and who may
+start or cancel them
+"""
+
+import asyncio
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+from conftest import DIMENSION, unit_vectors
+from embedding_migration import Throttle, validate_version
+from jobs import Job
+from vector_store import check_version
+
+REPORTS = [{"id": f"report-{i}", "description": f"report {i}"} for i in range(6)]
+
+
+class FakeService:
+    """Embeds report i as vector i of a fixed set"""
+
+    embedding_dim = DIMENSION
+
+    def __init__(self, seed: int):
+        texts = [r["description"] for r in REPORTS]
+        self.vectors = dict(zip(texts, unit_vectors(len(REPORTS), seed)))
+
+    def create_report_text(self, report):
+        return report["description"]
+
+    def batch_generate_embeddings(self, texts, batch_size=32):
+        return [self.vectors[text] for text in texts]
+
+
+class FakeStore:
+    """Stored vectors per version; find_similar is an exact scan"""
+
+    def __init__(self, versions, missing=0, wrong_dimension=0):
+        self.versions = versions
+        self.missing = missing
+        self.wrong_dimension = wrong_dimension
+
+    async def count_reports(self, active_only, version):
+        return self.missing
+
+    async def count_wrong_dimension(self, version, dimension):
+        return self.wrong_dimension
+
+    async def sample_reports(self, version, size):
+        return REPORTS[:size]
+
+    async def find_similar(self, embedding, threshold, limit, exclude_ids, version):
+        stored = self.versions[version]
+        scores = sorted(((float(np.dot(embedding, v)), i) for i, v in stored.items()), reverse=True)
+        return [(i, score) for score, i in scores[:limit]]
+
+
+def stored_vectors(service, broken=()):
+    """What a store holds for a version embedded with service"""
+    vectors = {r["id"]: service.vectors[r["description"]] for r in REPORTS}
+    for report_id in broken:
+        vectors[report_id] = -vectors[report_id]
+    return vectors
+
+
+def validate(store, shadow, serving, **kwargs):
+    return validate_version(asyncio.run, store, "v2", shadow, None, serving, **kwargs)
+
+
+def test_validation_passes_when_every_report_finds_itself():
+    shadow, serving = FakeService(seed=1), FakeService(seed=2)
+    store = FakeStore({"v2": stored_vectors(shadow), None: stored_vectors(serving)})
+
+    result = validate(store, shadow, serving, recall_k=1)
+
+    assert result["passed"]
+    assert result["recall"] == 1.0
+    assert result["sample"] == len(REPORTS)
+    assert result["neighbour_overlap"] == 1.0
+
+
+def test_validation_fails_below_min_recall():
+    shadow, serving = FakeService(seed=1), FakeService(seed=2)
+    # Two stored shadow vectors do not match what the model produces
+    broken = stored_vectors(shadow, broken=["report-0", "report-1"])
+    store = FakeStore({"v2": broken, None: stored_vectors(serving)})
+
+    result = validate(store, shadow, serving, recall_k=1, min_recall=0.9)
+
+    assert not result["passed"]
+    assert result["recall"] == pytest.approx(4 / 6, abs=1e-4)
+    assert validate(store, shadow, serving, recall_k=1, min_recall=0.5)["passed"]
+
+
+@pytest.mark.parametrize("counts", [{"missing": 3}, {"wrong_dimension": 1}])
+def test_validation_fails_on_incomplete_versions(counts):
+    shadow, serving = FakeService(seed=1), FakeService(seed=2)
+    store = FakeStore({"v2": stored_vectors(shadow), None: stored_vectors(serving)}, **counts)
+
+    result = validate(store, shadow, serving)
+
+    assert not result["passed"]
+    assert result["recall"] == 1.0
+
+
+def test_throttle_keeps_busy_time_at_the_cpu_share():
+    throttle = Throttle(0.25)
+
+    assert throttle.pause_after(1.0) == pytest.approx(3.0)
+    assert throttle.pause_after(0.5) == pytest.approx(1.5)
+    assert throttle.stats()["effective_cpu_share"] == 0.25
+
+    # Resumed from a checkpoint, the counters carry over
+    resumed = Throttle(0.5, busy_seconds=1.5, paused_seconds=4.5)
+    resumed.pause_after(1.0)
+    assert resumed.stats()["busy_seconds"] == 2.5
+    assert resumed.stats()["paused_seconds"] == 5.5
+
+
+@pytest.mark.parametrize("share", [0, -0.1, 1.5])
+def test_throttle_rejects_invalid_shares(share):
+    with pytest.raises(ValueError):
+        Throttle(share)
+
+
+def test_version_names_are_restricted():
+    assert check_version("multilingual-e5.v2_large") == "multilingual-e5.v2_large"
+    for name in ("", "v2; DROP TABLE reports", "a" * 41, "model/v2"):
+        with pytest.raises(ValueError):
+            check_version(name)
+
+
+class FakeJobManager:
+    job_types = ["migrate_embeddings", "reembed"]
+
+    def __init__(self):
+        self.jobs = {}
+
+    def submit(self, job_type, params):
+        job = Job(job_type, params, job_id=f"job-{len(self.jobs)}")
+        self.jobs[job.id] = job
+        return job
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def cancel(self, job_id):
+        job = self.jobs[job_id]
+        job.status = "cancelled"
+        return job
+
+
+@pytest.fixture
+def jobs_client(monkeypatch):
+    manager = FakeJobManager()
+    monkeypatch.setattr(api, "get_job_manager", lambda: manager)
+    monkeypatch.setattr(api, "ADMIN_TOKEN", "secret")
+    return manager, TestClient(api.app)
+
+
+def test_migrations_need_the_admin_token(jobs_client):
+    manager, client = jobs_client
+    migration = {"type": "migrate_embeddings", "params": {"model_id": "v2", "min_recall": 0}}
+
+    assert client.post("/api/v1/jobs", json=migration).status_code == 401
+    assert client.post(
+        "/api/v1/jobs", json=migration, headers={"X-Admin-Token": "wrong"}
+    ).status_code == 401
+    assert manager.jobs == {}
+
+    response = client.post("/api/v1/jobs", json=migration, headers={"X-Admin-Token": "secret"})
+    assert response.status_code == 200
+    job_id = response.json()["job"]["id"]
+
+    assert client.post(f"/api/v1/jobs/{job_id}/cancel").status_code == 401
+    cancelled = client.post(f"/api/v1/jobs/{job_id}/cancel", headers={"X-Admin-Token": "secret"})
+    assert cancelled.json()["job"]["status"] == "cancelled"
+
+
+def test_other_jobs_need_no_token(jobs_client):
+    _, client = jobs_client
+
+    response = client.post("/api/v1/jobs", json={"type": "reembed", "params": {}})
+    job_id = response.json()["job"]["id"]
+
+    assert response.status_code == 200
+    assert client.post(f"/api/v1/jobs/{job_id}/cancel").status_code == 200
+
+
+def test_migrations_are_refused_without_a_configured_token(jobs_client, monkeypatch):
+    _, client = jobs_client
+    monkeypatch.setattr(api, "ADMIN_TOKEN", None)
+
+    response = client.post("/api/v1/jobs", json={"type": "migrate_embeddings", "params": {}})
+
+    assert response.status_code == 403
@@ -0,0 +1,106 @@
+"""
+Identifier normalization (parity with src/lib/duplicate-detection/normalizers.ts)
+and exact-match lookups
+"""
+
+import pytest
+
+from identifier_index import (
+    IdentifierIndex,
+    normalize_company_id,
+    normalize_crypto_wallet,
+    normalize_email,
+    normalize_iban,
+    normalize_identifiers,
+    normalize_license_plate,
+    normalize_phone,
+    normalize_vin,
+)
+
+ETH = "0x52908400098527886E0F7030069857D2E4169EE7"
+BTC = "1BvBMSEYstWetqTFn5Au4m4GFg7xJaNVN2"
+
+# (function, input, expected) as normalizers.ts returns them
+CASES = [
+    # normalizePhone
+    (normalize_phone, "+421 911 123 456", "421911123456"),
+    (normalize_phone, "00421-911-123-456", "421911123456"),
+    (normalize_phone, "0911 123 456", "0911123456"),
+    (normalize_phone, "0000911123456", "00911123456"),  # one "00" stripped
+    (normalize_phone, "12345678", None),
+    (normalize_phone, "\u0669" * 10, None),  # Arabic-Indic digits; \D is ASCII-only in JS
+    (normalize_phone, "", None),
+    (normalize_phone, None, None),
+    # normalizeEmail
+    (normalize_email, "  John.Doe@Example.COM  ", "john.doe@example.com"),
+    (normalize_email, "\ufeffjohn@example.com\n", "john@example.com"),
+    (normalize_email, "john@example", None),
+    (normalize_email, "john doe@example.com", None),
+    (normalize_email, "john\x1c@example.com", "john\x1c@example.com"),
+    # normalizeIBAN
+    (normalize_iban, "SK31 1200 0000 1987 4263 7541", "SK3112000000198742637541"),
+    (normalize_iban, "sk31\t1200 0000", "SK3112000000"),
+    (normalize_iban, "SK31-1200", None),
+    (normalize_iban, "S131 1200", None),
+    # normalizeCryptoWallet
+    (lambda a: normalize_crypto_wallet(a, "ETH"), f" {ETH} ", ETH),
+    (lambda a: normalize_crypto_wallet(a, "ETH"), ETH[:-1], None),
+    (lambda a: normalize_crypto_wallet(a, "BTC"), BTC, BTC.lower()),
+    (lambda a: normalize_crypto_wallet(a, "BTC"), "0" + BTC[1:], None),
+    (normalize_crypto_wallet, "  SomeOtherCoin  ", "someothercoin"),
+    # normalizeLicensePlate
+    (normalize_license_plate, "BA 123 XY", "BA123XY"),
+    (normalize_license_plate, "ba-123-xy", "BA123XY"),
+    (normalize_license_plate, "B-A", None),
+    (normalize_license_plate, "BA_123", None),
+    # normalizeVIN
+    (normalize_vin, "1hgbh41jxmn109186", "1HGBH41JXMN109186"),
+    (normalize_vin, "1HGBH41JXMN10918", None),
+    (normalize_vin, "1HGBH41JXMN10918O", None),
+    # normalizeCompanyID
+    (normalize_company_id, "00 123 456", "123456"),
+    (normalize_company_id, "36 421 928", "36421928"),
+    (normalize_company_id, "0000", None),
+    (normalize_company_id, "12A34", None),
+    (normalize_company_id, "\uff11\uff12\uff13", None),
+]
+
+
+@pytest.mark.parametrize("normalize, value, expected", CASES)
+def test_normalizers_match_the_web_tier(normalize, value, expected):
+    assert normalize(value) == expected
+
+
+def test_normalize_identifiers_keeps_valid_fields_only():
+    raw = {
+        "phone": "+421 911 123 456",
+        "email": "not-an-email",
+        "crypto_wallet": ETH,
+        "crypto_type": "ETH",
+        "vin": "",
+    }
+
+    assert normalize_identifiers(raw) == {"phone": "421911123456", "crypto_wallet": ETH}
+
+
+def test_lookup_ranks_by_matched_fields_and_flags_definitive_hits():
+    index = IdentifierIndex(definitive_fields=["iban"])
+    index.upsert(
+        [
+            ("a", normalize_identifiers({"phone": "0911 123 456"})),
+            ("b", normalize_identifiers({"phone": "0911123456", "iban": "SK31 1200"})),
+            ("self", normalize_identifiers({"phone": "0911-123-456"})),
+        ]
+    )
+
+    query = normalize_identifiers({"phone": "0911 123 456", "iban": "sk31 1200"})
+    matches = index.lookup(query, exclude_ids=["self"])
+
+    assert [m["id"] for m in matches] == ["b", "a"]
+    assert matches[0]["match_type"] == "exact_phone"
+    assert [m["definitive"] for m in matches] == [True, False]
+
+    # Re-upserting without identifiers removes the report
+    index.upsert([("b", {})])
+    assert [m["id"] for m in index.lookup(query)] == ["a", "self"]
+    assert index.stats()["values"]["iban"] == 0
@@ -0,0 +1,135 @@
+"""
+Keyframe selection for animated images and best-frame-pair comparison
+"""
+
+import io
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image, ImageDraw
+
+import api
+from image_hashing import ImageDuplicateDetector
+
+SIZE = 96
+
+
+def scene(seed: int) -> Image.Image:
+    """A frame of random black blocks on white"""
+    image = Image.new("RGB", (SIZE, SIZE), "white")
+    draw = ImageDraw.Draw(image)
+    rng = np.random.default_rng(seed)
+    for _ in range(8):
+        x, y = rng.integers(0, SIZE - 24, size=2)
+        draw.rectangle([int(x), int(y), int(x) + 24, int(y) + 24], fill="black")
+    return image
+
+
+def animation(scenes: int, frames_per_scene: int = 3) -> bytes:
+    """GIF bytes: each scene held for a few frames that differ in one pixel"""
+    frames = []
+    for s in range(scenes):
+        for f in range(frames_per_scene):
+            frame = scene(s).copy()
+            frame.putpixel((f, 0), (0, 0, 0))
+            frames.append(frame)
+    buffer = io.BytesIO()
+    frames[0].save(buffer, format="GIF", save_all=True, append_images=frames[1:], duration=40)
+    return buffer.getvalue()
+
+
+def still(seed: int) -> bytes:
+    buffer = io.BytesIO()
+    scene(seed).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def test_keyframes_are_scene_changes_within_the_budget():
+    detector = ImageDuplicateDetector(frame_budget=8)
+
+    hashes = detector.compute_image_hashes_from_bytes(animation(scenes=4))
+
+    assert hashes["frames_scanned"] == 12
+    assert hashes["frames"] == 4
+    assert len(hashes["phash_frames"]) == 4 * len(hashes["phash"])
+    # The first frame's hashes stay at the top level for still-image matchers
+    assert hashes["phash_frames"].startswith(hashes["phash"])
+
+
+def test_keyframes_are_thinned_to_the_budget():
+    detector = ImageDuplicateDetector(frame_budget=3)
+
+    hashes = detector.compute_image_hashes_from_bytes(animation(scenes=10, frames_per_scene=2))
+
+    assert hashes["frames_scanned"] == 20
+    assert hashes["frames"] == 3
+    assert hashes["phash_frames"].startswith(hashes["phash"])
+
+
+def test_scan_limit_bounds_decoded_frames():
+    detector = ImageDuplicateDetector(frame_budget=8, frame_scan_limit=5)
+
+    hashes = detector.compute_image_hashes_from_bytes(animation(scenes=4))
+
+    assert hashes["frames_scanned"] == 5
+    assert hashes["frames"] == 2
+
+
+def test_best_frame_match_finds_a_still_inside_an_animation():
+    detector = ImageDuplicateDetector(frame_budget=8)
+    animated = detector.compute_image_hashes_from_bytes(animation(scenes=4))
+    third_scene = detector.compute_image_hashes_from_bytes(still(2))
+
+    is_duplicate, distances, score, pair = detector.best_frame_match(animated, third_scene)
+
+    assert is_duplicate
+    assert pair == (2, 0)
+    assert score <= 10 and set(distances) == {"phash", "ahash", "dhash", "whash"}
+
+    other = detector.compute_image_hashes_from_bytes(still(9))
+    assert not detector.best_frame_match(animated, other)[0]
+
+
+def mismatched_frames(hashes):
+    """phash with every frame, dhash with only two, ahash for one frame only"""
+    broken = {k: v for k, v in hashes.items() if isinstance(v, str)}
+    width = len(broken["dhash"])
+    broken["dhash_frames"] = broken["dhash_frames"][: 2 * width]
+    del broken["ahash_frames"]
+    return broken
+
+
+def test_inconsistent_frame_counts_count_as_failed_hash_types():
+    detector = ImageDuplicateDetector(frame_budget=8)
+    animated = detector.compute_image_hashes_from_bytes(animation(scenes=3))
+    broken = mismatched_frames(animated)
+
+    is_duplicate, distances, _, pair = detector.best_frame_match(broken, animated)
+
+    # Scored like hashes of different lengths, not broadcast over frames
+    assert not is_duplicate
+    assert pair == (0, 0)
+    assert distances["phash"] == 0
+    assert distances["dhash"] == distances["ahash"] == 999
+
+
+@pytest.fixture
+def client(monkeypatch):
+    detector = ImageDuplicateDetector(frame_budget=8)
+    monkeypatch.setattr(api, "get_image_detector", lambda: detector)
+    return detector, TestClient(api.app)
+
+
+def test_compare_endpoint_accepts_inconsistent_frame_counts(client):
+    detector, http = client
+    animated = detector.compute_image_hashes_from_bytes(animation(scenes=3))
+    hashes = {k: v for k, v in animated.items() if isinstance(v, str)}
+
+    response = http.post(
+        "/api/v1/images/compare",
+        json={"hashes1": mismatched_frames(animated), "hashes2": hashes},
+    )
+
+    assert response.status_code == 200
+    assert response.json()["frame_pair"] == [0, 0]
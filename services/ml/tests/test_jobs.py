@@ -0,0 +1,124 @@
+"""
+Job checkpointing and resume after a worker restart
+"""
+
+import asyncio
+import json
+import threading
+
+import numpy as np
+
+from conftest import wait_for
+from jobs import JobManager
+
+ITEMS = 10
+STOP_AT = 6
+
+
+def counting_job(stop_at=None, reached=None):
+    """Emits one result per item; optionally blocks at stop_at until shut down"""
+
+    def handler(ctx, params):
+        start = ctx.job.cursor or 0
+        parents = ctx.load_state_array()
+        if parents is None:
+            parents = np.arange(params["items"], dtype=np.int64)
+
+        for i in range(start, params["items"]):
+            if i == stop_at:
+                reached.set()
+                wait_for(lambda: ctx.cancelled)
+            ctx.check_cancelled()
+            parents[i] = -1
+            ctx.checkpoint(
+                i + 1, 1, results=[{"item": i}], state={"last": i}, state_array=parents
+            )
+        return {"items": int((parents == -1).sum())}
+
+    return handler
+
+
+def test_job_resumes_from_checkpoint(tmp_path):
+    loop = asyncio.new_event_loop()
+    reached = threading.Event()
+
+    first = JobManager(str(tmp_path))
+    first.register("count", counting_job(STOP_AT, reached))
+    first.start(loop)
+    job = first.submit("count", {"items": ITEMS})
+    assert reached.wait(10)
+    first.shutdown()
+
+    with open(tmp_path / f"{job.id}.json", encoding="utf-8") as f:
+        checkpoint = json.load(f)
+    assert checkpoint["status"] == "running"
+    assert checkpoint["cursor"] == STOP_AT
+    assert "params" not in checkpoint
+
+    # A crash after appending results but before the checkpoint
+    with open(tmp_path / f"{job.id}.results.jsonl", "ab") as f:
+        f.write(b'{"item": 99}\n')
+
+    second = JobManager(str(tmp_path))
+    second.register("count", counting_job())
+    second.start(loop)
+    resumed = second.get(job.id)
+    wait_for(lambda: resumed.status == "completed")
+    second.shutdown()
+
+    assert resumed.resumed == 1
+    assert resumed.processed == ITEMS
+    assert resumed.params == {"items": ITEMS}
+    assert resumed.result == {"items": ITEMS}
+    assert second.read_results(job.id, limit=100) == [{"item": i} for i in range(ITEMS)]
+    loop.close()
+
+
+def test_other_roles_jobs_are_ignored(tmp_path):
+    loop = asyncio.new_event_loop()
+    first = JobManager(str(tmp_path))
+    first.register("count", counting_job())
+    first.start(loop)
+    job = first.submit("count", {"items": 2})
+    wait_for(lambda: job.status == "completed")
+    first.shutdown()
+
+    other = JobManager(str(tmp_path))
+    other.register("other", counting_job())
+    other.start(loop)
+
+    assert other.list() == []
+    assert other.get(job.id) is None
+    other.shutdown()
+    loop.close()
+
+
+def test_only_one_replica_resumes_a_job(tmp_path):
+    loop = asyncio.new_event_loop()
+    reached = threading.Event()
+
+    first = JobManager(str(tmp_path))
+    first.register("count", counting_job(STOP_AT, reached))
+    first.start(loop)
+    job = first.submit("count", {"items": ITEMS})
+    assert reached.wait(10)
+
+    # A second replica of the same role starts while the job is running
+    replica = JobManager(str(tmp_path))
+    replica.register("count", counting_job())
+    replica.start(loop)
+    assert replica.get(job.id) is None
+
+    # Once the owner is gone, the job can be taken over
+    first.shutdown()
+    takeover = JobManager(str(tmp_path))
+    takeover.register("count", counting_job())
+    takeover.start(loop)
+    resumed = takeover.get(job.id)
+    wait_for(lambda: resumed.status == "completed")
+
+    assert resumed.processed == ITEMS
+    assert takeover.read_results(job.id, limit=100) == [{"item": i} for i in range(ITEMS)]
+    replica.shutdown()
+    takeover.shutdown()
+    loop.close()
@@ -0,0 +1,88 @@
+"""
+Lexical blocking: MinHash/LSH keys and blocked search recall
+"""
+
+import numpy as np
+
+from conftest import LSH_WIDTH, unit_vectors
+from lexical_blocking import LexicalBlocker, fold_text
+import search_index
+from search_index import SearchIndex
+
+REPORT = {
+    "scammer_name": "Ján Novák",
+    "address": "Hlavná 123",
+    "city": "Bratislava",
+    "description": "Prenájom bytu, záloha vopred cez Western Union",
+    "scam_type": "rental",
+}
+
+
+def shared_bands(a: np.ndarray, b: np.ndarray) -> int:
+    return int(((a == b) & (a != 0)).sum())
+
+
+def test_folding_ignores_case_diacritics_and_punctuation():
+    assert fold_text("  Ján NOVÁK,  Hlavná-123! ") == "jan novak hlavna 123"
+
+
+def test_near_duplicate_identity_collides_despite_other_description():
+    blocker = LexicalBlocker()
+    near = dict(
+        REPORT,
+        scammer_name="Jan Novak",
+        address="Hlavna 125",
+        description="Completely different wording about a car sale",
+    )
+    unrelated = {"scammer_name": "Maria Kovacova", "city": "Kosice", "description": "Phishing"}
+
+    keys = blocker.report_keys(REPORT)
+
+    assert keys.shape == (blocker.key_count,)
+    assert shared_bands(keys[: blocker.bands], blocker.report_keys(near)[: blocker.bands]) > 0
+    assert shared_bands(keys, blocker.report_keys(unrelated)) == 0
+
+
+def test_scam_type_does_not_affect_keys_and_empty_groups_never_match():
+    blocker = LexicalBlocker()
+
+    assert np.array_equal(
+        blocker.report_keys(REPORT), blocker.report_keys(dict(REPORT, scam_type="phishing"))
+    )
+    # No identity fields: that group's keys are 0 and collide with nothing
+    text_keys = blocker.text_keys("Prenájom bytu")
+    assert not text_keys[: blocker.bands].any()
+    assert blocker.keys_for(None, None) is None
+
+
+def test_blocked_search_scores_reports_without_keys():
+    vectors = unit_vectors(20, seed=6)
+    index = SearchIndex()
+    for i, vector in enumerate(vectors):
+        index.upsert_embedding(f"report-{i}", vector)
+    keys = np.arange(1, LSH_WIDTH + 1, dtype=np.uint64)
+    for i in range(10):
+        index.upsert_lexical(f"report-{i}", keys + 100 * (i + 1))
+
+    # report-15 has no LSH keys and shares no band with the query
+    matches, scored = index.search_blocked(vectors[15], keys, threshold=0.99, top_k=1)
+
+    assert matches[0][0] == "report-15"
+    assert scored >= 1
+
+
+def test_blocked_search_merges_lsh_tail(monkeypatch):
+    monkeypatch.setattr(search_index, "LSH_MAX_TAIL", 16)
+    rng = np.random.default_rng(7)
+    index = SearchIndex()
+    keys = rng.integers(1, 30, size=(100, LSH_WIDTH)).astype(np.uint64)
+    for i, row in enumerate(keys):
+        index.upsert_lexical(f"report-{i}", row)
+
+    assert index.stats()["lexical"] == 100
+    assert index._lsh["built"] == 96
+
+    query = keys[42]
+    expected = {f"report-{i}" for i in np.nonzero((keys == query).any(axis=1))[0]}
+    rows = index._lexical_candidates(query, max_candidates=1000)
+    assert {index._lexical_rows.ids[row] for row in rows} == expected
@@ -0,0 +1,141 @@
+"""
+Model registry: lazy loading, LRU eviction under the memory budget, and
+per-model embedding dimensions at the API
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+import model_registry
+from admission import PriorityLock
+from model_registry import ModelRegistry, UnknownModelError, parse_models
+from singleflight import SingleFlight
+
+MB = 1024 * 1024
+
+# Fake model name -> (resident MB, embedding dimension)
+MODELS = {"small-model": (100, 384), "large-model": (300, 768), "other-model": (150, 384)}
+
+
+class FakeEmbeddingService:
+    loads = 0
+
+    def __init__(self, model_name, cache_dir=None):
+        time.sleep(0.05)
+        FakeEmbeddingService.loads += 1
+        self.model_name = model_name
+        self.size_mb, self.embedding_dim = MODELS[model_name]
+        self.inflight = SingleFlight(model_name)
+        self.inference_lock = PriorityLock()
+
+    def memory_bytes(self):
+        return self.size_mb * MB
+
+    def cosine_similarity(self, a, b):
+        return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
+
+    def find_similar_reports(self, query, candidates, ids, threshold, top_k=None):
+        return [(i, self.cosine_similarity(query, c)) for i, c in zip(ids, candidates)]
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    monkeypatch.setattr(model_registry, "EmbeddingService", FakeEmbeddingService)
+    FakeEmbeddingService.loads = 0
+    return ModelRegistry(
+        {"small": "small-model", "large": "large-model", "other": "other-model"},
+        default_model_id="small",
+        memory_budget_bytes=500 * MB,
+    )
+
+
+def test_models_load_lazily_and_once(registry):
+    assert registry.loaded_services() == {}
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        services = list(pool.map(lambda _: registry.get("large"), range(8)))
+
+    assert FakeEmbeddingService.loads == 1
+    assert all(service is services[0] for service in services)
+    assert registry.get().model_name == "small-model"
+
+
+def test_least_recently_used_model_is_evicted_over_budget(registry):
+    registry.get("small")
+    registry.get("large")
+    registry.get("small")  # large is now least recently used
+
+    registry.get("other")  # 100 + 300 + 150 MB > 500 MB budget
+
+    assert set(registry.loaded_services()) == {"small", "other"}
+    assert registry.resident_bytes() == 250 * MB
+    stats = registry.stats()["models"]
+    assert stats["large"]["evictions"] == 1 and not stats["large"]["loaded"]
+
+    # An evicted model is loaded again on its next use
+    registry.get("large")
+    assert registry.stats()["models"]["large"]["loads"] == 2
+
+
+def test_unknown_model_is_rejected(registry):
+    with pytest.raises(UnknownModelError):
+        registry.get("missing")
+    with pytest.raises(ValueError):
+        ModelRegistry({"a": "small-model"}, default_model_id="b", memory_budget_bytes=MB)
+
+
+def test_parse_models():
+    assert parse_models(" a = model-a , b=model-b,c ") == {
+        "a": "model-a",
+        "b": "model-b",
+        "c": "c",
+    }
+
+
+@pytest.fixture
+def client(monkeypatch):
+    services = {
+        None: FakeEmbeddingService("small-model"),
+        "large": FakeEmbeddingService("large-model"),
+    }
+    monkeypatch.setattr(api, "get_embedding_service", lambda model_id=None: services[model_id])
+    return TestClient(api.app)
+
+
+def test_similarity_accepts_the_selected_models_dimension(client):
+    vector = [1.0] + [0.0] * 767
+
+    response = client.post(
+        "/api/v1/embeddings/similarity",
+        json={"embedding1": vector, "embedding2": vector, "model_id": "large"},
+    )
+
+    assert response.status_code == 200
+    assert response.json()["similarity"] == pytest.approx(1.0)
+
+
+def test_embeddings_of_another_dimension_are_rejected(client):
+    short = [1.0] * 384
+
+    similarity = client.post(
+        "/api/v1/embeddings/similarity",
+        json={"embedding1": short, "embedding2": short, "model_id": "large"},
+    )
+    find_similar = client.post(
+        "/api/v1/embeddings/find-similar",
+        json={
+            "query_embedding": short,
+            "candidate_embeddings": [short, [1.0] * 768],
+            "candidate_ids": ["a", "b"],
+        },
+    )
+
+    assert similarity.status_code == 400
+    assert "dimension 768" in similarity.json()["detail"]
+    assert find_similar.status_code == 400
+    assert "got 768" in find_similar.json()["detail"]
@@ -0,0 +1,86 @@
+"""
+Sampling profiler output and profile store eviction
+"""
+
+import json
+import threading
+import time
+
+import pytest
+
+from profiling import ProfileStore, SamplingProfiler
+
+
+def busy_loop(stop: threading.Event) -> None:
+    while not stop.is_set():
+        sum(i * i for i in range(1000))
+
+
+def idle_wait(stop: threading.Event) -> None:
+    stop.wait()
+
+
+def profile_threads(mode: str) -> SamplingProfiler:
+    stop = threading.Event()
+    threads = [
+        threading.Thread(target=busy_loop, args=(stop,), name="busy"),
+        threading.Thread(target=idle_wait, args=(stop,), name="idle"),
+    ]
+    for thread in threads:
+        thread.start()
+
+    profiler = SamplingProfiler(interval=0.002, mode=mode)
+    profiler.start()
+    time.sleep(0.3)
+    profiler.stop()
+
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return profiler
+
+
+def test_wall_mode_samples_busy_and_blocked_threads():
+    profiler = profile_threads("wall")
+    collapsed = profiler.to_collapsed()
+
+    assert profiler.sample_count > 0
+    assert any(line.startswith("busy;") and "busy_loop" in line for line in collapsed.splitlines())
+    assert any(line.startswith("idle;") for line in collapsed.splitlines())
+
+
+def test_cpu_mode_drops_threads_waiting_on_events():
+    profiler = profile_threads("cpu")
+    threads = {thread for thread, _ in profiler.samples}
+
+    assert "busy" in threads
+    assert "idle" not in threads
+
+
+def test_speedscope_weights_match_sample_counts():
+    profiler = profile_threads("wall")
+    body, media_type = profiler.render("speedscope")
+    document = json.loads(body)
+
+    assert media_type == "application/json"
+    total = sum(sum(p["weights"]) for p in document["profiles"])
+    assert total == pytest.approx(sum(profiler.samples.values()) * profiler.interval)
+    for profile in document["profiles"]:
+        for stack in profile["samples"]:
+            assert all(0 <= i < len(document["shared"]["frames"]) for i in stack)
+
+
+def test_unsupported_mode_and_format_are_rejected():
+    with pytest.raises(ValueError):
+        SamplingProfiler(mode="gpu")
+    with pytest.raises(ValueError):
+        SamplingProfiler().render("pprof")
+
+
+def test_profile_store_keeps_most_recent():
+    store = ProfileStore(max_profiles=2)
+    for i in range(3):
+        store.put(f"profile-{i}", f"body-{i}", "text/plain")
+
+    assert store.get("profile-0") is None
+    assert store.get("profile-2") == ("body-2", "text/plain")
@@ -0,0 +1,87 @@
+"""
+SearchIndex compaction under concurrent writes
+"""
+
+import threading
+
+import numpy as np
+
+from conftest import apply_mutation, index_contents, random_mutations, unit_vectors
+from search_index import SearchIndex
+
+
+class InterleavingIndex(SearchIndex):
+    """Applies writes while a compaction is building, off the index lock"""
+
+    def __init__(self, concurrent_mutations):
+        super().__init__()
+        self.concurrent_mutations = concurrent_mutations
+
+    def _compaction_built(self, state, token):
+        thread = threading.Thread(
+            target=lambda: [apply_mutation(self, op, args) for op, args in self.concurrent_mutations]
+        )
+        thread.start()
+        thread.join()
+
+
+def test_writes_during_compaction_are_replayed():
+    mutations = random_mutations(600, seed=3)
+    before, during = mutations[:400], mutations[400:]
+
+    reference = SearchIndex()
+    for op, args in mutations:
+        apply_mutation(reference, op, args)
+
+    index = InterleavingIndex(during)
+    for op, args in before:
+        apply_mutation(index, op, args)
+
+    result = index.compact()
+
+    assert result["replayed"] == len(during)
+    assert index_contents(index) == index_contents(reference)
+
+
+def test_compaction_racing_writer_threads():
+    mutations = random_mutations(4000, seed=4)
+    reference = SearchIndex()
+    for op, args in mutations:
+        apply_mutation(reference, op, args)
+
+    index = SearchIndex()
+    done = threading.Event()
+
+    def writer():
+        for op, args in mutations:
+            apply_mutation(index, op, args)
+        done.set()
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    compactions = 0
+    while not done.is_set():
+        index.compact()
+        compactions += 1
+    thread.join()
+    index.compact()
+
+    assert compactions > 0
+    assert index_contents(index) == index_contents(reference)
+    assert index.tombstone_ratio() == 0.0
+
+
+def test_queries_see_every_report_after_compaction():
+    vectors = unit_vectors(50, seed=5)
+    index = SearchIndex()
+    for i, vector in enumerate(vectors):
+        index.upsert_embedding(f"report-{i}", vector)
+    for i in range(0, 50, 2):
+        index.delete_report(f"report-{i}")
+
+    index.compact()
+
+    for i in range(1, 50, 2):
+        matches = index.search_embeddings(vectors[i], threshold=0.99, top_k=1)
+        assert matches[0][0] == f"report-{i}"
+    assert index.search_embeddings(vectors[0], threshold=0.99) == []
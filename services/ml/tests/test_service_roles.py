@@ -0,0 +1,81 @@
+"""
+Routes and job types registered per ML_SERVICE_ROLE
+"""
+
+import importlib.util
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+import jobs
+from service_roles import service_role
+
+API_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "api.py")
+
+EMBEDDING_ROUTES = {"/api/v1/embeddings/generate", "/api/v1/index/upsert", "/api/v1/identifiers/load"}
+IMAGE_ROUTES = {"/api/v1/images/compare"}
+DEDUP_ROUTES = {"/api/v1/dedup/check"}
+
+
+def load_api(monkeypatch, role: str):
+    """A fresh copy of the api module, imported with ML_SERVICE_ROLE=role"""
+    monkeypatch.setenv("ML_SERVICE_ROLE", role)
+    spec = importlib.util.spec_from_file_location(f"api_{role}", API_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def route_paths(module) -> set:
+    return {route.path for route in module.app.routes}
+
+
+@pytest.mark.parametrize(
+    "role, served, absent",
+    [
+        ("embeddings", EMBEDDING_ROUTES, IMAGE_ROUTES | DEDUP_ROUTES),
+        ("images", IMAGE_ROUTES, EMBEDDING_ROUTES | DEDUP_ROUTES),
+        ("all", EMBEDDING_ROUTES | IMAGE_ROUTES | DEDUP_ROUTES, set()),
+    ],
+)
+def test_role_registers_only_its_routes(monkeypatch, role, served, absent):
+    module = load_api(monkeypatch, role)
+    paths = route_paths(module)
+
+    assert served <= paths
+    assert not absent & paths
+
+    assert TestClient(module.app).get("/health").json()["role"] == role
+
+
+def test_images_worker_lists_only_image_endpoints(monkeypatch):
+    client = TestClient(load_api(monkeypatch, "images").app)
+
+    endpoints = client.get("/").json()["endpoints"]
+
+    assert set(endpoints) == {"images", "health", "docs"}
+    assert client.post("/api/v1/embeddings/generate", json={"text": "x"}).status_code == 404
+
+
+@pytest.mark.parametrize(
+    "role, job_types",
+    [
+        ("embeddings", ["cluster", "load_identifiers", "migrate_embeddings", "reembed"]),
+        ("images", ["rehash"]),
+        ("all", ["cluster", "load_identifiers", "migrate_embeddings", "reembed", "rehash"]),
+    ],
+)
+def test_role_registers_only_its_job_types(monkeypatch, tmp_path, role, job_types):
+    monkeypatch.setenv("ML_SERVICE_ROLE", role)
+    monkeypatch.setenv("ML_JOB_DIR", str(tmp_path))
+    monkeypatch.setattr(jobs, "_job_manager", None)
+
+    assert jobs.get_job_manager().job_types == job_types
+
+
+def test_unknown_role_is_rejected(monkeypatch):
+    monkeypatch.setenv("ML_SERVICE_ROLE", "gpu")
+
+    with pytest.raises(ValueError, match="Unknown ML_SERVICE_ROLE"):
+        service_role()
@@ -0,0 +1,185 @@
+"""
+Rebalancing reports between spawned local shard processes
+"""
+
+import asyncio
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+from conftest import DIMENSION, LSH_WIDTH, unit_vectors
+from sharding import ShardError, ShardedIndex, owner_of, parse_shard_specs
+
+
+async def shard_contents(index: ShardedIndex):
+    return {
+        name: set(await shard.call("report_ids")) for name, shard in index._shards.items()
+    }
+
+
+async def rebalance_scenario():
+    vectors = unit_vectors(300, seed=8)
+    ids = [f"report-{i}" for i in range(len(vectors))]
+    rng = np.random.default_rng(8)
+    keys = rng.integers(1, 1000, size=(len(ids), LSH_WIDTH)).astype(np.uint64)
+
+    index = ShardedIndex(timeout=30, start_timeout=60)
+    try:
+        await index.set_members(parse_shard_specs(["local:2"]))
+        await index.upsert(embeddings=list(zip(ids, vectors)), lexical=list(zip(ids, keys)))
+
+        grown = await index.set_members(parse_shard_specs(["local:3"]))
+        after_grow = await shard_contents(index)
+
+        shrunk = await index.set_members(parse_shard_specs(["local:1"]))
+        after_shrink = await shard_contents(index)
+
+        matches, failed = await index.search_embeddings(vectors[7], threshold=0.99, top_k=1)
+        blocked, _, _ = await index.search_blocked(vectors[9], keys[9], threshold=0.99, top_k=1)
+        return ids, grown, after_grow, shrunk, after_shrink, matches, failed, blocked
+    finally:
+        await index.close()
+
+
+def test_rebalance_moves_reports_to_their_owners(index_dir):
+    ids, grown, after_grow, shrunk, after_shrink, matches, failed, blocked = asyncio.run(
+        rebalance_scenario()
+    )
+    members = ["local-0", "local-1", "local-2"]
+
+    assert grown["added"] == ["local-2"]
+    assert grown["moved"] == sum(owner_of(r, members) == "local-2" for r in ids) > 0
+    assert set().union(*after_grow.values()) == set(ids)
+    for name, held in after_grow.items():
+        assert all(owner_of(r, members) == name for r in held)
+
+    assert shrunk["removed"] == ["local-1", "local-2"]
+    assert after_shrink == {"local-0": set(ids)}
+
+    assert matches[0][0] == "report-7" and failed == []
+    assert blocked[0][0] == "report-9"
+
+
+async def restart_scenario(ids, vectors):
+    index = ShardedIndex(timeout=30, start_timeout=60)
+    try:
+        await index.set_members(parse_shard_specs(["local:2"]))
+        await index.upsert(embeddings=list(zip(ids, vectors)))
+    finally:
+        await index.close()
+
+    # Restarted with another membership: persisted partitions are rebalanced
+    index = ShardedIndex(timeout=30, start_timeout=60)
+    try:
+        result = await index.set_members(parse_shard_specs(["local:3"]))
+        return result, await shard_contents(index)
+    finally:
+        await index.close()
+
+
+def test_restart_rebalances_persisted_partitions(index_dir):
+    vectors = unit_vectors(100, seed=9)
+    ids = [f"report-{i}" for i in range(len(vectors))]
+
+    result, contents = asyncio.run(restart_scenario(ids, vectors))
+
+    members = ["local-0", "local-1", "local-2"]
+    assert result["moved"] > 0
+    for name, held in contents.items():
+        assert held == {r for r in ids if owner_of(r, members) == name}
+
+
+class RecordingShard:
+    def __init__(self, name):
+        self.name = name
+        self.calls = []
+
+    async def call(self, op, *, timeout=None, **args):
+        self.calls.append((op, timeout))
+        if self.name == "down":
+            raise ShardError(self.name, "timed out")
+        return {"dropped": 0}
+
+
+def test_compaction_uses_its_own_timeout():
+    index = ShardedIndex(timeout=5, compact_timeout=900)
+    shard = RecordingShard("local-0")
+    index._shards = {"local-0": shard}
+
+    result = asyncio.run(index.compact())
+
+    assert result == {"local-0": {"dropped": 0}}
+    assert shard.calls == [("compact", 900)]
+
+
+def test_failed_write_reports_the_failed_shards():
+    index = ShardedIndex()
+    index._shards = {name: RecordingShard(name) for name in ("up", "down")}
+    index._members = ["up", "down"]
+    ids = [f"report-{i}" for i in range(20)]
+    vectors = unit_vectors(len(ids))
+
+    with pytest.raises(ShardError) as raised:
+        asyncio.run(index.upsert(embeddings=list(zip(ids, vectors))))
+
+    # The healthy shard kept its part of the batch
+    assert raised.value.shard == "down"
+    assert "1 other shards were written" in str(raised.value)
+    assert index._shards["up"].calls == [("upsert_embeddings", None)]
+
+
+class FakeIndex:
+    def __init__(self, error=None):
+        self.error = error
+        self.upserts = []
+
+    async def upsert(self, embeddings, images, lexical):
+        if self.error:
+            raise self.error
+        self.upserts.append(embeddings)
+        return {"embeddings": len(embeddings), "images": len(images), "lexical": len(lexical)}
+
+
+class FixedDimensionService:
+    model_name = "fixed"
+    embedding_dim = DIMENSION
+
+    def batch_generate_embeddings(self, texts):
+        return [np.zeros(DIMENSION, dtype=np.float32) for _ in texts]
+
+
+@pytest.fixture
+def upsert_client(monkeypatch):
+    def connect(index):
+        monkeypatch.setattr(api, "get_sharded_index", lambda: index)
+        return TestClient(api.app)
+
+    monkeypatch.setattr(api, "get_embedding_service", lambda: FixedDimensionService())
+    return connect
+
+
+def test_upsert_rejects_embeddings_of_another_dimension(upsert_client):
+    index = FakeIndex()
+    client = upsert_client(index)
+    items = [
+        {"report_id": "a", "embedding": [0.0] * DIMENSION},
+        {"report_id": "b", "embedding": [0.0] * (DIMENSION + 1)},
+    ]
+
+    response = client.post("/api/v1/index/upsert", json={"items": items})
+
+    assert response.status_code == 400
+    assert f"got {DIMENSION + 1}" in response.json()["detail"]
+    assert index.upserts == []
+
+
+def test_upsert_shard_failure_is_unavailable(upsert_client):
+    client = upsert_client(FakeIndex(ShardError("local-1", "timed out")))
+    items = [{"report_id": "a", "embedding": [0.0] * DIMENSION}]
+
+    response = client.post("/api/v1/index/upsert", json={"items": items})
+
+    assert response.status_code == 503
+    assert "local-1" in response.json()["detail"]
@@ -0,0 +1,82 @@
+"""
+Coalescing of identical concurrent calls
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+import pytest
+
+from conftest import wait_for
+from singleflight import SingleFlight
+
+
+def test_concurrent_identical_calls_share_one_execution():
+    flight = SingleFlight("test")
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(10)
+        return [1, 2, 3]
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        leader = pool.submit(flight.do, "key", compute)
+        assert started.wait(10)
+        followers = [pool.submit(flight.do, "key", compute) for _ in range(7)]
+        # Followers register as waiters before the leader is released
+        wait_for(lambda: flight.coalesced == 7)
+        release.set()
+
+        results = [leader.result()] + [f.result() for f in followers]
+
+    assert len(calls) == 1
+    assert results[0] == ([1, 2, 3], False)
+    assert all(result == ([1, 2, 3], True) for result in results[1:])
+    assert all(result[0] is results[0][0] for result in results)
+    assert flight.stats() == {"executions": 1, "coalesced": 7, "in_flight": 0}
+
+
+def test_different_keys_run_independently():
+    flight = SingleFlight("test")
+    barrier = threading.Barrier(2, timeout=10)
+
+    def compute(value):
+        barrier.wait()  # Both must be running at once
+        return value
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        a = pool.submit(flight.do, "a", lambda: compute("a"))
+        b = pool.submit(flight.do, "b", lambda: compute("b"))
+
+        assert a.result() == ("a", False)
+        assert b.result() == ("b", False)
+
+
+def test_errors_reach_every_waiter_and_are_not_cached():
+    flight = SingleFlight("test")
+    started = threading.Event()
+    release = threading.Event()
+
+    def fail():
+        started.set()
+        release.wait(10)
+        raise RuntimeError("model failed")
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(flight.do, "key", fail)
+        assert started.wait(10)
+        follower = pool.submit(flight.do, "key", fail)
+        wait_for(lambda: flight.coalesced == 1)
+        release.set()
+
+        for future in (leader, follower):
+            with pytest.raises(RuntimeError, match="model failed"):
+                future.result()
+
+    # The next call runs again instead of reusing the failure
+    assert flight.do("key", lambda: "ok") == ("ok", False)
+    assert flight.stats()["executions"] == 2
@@ -0,0 +1,87 @@
+"""
+Stage tracing: sampling, span nesting and the JSON-lines exporter
+"""
+
+import json
+import threading
+
+from tracing import JsonFileSpanExporter, NullSpanExporter, Tracer
+
+
+def read_lines(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_sampled_trace_is_exported_with_nested_spans(tmp_path):
+    exporter = JsonFileSpanExporter(str(tmp_path / "spans.jsonl"))
+    tracer = Tracer(exporter, sample_rate=1.0)
+
+    with tracer.start_trace("http.request", path="/x") as root:
+        with tracer.span("stage.outer"):
+            with tracer.span("stage.inner", items=3):
+                pass
+    exporter.flush()
+    exporter.shutdown()
+
+    [line] = read_lines(tmp_path / "spans.jsonl")
+    spans = {span["name"]: span for span in line["spans"]}
+    assert line["trace_id"] == root.trace_id
+    assert spans["stage.inner"]["parent_id"] == spans["stage.outer"]["span_id"]
+    assert spans["stage.outer"]["parent_id"] == spans["http.request"]["span_id"]
+    assert spans["stage.inner"]["attributes"] == {"items": 3}
+
+
+def test_unsampled_requests_record_nothing():
+    tracer = Tracer(NullSpanExporter(), sample_rate=0.0)
+
+    with tracer.start_trace("http.request") as root:
+        with tracer.span("stage") as span:
+            assert root is None and span is None
+
+
+def test_upstream_sampling_decision_is_honored():
+    tracer = Tracer(NullSpanExporter(), sample_rate=0.0)
+    trace_id = "4bf92f3577b34da6a3ce929d0e0e4736"
+
+    parsed = tracer.parse_headers({"traceparent": f"00-{trace_id}-00f067aa0ba902b7-01"})
+
+    assert parsed == (trace_id, "00f067aa0ba902b7", True)
+    assert tracer.should_sample(parsed[2])
+
+
+def test_export_does_not_block_on_the_writer(tmp_path):
+    exporter = JsonFileSpanExporter(str(tmp_path / "spans.jsonl"), queue_size=2)
+    tracer = Tracer(exporter, sample_rate=1.0)
+
+    # Hold the writer thread so the queue fills up
+    release = threading.Event()
+    write = exporter._write
+    exporter._write = lambda trace: (release.wait(10), write(trace))
+
+    for _ in range(10):
+        with tracer.start_trace("http.request"):
+            pass
+
+    assert exporter.dropped > 0
+    release.set()
+    exporter.flush()
+    exporter.shutdown()
+    assert len(read_lines(tmp_path / "spans.jsonl")) == 10 - exporter.dropped
+
+
+def test_export_file_is_rotated_at_max_bytes(tmp_path):
+    path = tmp_path / "spans.jsonl"
+    exporter = JsonFileSpanExporter(str(path), max_bytes=2000)
+    tracer = Tracer(exporter, sample_rate=1.0)
+
+    for i in range(50):
+        with tracer.start_trace("http.request", request=i):
+            pass
+    exporter.flush()
+    exporter.shutdown()
+
+    assert path.stat().st_size <= 2000
+    assert (tmp_path / "spans.jsonl.1").stat().st_size <= 2000
+    last = read_lines(path)[-1]
+    assert last["spans"][0]["attributes"] == {"request": 49}
@@ -0,0 +1,74 @@
+"""
+pgvector candidate retrieval: vector codec, pool session settings
+
+Tests that need a database run against ML_TEST_POSTGRES_URL (a scratch
+database with the pgvector extension) and are skipped when it is not set.
+"""
+
+import asyncio
+import os
+
+import numpy as np
+import pytest
+
+from vector_store import VectorStore, _decode_vector, _encode_vector
+
+TEST_DSN = os.environ.get("ML_TEST_POSTGRES_URL")
+
+needs_database = pytest.mark.skipif(not TEST_DSN, reason="ML_TEST_POSTGRES_URL not set")
+
+
+def test_vector_codec_round_trip():
+    vector = np.array([0.5, -1.25, 3.0], dtype=np.float32)
+
+    encoded = _encode_vector(vector)
+
+    assert encoded[:4] == b"\x00\x03\x00\x00"
+    assert np.array_equal(_decode_vector(encoded), vector)
+
+
+async def ef_search_after_release(ef_search: int):
+    store = VectorStore(TEST_DSN, min_size=1, max_size=1, ef_search=ef_search)
+    await store.connect()
+    try:
+        settings = []
+        # One pooled connection: the second acquire gets it back after the
+        # pool has reset it
+        for _ in range(2):
+            async with store.pool.acquire() as conn:
+                settings.append(await conn.fetchval("SHOW hnsw.ef_search"))
+        return settings
+    finally:
+        await store.close()
+
+
+@needs_database
+def test_ef_search_survives_connection_release():
+    assert asyncio.run(ef_search_after_release(123)) == ["123", "123"]
+
+
+def test_pool_sets_ef_search_at_connection_startup(monkeypatch):
+    import asyncpg
+
+    created = {}
+
+    async def create_pool(dsn, **kwargs):
+        created.update(kwargs)
+        raise ConnectionRefusedError()
+
+    monkeypatch.setattr(asyncpg, "create_pool", create_pool)
+
+    with pytest.raises(ConnectionRefusedError):
+        asyncio.run(VectorStore("postgresql://unused", ef_search=80).connect())
+
+    # Not a SET in init=, which RESET ALL undoes on every release
+    assert created["server_settings"] == {"hnsw.ef_search": "80"}
+
+
+def test_non_uuid_exclude_ids_are_rejected():
+    from pydantic import ValidationError
+
+    from api import DbFindSimilarRequest
+
+    with pytest.raises(ValidationError):
+        DbFindSimilarRequest(text="scam", exclude_ids=["report-1"])
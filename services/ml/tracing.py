@@ -0,0 +1,362 @@
+"""
+Per-request stage tracing for the ML service
+Records timed spans (model inference, image download/decode, ...)
+for a sampled subset of requests and hands finished traces to an exporter
+
+Configuration (environment):
+- TRACE_SAMPLE_RATE: Fraction of requests to trace, 0.0 - 1.0 (default 0.05)
+- TRACE_EXPORTER: "file" (JSON lines, default) or "none"
+- TRACE_EXPORT_PATH: Output file for the file exporter (default
+  <system temp dir>/ml-service/traces/spans.jsonl). Point it at a mounted
+  volume to keep traces; never inside the app directory, which compose
+  bind-mounts from the source tree.
+- TRACE_EXPORT_MAX_BYTES: Size at which the export file is rotated to
+  <path>.1, replacing the previous one (default 50 MB)
+"""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Tuple
+import json
+import logging
+import os
+import queue
+import random
+import re
+import tempfile
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Incoming/outgoing trace ID header (W3C traceparent is accepted as well)
+TRACE_HEADER = "X-Trace-Id"
+TRACEPARENT_HEADER = "traceparent"
+
+_TRACE_ID_PATTERN = re.compile(r"^[A-Za-z0-9\-]{8,64}$")
+_TRACEPARENT_PATTERN = re.compile(
+    r"^[0-9a-f]{2}-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$"
+)
+
+
+class Span:
+    """A single timed stage within a trace"""
+
+    __slots__ = (
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "name",
+        "start_time",
+        "duration_ms",
+        "attributes",
+        "status",
+        "_start_perf",
+    )
+
+    def __init__(
+        self,
+        trace_id: str,
+        name: str,
+        parent_id: Optional[str] = None,
+        attributes: Optional[Dict] = None,
+    ):
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.name = name
+        self.start_time = time.time()
+        self.duration_ms: Optional[float] = None
+        self.attributes = dict(attributes) if attributes else {}
+        self.status = "ok"
+        self._start_perf = time.perf_counter()
+
+    def set_attribute(self, key: str, value) -> None:
+        self.attributes[key] = value
+
+    def end(self) -> None:
+        if self.duration_ms is None:
+            self.duration_ms = (time.perf_counter() - self._start_perf) * 1000.0
+
+    def to_dict(self) -> Dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_time": self.start_time,
+            "duration_ms": round(self.duration_ms or 0.0, 3),
+            "attributes": self.attributes,
+            "status": self.status,
+        }
+
+
+class Trace:
+    """Spans collected for one sampled request"""
+
+    def __init__(self, trace_id: str, parent_span_id: Optional[str] = None):
+        self.trace_id = trace_id
+        self.parent_span_id = parent_span_id
+        self.spans: List[Span] = []
+        # Spans may be recorded from threadpool workers
+        self._lock = threading.Lock()
+
+    def add(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+
+# ============================================================================
+# EXPORTERS
+# ============================================================================
+
+class SpanExporter:
+    """Base exporter - receives every finished, sampled trace"""
+
+    def export(self, trace: Trace) -> None:
+        raise NotImplementedError
+
+    def shutdown(self) -> None:
+        pass
+
+
+class NullSpanExporter(SpanExporter):
+    """Discards all traces"""
+
+    def export(self, trace: Trace) -> None:
+        pass
+
+
+class JsonFileSpanExporter(SpanExporter):
+    """
+    Appends one JSON object per trace to a local file
+
+    Each line: {"trace_id": ..., "duration_ms": ..., "spans": [...]}
+
+    Traces are serialized and written by a background thread, so export()
+    never blocks the event loop; when the queue is full they are dropped.
+    The file is rotated to <path>.1 once it reaches max_bytes.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 50 * 1024 * 1024, queue_size: int = 1000):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.dropped = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, trace: Trace) -> None:
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self) -> None:
+        """Wait until every queued trace has been written"""
+        self._queue.join()
+
+    def shutdown(self) -> None:
+        self._queue.put(None)
+        self._thread.join(timeout=10)
+
+    def _run(self) -> None:
+        while True:
+            trace = self._queue.get()
+            try:
+                if trace is None:
+                    return
+                self._write(trace)
+            finally:
+                self._queue.task_done()
+
+    def _write(self, trace: Trace) -> None:
+        spans = [span.to_dict() for span in trace.spans]
+        root = next((s for s in spans if s["parent_id"] == trace.parent_span_id), None)
+
+        line = json.dumps(
+            {
+                "trace_id": trace.trace_id,
+                "duration_ms": root["duration_ms"] if root else None,
+                "spans": spans,
+            },
+            ensure_ascii=False,
+            default=str,
+        ).encode("utf-8") + b"\n"
+
+        try:
+            if os.path.exists(self.path) and os.path.getsize(self.path) + len(line) > self.max_bytes:
+                os.replace(self.path, self.path + ".1")
+            with open(self.path, "ab") as f:
+                f.write(line)
+        except OSError as e:
+            logger.error(f"Error exporting trace {trace.trace_id}: {e}")
+
+
+# ============================================================================
+# TRACER
+# ============================================================================
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+class Tracer:
+    """
+    Creates traces for sampled requests and records stage spans
+
+    Spans opened while no trace is active are no-ops, so instrumented code
+    paths cost a single context variable lookup for unsampled requests.
+    """
+
+    def __init__(self, exporter: SpanExporter, sample_rate: float = 0.05):
+        self.exporter = exporter
+        self.sample_rate = min(max(sample_rate, 0.0), 1.0)
+
+    def set_exporter(self, exporter: SpanExporter) -> None:
+        """Replace the active exporter (e.g. to ship spans to a collector)"""
+        old = self.exporter
+        self.exporter = exporter
+        old.shutdown()
+
+    def parse_headers(self, headers) -> Tuple[Optional[str], Optional[str], Optional[bool]]:
+        """
+        Extract incoming trace context from request headers
+
+        Returns:
+            Tuple of (trace_id, parent_span_id, sampled) - None where absent
+        """
+        traceparent = headers.get(TRACEPARENT_HEADER)
+        if traceparent:
+            match = _TRACEPARENT_PATTERN.match(traceparent.strip().lower())
+            if match:
+                trace_id, parent_id, flags = match.groups()
+                return trace_id, parent_id, bool(int(flags, 16) & 0x01)
+
+        trace_id = headers.get(TRACE_HEADER)
+        if trace_id and _TRACE_ID_PATTERN.match(trace_id.strip()):
+            return trace_id.strip(), None, None
+
+        return None, None, None
+
+    def should_sample(self, sampled: Optional[bool] = None) -> bool:
+        """Honor an upstream sampling decision, otherwise roll against the rate"""
+        if sampled is not None:
+            return sampled
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    @contextmanager
+    def start_trace(
+        self,
+        name: str,
+        trace_id: Optional[str] = None,
+        parent_span_id: Optional[str] = None,
+        sampled: Optional[bool] = None,
+        **attributes,
+    ) -> Iterator[Optional[Span]]:
+        """
+        Start a trace with a root span; exported when the block exits
+
+        Yields the root span, or None if the request was not sampled.
+        """
+        if not self.should_sample(sampled):
+            yield None
+            return
+
+        trace = Trace(trace_id or uuid.uuid4().hex, parent_span_id)
+        root = Span(trace.trace_id, name, parent_span_id, attributes)
+
+        trace_token = _current_trace.set(trace)
+        span_token = _current_span.set(root)
+        try:
+            yield root
+        except BaseException:
+            root.status = "error"
+            raise
+        finally:
+            root.end()
+            trace.add(root)
+            _current_span.reset(span_token)
+            _current_trace.reset(trace_token)
+
+            try:
+                self.exporter.export(trace)
+            except Exception as e:
+                logger.error(f"Trace exporter failed: {e}")
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[Optional[Span]]:
+        """Record a child span of the current span (no-op outside a trace)"""
+        trace = _current_trace.get()
+        if trace is None:
+            yield None
+            return
+
+        parent = _current_span.get()
+        span = Span(trace.trace_id, name, parent.span_id if parent else None, attributes)
+
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException:
+            span.status = "error"
+            raise
+        finally:
+            span.end()
+            trace.add(span)
+            _current_span.reset(token)
+
+
+def current_trace_id() -> Optional[str]:
+    """Trace ID of the active trace, if the current request is sampled"""
+    trace = _current_trace.get()
+    return trace.trace_id if trace else None
+
+
+def _create_exporter() -> SpanExporter:
+    exporter_name = os.environ.get("TRACE_EXPORTER", "file").lower()
+
+    if exporter_name == "none":
+        return NullSpanExporter()
+
+    if exporter_name != "file":
+        logger.warning(f"Unknown TRACE_EXPORTER '{exporter_name}', using file exporter")
+
+    default_path = os.path.join(tempfile.gettempdir(), "ml-service", "traces", "spans.jsonl")
+    return JsonFileSpanExporter(
+        os.environ.get("TRACE_EXPORT_PATH", default_path),
+        max_bytes=int(os.environ.get("TRACE_EXPORT_MAX_BYTES", str(50 * 1024 * 1024))),
+    )
+
+
+# Singleton instance
+_tracer: Optional[Tracer] = None
+
+
+def get_tracer() -> Tracer:
+    """
+    Get or create singleton tracer instance
+
+    Returns:
+        Tracer instance
+    """
+    global _tracer
+
+    if _tracer is None:
+        _tracer = Tracer(
+            _create_exporter(),
+            sample_rate=float(os.environ.get("TRACE_SAMPLE_RATE", "0.05")),
+        )
+
+    return _tracer
+
+
+def span(name: str, **attributes):
+    """Shortcut for get_tracer().span(...)"""
+    return get_tracer().span(name, **attributes)
@@ -0,0 +1,612 @@
+"""
+Database-backed candidate retrieval using pgvector
+Runs nearest-neighbour queries against fraud_reports.embedding (HNSW index
+from database/migrations/001_duplicate_detection.sql) directly from the ML
+service, so embeddings never travel through the web tier.
+
+Embedding versions (database/migrations/002_embedding_versions.sql): vectors
+of other models live in report_embeddings, tagged with the model ID. The
+embedding_serving row names the version queries read (NULL = the
+fraud_reports.embedding column) and the shadow version a migration is
+filling (see embedding_migration). Workers re-read it every few seconds.
+
+Configuration (environment):
+- ML_DB_MATCHING: Enable database matching ("1"/"true", default off)
+- POSTGRES_URL: Connection string
+- ML_DB_POOL_MIN / ML_DB_POOL_MAX: Pool size (default 1 / 10)
+- ML_HNSW_EF_SEARCH: hnsw.ef_search for each pooled session (default 64)
+- ML_EMBEDDING_SERVING_REFRESH: Seconds between re-reads of the serving
+  version (default 10)
+"""
+
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import logging
+import os
+import re
+import struct
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Cosine distance ordering uses the HNSW index (vector_cosine_ops); the
+# threshold is applied outside the ORDER BY so the index stays usable
+FIND_SIMILAR_SQL = """
+SELECT id, similarity FROM (
+    SELECT id::text AS id, 1 - (embedding <=> $1) AS similarity
+    FROM fraud_reports
+    WHERE embedding IS NOT NULL
+      AND merged_into_id IS NULL
+      AND NOT (id = ANY($3::uuid[]))
+    ORDER BY embedding <=> $1
+    LIMIT $2
+) nearest
+WHERE similarity >= $4
+ORDER BY similarity DESC
+"""
+
+WRITE_EMBEDDING_SQL = """
+UPDATE fraud_reports SET embedding = $2, updated_at = NOW() WHERE id = $1::uuid
+"""
+
+# Keyset pagination over reports (fields used by create_report_text)
+FETCH_REPORTS_SQL = """
+SELECT id::text AS id, scammer_name, company_name, description, address,
+       city, website, email, scam_type
+FROM fraud_reports
+WHERE ($1::uuid IS NULL OR id > $1::uuid)
+  AND ($3 OR embedding IS NULL)
+  AND merged_into_id IS NULL
+ORDER BY id
+LIMIT $2
+"""
+
+# Keyset pagination over normalized identifiers (normalizers.ts output)
+FETCH_IDENTIFIERS_SQL = """
+SELECT nf.report_id::text AS id,
+       nf.normalized_phone AS phone, nf.normalized_email AS email,
+       nf.normalized_iban AS iban, nf.normalized_crypto_wallet AS crypto_wallet,
+       nf.normalized_license_plate AS license_plate, nf.normalized_vin AS vin,
+       nf.normalized_company_id AS company_id
+FROM normalized_fields nf
+JOIN fraud_reports r ON r.id = nf.report_id
+WHERE ($1::uuid IS NULL OR nf.report_id > $1::uuid)
+  AND r.merged_into_id IS NULL
+ORDER BY nf.report_id
+LIMIT $2
+"""
+
+COUNT_IDENTIFIERS_SQL = """
+SELECT count(*) FROM normalized_fields nf
+JOIN fraud_reports r ON r.id = nf.report_id
+WHERE r.merged_into_id IS NULL
+"""
+
+COUNT_REPORTS_SQL = """
+SELECT count(*) FROM fraud_reports
+WHERE ($1 OR embedding IS NULL) AND merged_into_id IS NULL
+"""
+
+# Versioned vectors (report_embeddings). The version is inlined as a literal
+# (checked against VERSION_PATTERN) so the planner can use the partial HNSW
+# index of that version; the cast fixes the dimension the index was built for.
+FIND_SIMILAR_VERSION_SQL = """
+SELECT id, similarity FROM (
+    SELECT e.report_id::text AS id, 1 - (e.embedding::vector({dim}) <=> $1) AS similarity
+    FROM report_embeddings e
+    JOIN fraud_reports r ON r.id = e.report_id
+    WHERE e.model_version = '{version}'
+      AND r.merged_into_id IS NULL
+      AND NOT (e.report_id = ANY($3::uuid[]))
+    ORDER BY e.embedding::vector({dim}) <=> $1
+    LIMIT $2
+) nearest
+WHERE similarity >= $4
+ORDER BY similarity DESC
+"""
+
+CREATE_VERSION_INDEX_SQL = """
+CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON report_embeddings
+USING hnsw ((embedding::vector({dim})) vector_cosine_ops)
+WITH (m = 16, ef_construction = 64)
+WHERE model_version = '{version}'
+"""
+
+# Reports deleted in the meantime are skipped, like the UPDATE above
+WRITE_VERSION_SQL = """
+INSERT INTO report_embeddings (model_version, report_id, embedding)
+SELECT $1::varchar, id, $3::vector FROM fraud_reports WHERE id = $2::uuid
+ON CONFLICT (model_version, report_id)
+DO UPDATE SET embedding = EXCLUDED.embedding, updated_at = NOW()
+"""
+
+FETCH_REPORTS_VERSION_SQL = """
+SELECT r.id::text AS id, r.scammer_name, r.company_name, r.description,
+       r.address, r.city, r.website, r.email, r.scam_type
+FROM fraud_reports r
+WHERE ($1::uuid IS NULL OR r.id > $1::uuid)
+  AND ($3 OR NOT EXISTS (
+      SELECT 1 FROM report_embeddings e
+      WHERE e.model_version = $4 AND e.report_id = r.id
+  ))
+  AND r.merged_into_id IS NULL
+ORDER BY r.id
+LIMIT $2
+"""
+
+COUNT_REPORTS_VERSION_SQL = """
+SELECT count(*) FROM fraud_reports r
+WHERE ($1 OR NOT EXISTS (
+      SELECT 1 FROM report_embeddings e
+      WHERE e.model_version = $2 AND e.report_id = r.id
+  ))
+  AND r.merged_into_id IS NULL
+"""
+
+COUNT_WRONG_DIMENSION_SQL = """
+SELECT count(*) FROM report_embeddings
+WHERE model_version = $1 AND vector_dims(embedding) <> $2
+"""
+
+SAMPLE_REPORTS_VERSION_SQL = """
+SELECT r.id::text AS id, r.scammer_name, r.company_name, r.description,
+       r.address, r.city, r.website, r.email, r.scam_type
+FROM report_embeddings e
+JOIN fraud_reports r ON r.id = e.report_id
+WHERE e.model_version = $1 AND r.merged_into_id IS NULL
+ORDER BY random()
+LIMIT $2
+"""
+
+DELETE_VERSION_SQL = """
+DELETE FROM report_embeddings WHERE model_version = $1
+"""
+
+READ_SERVING_SQL = """
+SELECT model_version, shadow_version FROM embedding_serving WHERE id
+"""
+
+LOCK_SERVING_SQL = """
+SELECT model_version, shadow_version FROM embedding_serving WHERE id FOR UPDATE
+"""
+
+# Switching to the shadow version also ends the migration
+SWITCH_SERVING_SQL = """
+UPDATE embedding_serving
+SET previous_version = model_version,
+    model_version = $1,
+    shadow_version = CASE WHEN shadow_version = $1 THEN NULL ELSE shadow_version END,
+    switched_at = NOW()
+WHERE id
+"""
+
+SET_SHADOW_SQL = """
+UPDATE embedding_serving SET shadow_version = $1 WHERE id
+"""
+
+# Model IDs usable as version tags (inlined into SQL and index names)
+VERSION_PATTERN = re.compile(r"[A-Za-z0-9_.\-]{1,40}")
+
+# Default for version arguments: the version queries currently read
+SERVING = "@serving"
+
+
+class IncompleteVersionError(RuntimeError):
+    """Raised when switching to a version that lacks vectors for some reports"""
+
+    def __init__(self, version: Optional[str], missing: int):
+        super().__init__(
+            f"Embedding version {version or 'fraud_reports.embedding'} is missing "
+            f"{missing} active reports"
+        )
+        self.version = version
+        self.missing = missing
+
+
+def check_version(version: str) -> str:
+    if not VERSION_PATTERN.fullmatch(version):
+        raise ValueError(f"Invalid embedding version '{version}' (allowed: A-Z a-z 0-9 _ . -)")
+    return version
+
+
+def _version_index_name(version: str) -> str:
+    return "idx_report_embeddings_" + re.sub(r"[^A-Za-z0-9_]", "_", version).lower()
+
+
+def _encode_vector(value) -> bytes:
+    """pgvector binary format: uint16 dim, uint16 unused, float32[dim] (big-endian)"""
+    array = np.asarray(value, dtype=">f4")
+    return struct.pack(">HH", array.shape[0], 0) + array.tobytes()
+
+
+def _decode_vector(data: bytes) -> np.ndarray:
+    dim, _ = struct.unpack_from(">HH", data)
+    return np.frombuffer(data, dtype=">f4", count=dim, offset=4).astype(np.float32)
+
+
+class VectorStore:
+    """
+    Pooled asyncpg access to report embeddings
+
+    asyncpg prepares every query on first use and keeps it in a per-connection
+    statement cache, so the pooled connections execute the queries above as
+    prepared statements after warm-up.
+    """
+
+    def __init__(
+        self,
+        dsn: str,
+        min_size: int = 1,
+        max_size: int = 10,
+        ef_search: int = 64,
+        serving_refresh: float = 10.0,
+    ):
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self.ef_search = ef_search
+        self.serving_refresh = serving_refresh
+        self.pool = None
+
+        # Cached embedding_serving row (None = fraud_reports.embedding)
+        self.serving_version: Optional[str] = None
+        self.shadow_version: Optional[str] = None
+        self.versioning = False  # 002_embedding_versions.sql applied
+        self._serving_read_at = 0.0
+
+    async def connect(self) -> None:
+        import asyncpg
+
+        self.pool = await asyncpg.create_pool(
+            self.dsn,
+            min_size=self.min_size,
+            max_size=self.max_size,
+            init=self._init_connection,
+            # A startup setting, not SET: the pool runs RESET ALL whenever a
+            # connection is released, which would drop a session-level SET
+            server_settings={"hnsw.ef_search": str(int(self.ef_search))},
+        )
+        await self.refresh_versions()
+        logger.info(
+            f"Vector store connected (pool {self.min_size}-{self.max_size}, "
+            f"serving {self.serving_version or 'fraud_reports.embedding'})"
+        )
+
+    async def _init_connection(self, conn) -> None:
+        await conn.set_type_codec(
+            "vector",
+            schema="public",
+            encoder=_encode_vector,
+            decoder=_decode_vector,
+            format="binary",
+        )
+
+    async def close(self) -> None:
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+
+    # ------------------------------------------------------------------------
+    # Embedding versions
+    # ------------------------------------------------------------------------
+
+    async def refresh_versions(self) -> Tuple[Optional[str], Optional[str]]:
+        """Re-read the serving and shadow versions from embedding_serving"""
+        import asyncpg
+
+        try:
+            async with self.pool.acquire() as conn:
+                row = await conn.fetchrow(READ_SERVING_SQL)
+        except asyncpg.UndefinedTableError:
+            # 002_embedding_versions.sql not applied: only the legacy column
+            self.versioning = False
+            row = None
+        else:
+            self.versioning = True
+
+        self.serving_version = row["model_version"] if row else None
+        self.shadow_version = row["shadow_version"] if row else None
+        self._serving_read_at = time.monotonic()
+        return self.serving_version, self.shadow_version
+
+    async def versions(self) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Serving and shadow version, re-read once the cached copy is stale
+
+        Callers take one snapshot per request and pass the version on, so the
+        query model and the vectors it is compared with always match.
+        """
+        if time.monotonic() - self._serving_read_at >= self.serving_refresh:
+            return await self.refresh_versions()
+        return self.serving_version, self.shadow_version
+
+    def _resolve(self, version: Optional[str]) -> Optional[str]:
+        if version == SERVING:
+            return self.serving_version
+        if version is not None:
+            check_version(version)
+        return version
+
+    def _require_versioning(self) -> None:
+        if not self.versioning:
+            raise RuntimeError(
+                "Embedding versions are not available (apply 002_embedding_versions.sql)"
+            )
+
+    async def set_shadow(self, version: Optional[str]) -> None:
+        """Start (version) or end (None) a migration into a shadow version"""
+        self._require_versioning()
+        if version is not None:
+            check_version(version)
+
+        async with self.pool.acquire() as conn:
+            await conn.execute(SET_SHADOW_SQL, version)
+        await self.refresh_versions()
+
+    async def switch_serving(self, version: Optional[str]) -> Optional[str]:
+        """
+        Point every query at another version in one transaction
+
+        Args:
+            version: Model version to serve (None = fraud_reports.embedding)
+
+        Returns:
+            The version served before
+
+        Raises:
+            IncompleteVersionError: if an active report has no vector in
+                that version
+        """
+        self._require_versioning()
+        if version is not None:
+            check_version(version)
+
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                # Serializes concurrent switches and migrations
+                previous = await conn.fetchrow(LOCK_SERVING_SQL)
+                if version is None:
+                    missing = await conn.fetchval(COUNT_REPORTS_SQL, False)
+                else:
+                    missing = await conn.fetchval(COUNT_REPORTS_VERSION_SQL, False, version)
+                if missing:
+                    raise IncompleteVersionError(version, missing)
+                await conn.execute(SWITCH_SERVING_SQL, version)
+
+        await self.refresh_versions()
+        logger.info(
+            f"Serving embeddings switched from {previous['model_version'] or 'fraud_reports.embedding'} "
+            f"to {version or 'fraud_reports.embedding'}"
+        )
+        return previous["model_version"]
+
+    async def create_version_index(self, version: str, dim: int) -> None:
+        """Build the HNSW index of a version without blocking writes"""
+        check_version(version)
+        sql = CREATE_VERSION_INDEX_SQL.format(
+            name=_version_index_name(version), dim=int(dim), version=version
+        )
+        async with self.pool.acquire() as conn:
+            await conn.execute(sql, timeout=None)
+
+    async def drop_version(self, version: str) -> int:
+        """Delete the vectors and index of a version that is not serving"""
+        check_version(version)
+        await self.refresh_versions()
+        if version == self.serving_version:
+            raise ValueError(f"Embedding version {version} is serving")
+
+        async with self.pool.acquire() as conn:
+            status = await conn.execute(DELETE_VERSION_SQL, version)
+            await conn.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {_version_index_name(version)}")
+
+        return int(status.split()[-1])
+
+    async def count_wrong_dimension(self, version: str, dim: int) -> int:
+        async with self.pool.acquire() as conn:
+            return await conn.fetchval(COUNT_WRONG_DIMENSION_SQL, check_version(version), dim)
+
+    async def sample_reports(self, version: str, limit: int) -> List[Dict]:
+        """Random active reports that have a vector in a version"""
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(SAMPLE_REPORTS_VERSION_SQL, check_version(version), limit)
+
+        return [dict(row) for row in rows]
+
+    # ------------------------------------------------------------------------
+    # Queries and writes
+    # ------------------------------------------------------------------------
+
+    async def find_similar(
+        self,
+        query_embedding: np.ndarray,
+        threshold: float = 0.85,
+        top_k: int = 20,
+        exclude_ids: Sequence[str] = (),
+        version: Optional[str] = SERVING,
+    ) -> List[Tuple[str, float]]:
+        """
+        Nearest stored reports by cosine similarity
+
+        Args:
+            query_embedding: Normalized query vector (from the version's model)
+            threshold: Minimum similarity to return
+            top_k: Maximum number of neighbours to consider
+            exclude_ids: Report IDs to skip (e.g. the report being checked)
+            version: Model version to search (None = fraud_reports.embedding,
+                default the serving version)
+
+        Returns:
+            List of (report_id, similarity_score) tuples, sorted by similarity
+        """
+        version = self._resolve(version)
+        if version is None:
+            sql = FIND_SIMILAR_SQL
+        else:
+            sql = FIND_SIMILAR_VERSION_SQL.format(dim=len(query_embedding), version=version)
+
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(
+                sql,
+                query_embedding,
+                top_k,
+                list(exclude_ids),
+                threshold,
+            )
+
+        return [(row["id"], float(row["similarity"])) for row in rows]
+
+    async def write_embeddings(
+        self,
+        items: Iterable[Tuple[str, np.ndarray]],
+        batch_size: int = 500,
+        version: Optional[str] = SERVING,
+    ) -> int:
+        """
+        Store embeddings for many reports, one transaction per batch
+
+        Args:
+            items: (report_id, embedding) pairs
+            batch_size: Reports written per transaction
+            version: Model version the embeddings belong to (None =
+                fraud_reports.embedding, default the serving version)
+
+        Returns:
+            Number of reports written
+        """
+        version = self._resolve(version)
+        items = list(items)
+        written = 0
+
+        async with self.pool.acquire() as conn:
+            for start in range(0, len(items), batch_size):
+                batch = items[start:start + batch_size]
+                async with conn.transaction():
+                    if version is None:
+                        await conn.executemany(WRITE_EMBEDDING_SQL, batch)
+                    else:
+                        await conn.executemany(
+                            WRITE_VERSION_SQL,
+                            [(version, report_id, embedding) for report_id, embedding in batch],
+                        )
+                written += len(batch)
+
+        return written
+
+    async def fetch_reports(
+        self,
+        after_id: Optional[str],
+        limit: int,
+        missing_only: bool = False,
+        version: Optional[str] = SERVING,
+    ) -> List[Dict]:
+        """
+        Page through active reports ordered by ID
+
+        Args:
+            after_id: Last report ID of the previous page (None for the first page)
+            limit: Page size
+            missing_only: Only reports without an embedding in the version
+            version: Model version for missing_only (None =
+                fraud_reports.embedding, default the serving version)
+
+        Returns:
+            List of report dicts with the fields used for embedding text
+        """
+        version = self._resolve(version)
+        async with self.pool.acquire() as conn:
+            if version is None:
+                rows = await conn.fetch(FETCH_REPORTS_SQL, after_id, limit, not missing_only)
+            else:
+                rows = await conn.fetch(
+                    FETCH_REPORTS_VERSION_SQL, after_id, limit, not missing_only, version
+                )
+
+        return [dict(row) for row in rows]
+
+    async def count_reports(
+        self, missing_only: bool = False, version: Optional[str] = SERVING
+    ) -> int:
+        version = self._resolve(version)
+        async with self.pool.acquire() as conn:
+            if version is None:
+                return await conn.fetchval(COUNT_REPORTS_SQL, not missing_only)
+            return await conn.fetchval(COUNT_REPORTS_VERSION_SQL, not missing_only, version)
+
+    async def fetch_identifiers(self, after_id: Optional[str], limit: int) -> List[Dict]:
+        """
+        Page through normalized identifiers of active reports ordered by report ID
+
+        Returns:
+            List of dicts with id and one key per identifier field (None if absent)
+        """
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(FETCH_IDENTIFIERS_SQL, after_id, limit)
+
+        return [dict(row) for row in rows]
+
+    async def count_identifiers(self) -> int:
+        async with self.pool.acquire() as conn:
+            return await conn.fetchval(COUNT_IDENTIFIERS_SQL)
+
+
+# Singleton instance
+_vector_store: Optional[VectorStore] = None
+
+
+def db_matching_enabled() -> bool:
+    return os.environ.get("ML_DB_MATCHING", "").lower() in ("1", "true", "yes")
+
+
+async def init_vector_store() -> Optional[VectorStore]:
+    """
+    Connect the singleton vector store if database matching is enabled
+
+    Returns:
+        VectorStore instance, or None if disabled or unreachable
+    """
+    global _vector_store
+
+    if _vector_store is not None or not db_matching_enabled():
+        return _vector_store
+
+    dsn = os.environ.get("POSTGRES_URL")
+    if not dsn:
+        logger.warning("ML_DB_MATCHING is set but POSTGRES_URL is missing")
+        return None
+
+    store = VectorStore(
+        dsn,
+        min_size=int(os.environ.get("ML_DB_POOL_MIN", "1")),
+        max_size=int(os.environ.get("ML_DB_POOL_MAX", "10")),
+        ef_search=int(os.environ.get("ML_HNSW_EF_SEARCH", "64")),
+        serving_refresh=float(os.environ.get("ML_EMBEDDING_SERVING_REFRESH", "10")),
+    )
+
+    try:
+        await store.connect()
+    except Exception as e:
+        logger.error(f"Could not connect vector store: {e}")
+        return None
+
+    _vector_store = store
+    return _vector_store
+
+
+def get_vector_store() -> Optional[VectorStore]:
+    """
+    Get the connected vector store
+
+    Returns:
+        VectorStore instance, or None if database matching is not available
+    """
+    return _vector_store
+
+
+async def close_vector_store() -> None:
+    global _vector_store
+
+    if _vector_store is not None:
+        await _vector_store.close()
+        _vector_store = None